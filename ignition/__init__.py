@@ -1,9 +1,18 @@
 import os
 import json
 import subprocess
+import time
 
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), "config.json")
 
+DEFAULT_IMAGE_TTL = 24 * 60 * 60  # Seconds a validated image digest is trusted without asking Docker again
+
+# Compiler image validated by this process, so Docker is asked at most once
+_validated_image = None
+
+# Image name -> digest inspected by this process
+_inspected_digests = {}
+
 
 def get_config():
     """Load configuration from config.json."""
@@ -19,43 +28,116 @@ def save_config(config):
         json.dump(config, f, indent=4)
 
 
-def validate_docker_image(image_name):
-    """Check if the provided Docker image exists locally."""
+def inspect_docker_image(image_name):
+    """Return the ID (digest) of a local Docker image, or None if it does not exist."""
     try:
         result = subprocess.run(
-            ["docker", "images", "-q", image_name],
+            ["docker", "image", "inspect", "--format", "{{.Id}}", image_name],
             text=True,
             capture_output=True,
-            check=True
+            check=False
         )
-        return bool(result.stdout.strip())
     except FileNotFoundError:
         print("Docker is not installed or not in PATH.")
-        return False
-    except subprocess.CalledProcessError as e:
-        print(f"Error checking Docker images: {e}")
-        return False
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+
+def validate_docker_image(image_name):
+    """Check if the provided Docker image exists locally."""
+    return inspect_docker_image(image_name) is not None
+
 
+def docker_image_digest(image_name, validate=True):
+    """Return the ID (digest) of a Docker image, inspecting it at most once per process.
+
+    Cached compiler output is keyed on this, so an image rebuilt under the same tag is
+    picked up by the next process. With validate=False Docker is never called and the
+    digest remembered in config.json is returned, however old it is.
+    """
+    if not validate:
+        record = get_config().get("docker_image_digest") or {}
+        return record.get("id") if record.get("image") == image_name else None
+    if image_name not in _inspected_digests:
+        digest = inspect_docker_image(image_name)
+        if digest is None:
+            return None
+        _remember_digest(get_config(), image_name, digest)
+        _inspected_digests[image_name] = digest
+    return _inspected_digests[image_name]
+
+
+def _trusted_digest(config, image_name):
+    # Digest remembered in config.json if it was validated within the TTL, otherwise None
+    record = config.get("docker_image_digest") or {}
+    if record.get("image") != image_name:
+        return None
+    if time.time() - record.get("validated_at", 0) >= config.get("docker_image_ttl", DEFAULT_IMAGE_TTL):
+        return None
+    return record.get("id")
+
+
+def ensure_docker_image(interactive=True):
+    """Ensure a valid Docker image is set in the config.
+
+    The image is validated at most once per process, and not at all while its
+    remembered digest is within the TTL. When no valid image is configured the user
+    is asked for one, unless interactive is False, in which case None is returned.
+    """
+    global _validated_image
+    if _validated_image is not None:
+        return _validated_image
 
-def ensure_docker_image():
-    """Ensure a valid Docker image is set in the config."""
     config = get_config()
     docker_image = config.get("docker_image")
 
-    if docker_image and validate_docker_image(docker_image):
-        return docker_image  # Docker image already set and valid
+    if docker_image and (_trusted_digest(config, docker_image) or docker_image_digest(docker_image)) is not None:
+        _validated_image = docker_image  # Docker image already set and valid
+        return docker_image
 
     print("No valid Docker image found.")
+    if not interactive:
+        return None
     while True:
         docker_image = input("Please enter the full name of your StartASM Docker Image: ").strip()
-        if validate_docker_image(docker_image):
+        digest = inspect_docker_image(docker_image)
+        if digest is not None:
+            config = get_config()
             config["docker_image"] = docker_image
-            save_config(config)
+            _remember_digest(config, docker_image, digest)
             print(f"Docker image saved: {docker_image}")
+            _validated_image = docker_image
             return docker_image
         else:
             print("Invalid Docker image. Ensure the image exists locally and try again.")
 
 
-# Ensure Docker image is set at the first import
-ensure_docker_image()
+def compiler_target(backend, interactive=True):
+    """Return what the given compiler backend compiles with: a Docker image name or a compiler binary path.
+
+    Backends and their settings in config.json:
+        docker, worker -- "docker_image", validated lazily (see ensure_docker_image)
+        local          -- "compiler_path", a StartASM compiler binary on this machine
+        cache          -- "docker_image", never validated; only cached compiler output is used
+    """
+    config = get_config()
+    if backend == "local":
+        compiler_path = config.get("compiler_path")
+        if not compiler_path or not os.access(compiler_path, os.X_OK):
+            print(f"No executable StartASM compiler found at 'compiler_path' ({compiler_path}) in config.json.")
+            return None
+        return compiler_path
+    if backend == "cache":
+        return config.get("docker_image")
+    return ensure_docker_image(interactive)
+
+
+def _remember_digest(config, image_name, digest):
+    config["docker_image_digest"] = {
+        "image": image_name,
+        "id": digest,
+        "validated_at": time.time(),
+    }
+    save_config(config)
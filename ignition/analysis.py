@@ -0,0 +1,272 @@
+from collections import deque
+from ignition.ast import InstructionType, OperandType
+from ignition.decoder import JUMP_CONDITIONS, register_name
+from ignition.runtime import REGISTER_COUNT, SP_REGISTER
+from ignition.memory import ADDRESS_LIMIT
+
+# Abstract register contents: a bit per type the register may hold, and a bit for an uninitialized register
+UNINITIALIZED = 1 << 15
+UNTYPED = 1 << 14  # A value created with no recognised type
+ANY_VALUE = sum(1 << operand_type.value for operand_type in OperandType) | UNTYPED
+ARITHMETIC_BITS = sum(1 << operand_type.value for operand_type in (OperandType.INTEGER, OperandType.MEMORY_ADDRESS,
+                                                                  OperandType.BOOLEAN, OperandType.CHARACTER))
+DIVISION_BITS = 1 << OperandType.INTEGER.value
+INTEGER_BIT = 1 << OperandType.INTEGER.value
+MEMORY_BIT = 1 << OperandType.MEMORY_ADDRESS.value
+
+# Arithmetic instructions with check-free handlers: permitted operand types and the operation named in errors
+CHECKED_ARITHMETIC = {
+    InstructionType.ADD.value: (ARITHMETIC_BITS, "addition"),
+    InstructionType.SUB.value: (ARITHMETIC_BITS, "subtraction"),
+    InstructionType.MULTIPLY.value: (ARITHMETIC_BITS, "multiplication"),
+    InstructionType.DIVIDE.value: (DIVISION_BITS, "division"),
+    InstructionType.COMPARE.value: (ARITHMETIC_BITS, "subtraction"),
+}
+
+# Opcodes that do not simply continue to the next instruction
+JUMP = InstructionType.JUMP.value
+CALL = InstructionType.CALL.value
+RETURN = InstructionType.RETURN.value
+STOP = InstructionType.STOP.value
+UNCONDITIONAL = JUMP_CONDITIONS["unconditional"]
+
+# Register type set by a cast to each type (a cast to boolean holds a memory address, as the engine does)
+CAST_BITS = {
+    OperandType.INTEGER: INTEGER_BIT,
+    OperandType.MEMORY_ADDRESS: MEMORY_BIT,
+    OperandType.BOOLEAN: MEMORY_BIT,
+    OperandType.CHARACTER: 1 << OperandType.CHARACTER.value,
+}
+
+
+class ProgramAnalysis:
+    def __init__(self, safe, errors):
+        self.safe = safe  # Instruction index -> whether its operand checks can never fail
+        self.errors = errors  # (instruction index, message) for instructions that fail whenever they run
+
+    def __repr__(self):
+        """String representation for debugging."""
+        return f"{self.__class__.__name__}(safe={sum(self.safe)}, errors={len(self.errors)})"
+
+
+class Analyzer:
+    """Infers which registers are initialized, and with which types, before every instruction of a program.
+
+    A forward dataflow pass over the control-flow graph, starting from a fresh
+    runtime. Calls continue at their target and returns at every instruction
+    following a call, so the result holds whatever the stack contains (the engine
+    stops a return to any other instruction with a runtime error). Memory is
+    not tracked: a load may produce any type. An instruction that stops the
+    program on a failed check contributes nothing to its successors, so later
+    instructions see the operands it checked as valid.
+
+    Arithmetic and compare instructions whose operands always have one permitted
+    type are marked safe, so the engine can run them without operand checks.
+    Instructions whose checks fail for every possible state are reported as
+    errors; they only fail if execution actually reaches them.
+    """
+    def __init__(self):
+        # Transfer functions update the register contents in place, returning the error the instruction
+        # always raises, or None if it can succeed. Instructions without one leave the registers alone.
+        self._transfers = {
+            InstructionType.MOVE.value: self._transfer_move,
+            InstructionType.LOAD.value: self._transfer_load,
+            InstructionType.STORE.value: self._transfer_store,
+            InstructionType.CREATE.value: self._transfer_create,
+            InstructionType.CAST.value: self._transfer_cast,
+            InstructionType.ADD.value: self._transfer_arithmetic,
+            InstructionType.SUB.value: self._transfer_arithmetic,
+            InstructionType.MULTIPLY.value: self._transfer_arithmetic,
+            InstructionType.DIVIDE.value: self._transfer_arithmetic,
+            InstructionType.COMPARE.value: self._transfer_arithmetic,
+            InstructionType.OR.value: self._transfer_logic,
+            InstructionType.AND.value: self._transfer_logic,
+            InstructionType.NOT.value: self._transfer_source,
+            InstructionType.PUSH.value: self._transfer_source,
+            InstructionType.OUTPUT.value: self._transfer_output,
+            InstructionType.SHIFT.value: self._transfer_shift,
+            InstructionType.POP.value: self._transfer_pop,
+            InstructionType.INPUT.value: self._transfer_input,
+        }
+
+    def analyze(self, program) -> ProgramAnalysis:
+        prog_len = len(program)
+        opcodes = program.opcodes
+        operands = program.operands
+        transfers = self._transfers
+        return_sites = [pc + 1 for pc in range(prog_len - 1) if opcodes[pc] == CALL]
+        states = [None] * prog_len  # Instruction index -> register contents before it, None until reached
+        queued = [False] * prog_len
+        pending = deque()
+        if prog_len:
+            initial = [UNINITIALIZED] * REGISTER_COUNT
+            initial[SP_REGISTER] = MEMORY_BIT
+            states[0] = tuple(initial)
+            pending.append(0)
+        while pending:
+            pc = pending.popleft()
+            queued[pc] = False
+            opcode = opcodes[pc]
+            registers = list(states[pc])
+            transfer = transfers.get(opcode)
+            if transfer is not None and transfer(registers, operands[pc], opcode) is not None:
+                continue
+            if opcode == JUMP:
+                condition, destination = operands[pc]
+                successors = (destination,) if condition is UNCONDITIONAL else (pc + 1, destination)
+            elif opcode == CALL:
+                successors = operands[pc]
+            elif opcode == RETURN:
+                successors = return_sites
+            elif opcode == STOP:
+                successors = ()
+            else:
+                successors = (pc + 1,)
+            state = tuple(registers)
+            for successor in successors:
+                if successor >= prog_len:
+                    continue
+                previous = states[successor]
+                if previous is not None:
+                    state_in = tuple(a | b for a, b in zip(previous, state))
+                    if state_in == previous:
+                        continue
+                else:
+                    state_in = state
+                states[successor] = state_in
+                if not queued[successor]:
+                    queued[successor] = True
+                    pending.append(successor)
+
+        safe = [False] * prog_len
+        errors = []
+        has_calls = CALL in opcodes
+        for pc in range(prog_len):
+            state = states[pc]
+            if state is None:
+                continue
+            opcode = opcodes[pc]
+            if opcode in CHECKED_ARITHMETIC:
+                bits = state[operands[pc][0]]
+                # Both operands always hold the same single type, and it is permitted
+                safe[pc] = (bits == state[operands[pc][1]] and bits & (bits - 1) == 0
+                            and bits & CHECKED_ARITHMETIC[opcode][0] != 0)
+            transfer = transfers.get(opcode)
+            error = None if transfer is None else transfer(list(state), operands[pc], opcode)
+            if opcode == RETURN and not has_calls:
+                # Only calls push instruction addresses
+                error = "Attempted to return with no call in the program."
+            if error is not None:
+                errors.append((pc, error))
+        return ProgramAnalysis(safe, errors)
+
+    # Define the transfer functions
+    def _transfer_move(self, registers, operands, opcode):
+        source_reg, target_reg = operands
+        if registers[source_reg] == UNINITIALIZED:
+            return f"Source register {register_name(source_reg)} is not initialized."
+        registers[source_reg] &= ~UNINITIALIZED
+        registers[target_reg] = registers[source_reg]
+
+    def _transfer_load(self, registers, operands, opcode):
+        source_is_reg, source, target_reg = operands
+        if source_is_reg:
+            if not registers[source] & MEMORY_BIT:
+                return f"Source register {register_name(source)} does not contain a memory address."
+            registers[source] = MEMORY_BIT
+        registers[target_reg] = ANY_VALUE
+
+    def _transfer_store(self, registers, operands, opcode):
+        source_reg, target_is_reg, target = operands
+        if registers[source_reg] == UNINITIALIZED:
+            return f"Source register {register_name(source_reg)} is uninitialized."
+        registers[source_reg] &= ~UNINITIALIZED
+        if target_is_reg:
+            if not registers[target] & MEMORY_BIT:
+                return f"Target register {register_name(target)} does not contain a memory address."
+            registers[target] = MEMORY_BIT
+        elif not 0 <= target < ADDRESS_LIMIT:
+            return f"Memory address {target} is out of range."
+
+    def _transfer_create(self, registers, operands, opcode):
+        val_type, val, reg = operands
+        if val is None:
+            registers[reg] = UNINITIALIZED
+        else:
+            registers[reg] = UNTYPED if val_type is None else 1 << val_type.value
+
+    def _transfer_cast(self, registers, operands, opcode):
+        cast_type, target_reg = operands
+        if registers[target_reg] == UNINITIALIZED:
+            return f"Target register {register_name(target_reg)} is uninitialized."
+        registers[target_reg] = CAST_BITS.get(cast_type, registers[target_reg] & ~UNINITIALIZED)
+
+    def _transfer_arithmetic(self, registers, operands, opcode):
+        permitted, operation = CHECKED_ARITHMETIC[opcode]
+        error = _operand_error(registers, operands[0], operands[1], permitted, operation)
+        if error is not None:
+            return error
+        common = registers[operands[0]] & registers[operands[1]] & permitted
+        registers[operands[0]] = registers[operands[1]] = common
+        if len(operands) == 3:
+            registers[operands[2]] = common
+
+    def _transfer_logic(self, registers, operands, opcode):
+        error = _operand_error(registers, operands[0], operands[1], ANY_VALUE, None)
+        if error is not None:
+            return error
+        registers[operands[0]] = registers[operands[1]] = registers[operands[0]] & registers[operands[1]]
+
+    def _transfer_source(self, registers, operands, opcode):
+        reg, = operands
+        if registers[reg] == UNINITIALIZED:
+            return f"Source register {register_name(reg)} is not initialized."
+        registers[reg] &= ~UNINITIALIZED
+
+    def _transfer_output(self, registers, operands, opcode):
+        reg, = operands
+        if registers[reg] == UNINITIALIZED:
+            return f"{register_name(reg)} is not defined."
+        registers[reg] &= ~UNINITIALIZED
+
+    def _transfer_shift(self, registers, operands, opcode):
+        _, source_reg, shift_reg = operands
+        if registers[source_reg] == UNINITIALIZED:
+            return f"Source register {register_name(source_reg)} is not initialized."
+        if registers[shift_reg] == UNINITIALIZED:
+            return f"Shift register {register_name(shift_reg)} is not initialized."
+        if not registers[shift_reg] & INTEGER_BIT:
+            return f"Shift register {register_name(shift_reg)} does not contain type int."
+        registers[source_reg] &= ~UNINITIALIZED
+        registers[shift_reg] = INTEGER_BIT
+
+    def _transfer_pop(self, registers, operands, opcode):
+        reg, = operands
+        registers[reg] = ANY_VALUE
+
+    def _transfer_input(self, registers, operands, opcode):
+        input_type, input_dest = operands
+        if input_type is not None:
+            registers[input_dest] = 1 << input_type.value
+
+
+def analyze(program) -> ProgramAnalysis:
+    return Analyzer().analyze(program)
+
+
+def format_error(program, pc, message):
+    # Report line for an instruction that always fails
+    return f"Analysis Warning: Instruction i[{pc}] (line {program.lines[pc]}) always fails when reached: {message}"
+
+
+def _operand_error(registers, reg_1, reg_2, permitted, operation):
+    # The error two source registers always produce, or None if they can be combined
+    bits_1 = registers[reg_1]
+    bits_2 = registers[reg_2]
+    if bits_1 == UNINITIALIZED or bits_2 == UNINITIALIZED:
+        return f"Source reg {register_name(reg_1)} and/or source reg {register_name(reg_2)} is not initialized."
+    if bits_1 & bits_2 & ANY_VALUE == 0:
+        return f"{register_name(reg_1)} and {register_name(reg_2)} never hold the same type."
+    if bits_1 & bits_2 & permitted == 0:
+        return f"{register_name(reg_1)} and {register_name(reg_2)} never hold a type permitted for {operation}."
+    return None
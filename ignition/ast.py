@@ -1,3 +1,6 @@
+import sys
+from array import array
+from collections.abc import Sequence
 from enum import Enum, auto
 
 #AST Enum Declerations
@@ -59,20 +62,52 @@ class NumOperands(Enum):
 
 
  #AST Class
+class ConstantPool:
+    """Strings of a program, each distinct string stored (and interned) once."""
+    def __init__(self):
+        self.strings = []  # Pool index -> string
+        self._indices = {}  # String -> pool index
+
+    def add(self, text: str) -> int:
+        index = self._indices.get(text)
+        if index is None:
+            index = len(self.strings)
+            text = sys.intern(text)
+            self.strings.append(text)
+            self._indices[text] = index
+        return index
+
+    def get(self, index: int) -> str:
+        return self.strings[index]
+
+    def __len__(self):
+        return len(self.strings)
+
+
 class ASTNode:
-    def __init__(self, node_type: str, value: str):
-        self.node_type = node_type  #Corresponds to ASTConstants::NodeType
-        self.value = value  #Corresponds to m_nodeValue
-        self.children = []  #Corresponds to m_children
+    """View of one node of an AbstractSyntaxTree, created on access."""
+    __slots__ = ("tree", "index")
+    node_type = None  #Corresponds to ASTConstants::NodeType
+
+    def __init__(self, tree, index: int):
+        self.tree = tree
+        self.index = index  # Position of the node in the tree's arrays
 
-    def add_child(self, child):
-        self.children.append(child)
+    @property
+    def children(self):
+        return self.get_children()
 
     def get_children(self):
-        return self.children
+        return []
 
     def child_at(self, pos):
-        return self.children[pos]
+        return self.get_children()[pos]
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other.tree is self.tree and other.index == self.index
+
+    def __hash__(self):
+        return hash((type(self), id(self.tree), self.index))
 
     def __repr__(self):
         """String representation for debugging."""
@@ -80,16 +115,40 @@ class ASTNode:
 
 
 class RootNode(ASTNode):
-    def __init__(self):
-        super().__init__(node_type="ROOT", value="root")
+    __slots__ = ()
+    node_type = "ROOT"
+    value = "root"
+
+    def __init__(self, tree):
+        super().__init__(tree, 0)
+
+    def get_children(self):
+        return NodeList(self.tree, InstructionNode, 0, len(self.tree))
 
 
 class InstructionNode(ASTNode):
-    def __init__(self, value: str, instruction_type: str, num_operands: str, line: int):
-        super().__init__(node_type="INSTRUCTION", value=value)
-        self.instruction_type = instruction_type  # Corresponds to m_instructionType
-        self.num_operands = num_operands  # Corresponds to m_numOperands
-        self.line = line  # Corresponds to m_line
+    __slots__ = ()
+    node_type = "INSTRUCTION"
+
+    @property
+    def value(self):
+        return self.tree.constants.strings[self.tree.values[self.index]]  #Corresponds to m_nodeValue
+
+    @property
+    def instruction_type(self):
+        return INSTRUCTION_TYPES[self.tree.opcodes[self.index]]  # Corresponds to m_instructionType
+
+    @property
+    def num_operands(self):
+        return NUM_OPERANDS[self.tree.arities[self.index]]  # Corresponds to m_numOperands
+
+    @property
+    def line(self):
+        return self.tree.lines[self.index]  # Corresponds to m_line
+
+    def get_children(self):
+        offsets = self.tree.operand_offsets
+        return NodeList(self.tree, OperandNode, offsets[self.index], offsets[self.index + 1])
 
     def __repr__(self):
         """String representation for debugging."""
@@ -98,11 +157,24 @@ class InstructionNode(ASTNode):
 
 
 class OperandNode(ASTNode):
-    def __init__(self, value: str, operand_type: str, line: int, pos: int):
-        super().__init__(node_type="OPERAND", value=value)
-        self.operand_type = operand_type  # Corresponds to m_operandType
-        self.line = line  # Corresponds to m_line
-        self.pos = pos  # Corresponds to m_pos
+    __slots__ = ()
+    node_type = "OPERAND"
+
+    @property
+    def value(self):
+        return self.tree.constants.strings[self.tree.operand_values[self.index]]
+
+    @property
+    def operand_type(self):
+        return OPERAND_TYPES[self.tree.operand_kinds[self.index]]  # Corresponds to m_operandType
+
+    @property
+    def line(self):
+        return self.tree.operand_lines[self.index]  # Corresponds to m_line
+
+    @property
+    def pos(self):
+        return self.tree.operand_positions[self.index]  # Corresponds to m_pos
 
     def __repr__(self):
         """String representation for debugging."""
@@ -110,12 +182,72 @@ class OperandNode(ASTNode):
                 f"operand_type={self.operand_type}, line={self.line}, pos={self.pos})")
 
 
+class NodeList(Sequence):
+    """Children of a node: the nodes of one class stored at indices start to stop."""
+    __slots__ = ("tree", "node_class", "start", "stop")
+
+    def __init__(self, tree, node_class, start, stop):
+        self.tree = tree
+        self.node_class = node_class
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self[i] for i in range(*pos.indices(len(self)))]
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
+            raise IndexError("child index out of range")
+        return self.node_class(self.tree, self.start + pos)
+
+    def __iter__(self):
+        node_class, tree = self.node_class, self.tree
+        for index in range(self.start, self.stop):
+            yield node_class(tree, index)
+
+
 class AbstractSyntaxTree:
+    """A program's tree, stored as parallel arrays with one entry per instruction and per operand.
+
+    Instruction and operand text is held once in a constant pool, so repeated
+    register names, labels and print literals cost an array slot each rather
+    than an object per node. Node objects are views created on access through
+    `root`, so nothing per node outlives the walk that asked for it.
+    """
     def __init__(self):
-        self.root = None
+        self.opcodes = array("B")  # InstructionType value per instruction
+        self.arities = array("B")  # NumOperands value per instruction
+        self.lines = array("i")  # Source line per instruction
+        self.values = array("I")  # Constant pool index of each instruction's text
+        self.operand_offsets = array("I", [0])  # Instruction index -> index of its first operand, plus the operand count
+        self.operand_kinds = array("B")  # OperandType value per operand
+        self.operand_values = array("I")  # Constant pool index of each operand's text
+        self.operand_lines = array("i")
+        self.operand_positions = array("i")
+        self.constants = ConstantPool()
+        self.root = RootNode(self)
 
-    def set_root(self, root: RootNode):
-        self.root = root
+    def add_instruction(self, value: str, instruction_type: InstructionType, num_operands: NumOperands, line: int):
+        self.opcodes.append(instruction_type.value)
+        self.arities.append(num_operands.value)
+        self.lines.append(line)
+        self.values.append(self.constants.add(value))
+        self.operand_offsets.append(self.operand_offsets[-1])
+
+    def add_operand(self, value: str, operand_type: OperandType, line: int, pos: int):
+        # Operands belong to the most recently added instruction
+        self.operand_kinds.append(operand_type.value)
+        self.operand_values.append(self.constants.add(value))
+        self.operand_lines.append(line)
+        self.operand_positions.append(pos)
+        self.operand_offsets[-1] += 1
+
+    def __len__(self):
+        return len(self.opcodes)
 
     def traverse(self, node=None, level=0):
         if node is None:
@@ -139,3 +271,9 @@ def decode_operand_type(value: int) -> OperandType:
         return OperandType(value)
     except ValueError:
         raise ValueError(f"Unknown operand type: {value}")
+
+
+# Enum members by value, for decoding the tree's arrays
+INSTRUCTION_TYPES = tuple(InstructionType)
+OPERAND_TYPES = tuple(OperandType)
+NUM_OPERANDS = tuple(NumOperands)
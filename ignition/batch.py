@@ -0,0 +1,106 @@
+import contextlib
+import os
+import sys
+import time
+from ignition.analysis import analyze, format_error
+from ignition.cache import ASTCache
+from ignition.decoder import Decoder
+from ignition.errors import DecodeError
+from ignition.execution import ExecutionEngine
+from ignition.output import FileSink, StreamSink
+from ignition.parser import Parser
+from ignition.runtime import Runtime
+
+# Exit statuses for 'ignition run'
+EXIT_OK = 0
+EXIT_RUNTIME_ERROR = 1
+EXIT_COMPILE_ERROR = 2
+EXIT_STEP_LIMIT = 3
+EXIT_INPUT_ERROR = 4
+EXIT_USAGE_ERROR = 64
+
+
+def run_batch(program_path, compiler_image, input_path=None, output_path=None, max_steps=None,
+              show_stats=False, compiler_backend="docker", jit=False, flush_policy=None):
+    """Compile and run a program to completion without the REPL, returning an exit status.
+
+    Program input is read line by line from input_path (or stdin) without prompts,
+    program output goes to output_path (or stdout, written out as flush_policy says),
+    and errors and statistics are written to stderr. No interpreter state is persisted.
+    """
+    if input_path is not None and not os.path.isfile(input_path):
+        print(f"Usage Error: Input file '{input_path}' does not exist.", file=sys.stderr)
+        return EXIT_USAGE_ERROR
+    compile_start = time.perf_counter()
+    parser = Parser(ASTCache(), compiler_backend, interactive=False)
+    with contextlib.redirect_stdout(sys.stderr):
+        ast = parser.parse_program(program_path, compiler_image, False)
+    parser.close()
+    if ast is None:
+        return EXIT_COMPILE_ERROR
+    try:
+        program = Decoder().decode(ast)
+    except DecodeError as e:
+        print(f"Compiler Error: {e}", file=sys.stderr)
+        return EXIT_COMPILE_ERROR
+    analysis = analyze(program)
+    for pc, message in analysis.errors:
+        print(format_error(program, pc, message), file=sys.stderr)
+    compile_time = time.perf_counter() - compile_start
+
+    with contextlib.ExitStack() as stack:
+        input_file = stack.enter_context(open(input_path, "r")) if input_path else sys.stdin
+        output = stack.enter_context(contextlib.closing(FileSink(output_path) if output_path
+                                                         else StreamSink(sys.stdout, flush_policy)))
+        run_start = time.perf_counter()
+        status, message, runtime, steps = execute_program(program, input_file, output, max_steps, jit, analysis)
+        run_time = time.perf_counter() - run_start
+    if message is not None:
+        print(message, file=sys.stderr)
+
+    if show_stats:
+        print("=== Run Statistics ===", file=sys.stderr)
+        print(f"Compile Time -> {compile_time:.4f}s", file=sys.stderr)
+        if steps is not None:
+            print(f"Instructions Executed -> {steps}", file=sys.stderr)
+            print(f"Run Time -> {run_time:.4f}s", file=sys.stderr)
+            if run_time > 0:
+                print(f"Instructions/Second -> {steps / run_time:,.0f}", file=sys.stderr)
+        print(f"Exit Status -> {status}", file=sys.stderr)
+        print("======================", file=sys.stderr)
+    return status
+
+
+def execute_program(program, input_file, output, max_steps=None, jit=False, analysis=None):
+    """Run a decoded program from the start, reading input from a file and writing output to a sink.
+
+    Returns (status, error message or None, final Runtime, instructions executed).
+    """
+    runtime = Runtime()
+    engine = ExecutionEngine(runtime, program, True, False, jit, analysis, output)
+    engine.read_input = _line_reader(input_file)
+    try:
+        steps = engine.run(max_steps)
+    except EOFError:
+        return EXIT_INPUT_ERROR, "Input Error: Program input ended before the program finished.", runtime, None
+    except Exception as error:
+        # An engine failure ends this program with a runtime error instead of a traceback
+        message = f"Runtime Error: Instruction i[{runtime.p_counter}] failed: {error!r}"
+        return EXIT_RUNTIME_ERROR, message, runtime, None
+    finally:
+        output.flush()
+    if engine.last_error is not None:
+        return EXIT_RUNTIME_ERROR, engine.last_error, runtime, steps
+    if runtime.p_counter < len(program):
+        message = f"Runtime Error: Step limit of {max_steps} instructions reached at line {runtime.p_counter}."
+        return EXIT_STEP_LIMIT, message, runtime, steps
+    return EXIT_OK, None, runtime, steps
+
+
+def _line_reader(stream):
+    def read_line(prompt):
+        line = stream.readline()
+        if not line:
+            raise EOFError
+        return line.rstrip("\n")
+    return read_line
@@ -0,0 +1,342 @@
+import contextlib
+import json
+import os
+import platform
+import re
+import shlex
+import time
+from ignition.ast import InstructionType, OperandType
+from ignition.decoder import Decoder
+from ignition.execution import ExecutionEngine
+from ignition.parser import Parser
+from ignition.runtime import Runtime
+
+DEFAULT_THRESHOLD = 10.0  # Percent slowdown reported as a regression
+RESULTS_VERSION = 1
+
+# Operand words the compiler drops from instructions
+_FILLER_WORDS = ("to", "with", "by", "if")
+_TYPE_WORDS = {
+    "integer": OperandType.INTEGER,
+    "boolean": OperandType.BOOLEAN,
+    "character": OperandType.CHARACTER,
+    "memory": OperandType.MEMORY_ADDRESS,
+}
+_JUMP_WORDS = ("greater", "less", "equal", "unequal", "zero", "nonzero", "negative", "positive", "unconditional")
+
+# Per-opcode microbenchmarks: (setup instructions, measured instruction, stack entries to push first)
+MICROBENCHMARKS = {
+    "move": (["create integer 5 to r1"], "move r1 to r2", 0),
+    "load": (["create integer 5 to r1", "create memory m<100> to r5", "store r1 to r5"], "load r5 to r2", 0),
+    "store": (["create integer 5 to r1", "create memory m<100> to r5"], "store r1 to r5", 0),
+    "create": ([], "create integer 5 to r1", 0),
+    "cast": (["create integer 65 to r1"], "cast integer r1", 0),
+    "add": (["create integer 5 to r1", "create integer 3 to r2"], "add r1 with r2 to r3", 0),
+    "sub": (["create integer 5 to r1", "create integer 3 to r2"], "sub r1 with r2 to r3", 0),
+    "multiply": (["create integer 5 to r1", "create integer 3 to r2"], "multiply r1 with r2 to r3", 0),
+    "divide": (["create integer 5 to r1", "create integer 3 to r2"], "divide r1 with r2 to r3", 0),
+    "or": (["create integer 5 to r1", "create integer 3 to r2"], "or r1 with r2", 0),
+    "and": (["create integer 5 to r1", "create integer 3 to r2"], "and r1 with r2", 0),
+    "not": (["create integer 5 to r1"], "not r1", 0),
+    "shift": (["create integer 5 to r1", "create integer 0 to r2"], "shift left r1 by r2", 0),
+    "compare": (["create integer 5 to r1", "create integer 3 to r2"], "compare r1 with r2", 0),
+    "jump": (["create integer 5 to r1", "compare r1 with r1"], "jump if equal to i[0]", 0),
+    "call": ([], "call to i[0]", 0),
+    "push": (["create integer 5 to r1"], "push r1", 0),
+    "pop": ([], "pop to r1", 1),
+    "return": (["call to i[1]"], "return", 1),  # Returns may only go to an instruction following a call
+    "stop": ([], "stop", 0),
+    "input": ([], "input integer to r1", 0),
+    "output": (["create integer 5 to r1"], "output r1", 0),
+    "print": ([], 'print "x"', 0),
+    "label": ([], "label 'here'", 0),
+    "comment": ([], 'comment "note"', 0),
+}
+
+
+def loop_program(iterations):
+    # Sum 1..N: add/compare/jump
+    return assemble(f"""
+        create integer 0 to r1
+        create integer 1 to r2
+        create integer {iterations} to r3
+        create integer 0 to r4
+        label 'loop'
+        add r1 with r2 to r1
+        add r4 with r2 to r4
+        compare r4 with r3
+        jump if less to 'loop'
+        stop
+    """)
+
+
+def recursion_program(calls, depth):
+    # Recurse 'depth' deep through call/return, 'calls' times
+    return assemble(f"""
+        create integer 0 to r0
+        create integer 1 to r2
+        create integer {calls} to r5
+        create integer 0 to r6
+        label 'outer'
+        create integer {depth} to r1
+        call to 'down'
+        add r6 with r2 to r6
+        compare r6 with r5
+        jump if less to 'outer'
+        stop
+        label 'down'
+        compare r1 with r0
+        jump if equal to 'done'
+        sub r1 with r2 to r1
+        call to 'down'
+        label 'done'
+        return
+    """)
+
+
+def array_program(cells):
+    # Fill an array of cells, then walk it summing the values
+    return assemble(f"""
+        create memory m<1000> to r5
+        create memory m<1> to r6
+        create memory m<{1000 + cells}> to r7
+        create integer 7 to r1
+        label 'fill'
+        store r1 to r5
+        add r5 with r6 to r5
+        compare r5 with r7
+        jump if less to 'fill'
+        create memory m<1000> to r5
+        create integer 0 to r2
+        label 'sum'
+        load r5 to r3
+        add r2 with r3 to r2
+        add r5 with r6 to r5
+        compare r5 with r7
+        jump if less to 'sum'
+        stop
+    """)
+
+
+def run_benchmarks(quick=False):
+    """Run every benchmark and return the results as a JSON-serializable dict."""
+    scale = 10 if quick else 1
+    repeats = 3 if quick else 5
+    return {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "quick": quick,
+        "micro": run_microbenchmarks(100_000 // scale, repeats),
+        "programs": run_program_benchmarks(scale, repeats),
+        "parse": run_parse_benchmark(100_000 // scale, repeats),
+    }
+
+
+def run_microbenchmarks(count, repeats):
+    # Best-of-repeats nanoseconds per handler call, with the program counter reset before each call
+    results = {}
+    with open(os.devnull, "w") as null, contextlib.redirect_stdout(null):
+        for name, (setup, measured, stack_entries) in MICROBENCHMARKS.items():
+            best = None
+            for _ in range(repeats):
+                runtime, engine, index = _prepare(setup, measured, stack_entries * count)
+                handler = engine.instruction_handlers[engine.program.opcodes[index]]
+                operands = engine.program.operands[index]
+                start = time.perf_counter_ns()
+                for _ in range(count):
+                    runtime.p_counter = index
+                    handler(operands)
+                elapsed = time.perf_counter_ns() - start
+                engine.output.flush()
+                if engine.last_error is not None:
+                    raise RuntimeError(f"Microbenchmark '{name}' failed: {engine.last_error}")
+                best = elapsed if best is None else min(best, elapsed)
+            results[name] = {"ns_per_op": best / count}
+    return results
+
+
+def run_program_benchmarks(scale, repeats):
+    programs = {
+        "loop": loop_program(200_000 // scale),
+        "recursion": recursion_program(2_000 // scale, 50),
+        "array": array_program(50_000 // scale),
+    }
+    results = {}
+    for name, json_output in programs.items():
+        program = Decoder().decode(Parser().build_ast(json_output))
+        # Each program runs on the interpreter and again with hot loops compiled
+        for jit in (False, True):
+            label = f"{name}_jit" if jit else name
+            best = None
+            for _ in range(repeats):
+                engine = ExecutionEngine(Runtime(), program, True, True, jit)
+                start = time.perf_counter()
+                steps = engine.run()
+                elapsed = time.perf_counter() - start
+                if engine.last_error is not None:
+                    raise RuntimeError(f"Program benchmark '{label}' failed: {engine.last_error}")
+                best = elapsed if best is None else min(best, elapsed)
+            results[label] = {"instructions": steps, "seconds": best, "ips": steps / best}
+    return results
+
+
+def run_parse_benchmark(instructions, repeats):
+    # Timings for loading, building and decoding a large compiler output
+    body = assemble("""
+        create integer 5 to r1
+        add r1 with r2 to r3
+        compare r1 with r2
+        jump if less to i[0]
+        store r1 to m<100>
+        load m<100> to r2
+        push r1
+        pop to r1
+        print "x"
+    """)["children"]
+    children = [dict(instruction, line=index + 1)
+                for index, instruction in enumerate(body[i % len(body)] for i in range(instructions))]
+    json_text = json.dumps({"type": "ROOT", "value": "root", "children": children})
+    best = {"json_seconds": None, "ast_seconds": None, "decode_seconds": None}
+    for _ in range(repeats):
+        start = time.perf_counter()
+        json_output = json.loads(json_text)
+        loaded = time.perf_counter()
+        ast = Parser().build_ast(json_output)
+        built = time.perf_counter()
+        Decoder().decode(ast)
+        decoded = time.perf_counter()
+        for key, elapsed in (("json_seconds", loaded - start), ("ast_seconds", built - loaded), ("decode_seconds", decoded - built)):
+            best[key] = elapsed if best[key] is None else min(best[key], elapsed)
+    return {"instructions": instructions, "bytes": len(json_text), **best}
+
+
+def flatten_metrics(results):
+    # Metric name -> (value, whether lower is better)
+    metrics = {}
+    for name, result in results.get("micro", {}).items():
+        metrics[f"micro.{name}.ns_per_op"] = (result["ns_per_op"], True)
+    for name, result in results.get("programs", {}).items():
+        metrics[f"programs.{name}.ips"] = (result["ips"], False)
+    for key in ("json_seconds", "ast_seconds", "decode_seconds"):
+        if key in results.get("parse", {}):
+            metrics[f"parse.{key}"] = (results["parse"][key], True)
+    return metrics
+
+
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return (metric, baseline value, current value, percent slower) for each metric slower than threshold percent."""
+    regressions = []
+    baseline_metrics = flatten_metrics(baseline)
+    for metric, (value, lower_is_better) in flatten_metrics(current).items():
+        if metric not in baseline_metrics:
+            continue
+        base = baseline_metrics[metric][0]
+        if not base or not value:
+            continue
+        slowdown = (value / base - 1) * 100 if lower_is_better else (base / value - 1) * 100
+        if slowdown > threshold:
+            regressions.append((metric, base, value, slowdown))
+    return regressions
+
+
+def print_results(results):
+    print("=== Opcode Microbenchmarks ===")
+    for name, result in results["micro"].items():
+        print(f"{name:<10} -> {result['ns_per_op']:8.1f} ns/op")
+    print("=== Programs ===")
+    for name, result in results["programs"].items():
+        print(f"{name:<14} -> {result['ips']:12,.0f} instructions/s ({result['instructions']} in {result['seconds']:.4f}s)")
+    parse = results["parse"]
+    print(f"=== Parse ({parse['instructions']} instructions, {parse['bytes']} bytes) ===")
+    print(f"JSON Load  -> {parse['json_seconds']:.4f}s")
+    print(f"AST Build  -> {parse['ast_seconds']:.4f}s")
+    print(f"Decode     -> {parse['decode_seconds']:.4f}s")
+    print("==============================")
+
+
+def bench(quick=False, output_path=None, baseline_path=None, threshold=DEFAULT_THRESHOLD):
+    """Entry point for 'ignition bench'. Returns 1 if any metric regressed against the baseline, otherwise 0."""
+    baseline = None
+    if baseline_path:
+        try:
+            with open(baseline_path, "r") as f:
+                baseline = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Usage Error: Cannot read baseline '{baseline_path}': {e}")
+            return 1
+    results = run_benchmarks(quick)
+    print_results(results)
+    if output_path:
+        with open(output_path, "w") as f:
+            json.dump(results, f, indent=4)
+    if baseline is None:
+        return 0
+    regressions = compare_results(results, baseline, threshold)
+    if not regressions:
+        print(f"No regressions over {threshold:g}% against '{baseline_path}'.")
+        return 0
+    print(f"=== Regressions over {threshold:g}% against '{baseline_path}' ===")
+    for metric, base, value, slowdown in regressions:
+        print(f"{metric}: {base:.6g} -> {value:.6g} ({slowdown:.1f}% slower)")
+    return 1
+
+
+def assemble(source):
+    """Build compiler-style AST JSON for simple StartASM source, so benchmarks do not need the compiler.
+
+    Only the forms used by the benchmark programs are understood.
+    """
+    children = []
+    lines = [line.strip() for line in source.strip().splitlines() if line.strip()]
+    for line_num, line in enumerate(lines, 1):
+        tokens = shlex.split(line, posix=False)
+        operands = [token for token in tokens[1:] if token not in _FILLER_WORDS]
+        operand_types = [_operand_type(token) for token in operands]
+        if tokens[0] == "create":
+            operand_types[1] = _TYPE_WORDS[operands[0]]
+        children.append({
+            "type": "INSTRUCTION",
+            "value": tokens[0],
+            "instruction_type": InstructionType[tokens[0].upper()].value,
+            "num_operands": len(operands),
+            "line": line_num,
+            "children": [{"type": "OPERAND", "value": value, "operand_type": operand_type.value, "line": line_num, "position": pos}
+                         for pos, (value, operand_type) in enumerate(zip(operands, operand_types))],
+        })
+    return {"type": "ROOT", "value": "root", "children": children}
+
+
+def _operand_type(token):
+    if re.fullmatch(r"r\d|sp", token):
+        return OperandType.REGISTER
+    if token.startswith("i[") or token.startswith("'"):
+        return OperandType.INSTRUCTION_ADDRESS
+    if token.startswith("m<"):
+        return OperandType.MEMORY_ADDRESS
+    if token.startswith('"'):
+        return OperandType.STRING
+    if token == "newline":
+        return OperandType.NEWLINE
+    if token in _TYPE_WORDS:
+        return OperandType.TYPE_CONDITION
+    if token in ("left", "right"):
+        return OperandType.SHIFT_CONDITION
+    if token in _JUMP_WORDS:
+        return OperandType.JUMP_CONDITION
+    if token in ("true", "false"):
+        return OperandType.BOOLEAN
+    if re.fullmatch(r"-?\d+", token):
+        return OperandType.INTEGER
+    return OperandType.CHARACTER
+
+
+def _prepare(setup, measured, stack_entries):
+    # Runtime and engine with the setup instructions already executed, and the measured instruction's index
+    program = Decoder().decode(Parser().build_ast(assemble("\n".join(setup + [measured]))))
+    runtime = Runtime()
+    engine = ExecutionEngine(runtime, program, True, False)
+    engine.read_input = lambda prompt: "42"
+    engine.run(len(setup))
+    for _ in range(stack_entries):
+        runtime.push_stack(len(setup), OperandType.INSTRUCTION_ADDRESS)
+    return runtime, engine, len(setup)
@@ -0,0 +1,167 @@
+import operator
+import re
+from ignition.errors import ConditionError
+from ignition.decoder import decode_address, decode_register
+
+COMPARISONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+FLAGS = {"zf": 'z', "sf": 's', "of": 'o'}
+
+_TOKEN = re.compile(r"\s*(==|!=|<=|>=|<|>|&&|\|\||m<\d+>|[A-Za-z_]\w*|-?\d+)")
+
+
+class Breakpoint:
+    def __init__(self, line, condition=None, ignore_count=0):
+        self.line = line  # Instruction index
+        self.condition = condition  # Condition source text, if any
+        self.predicate = compile_condition(condition) if condition else None  # Compiled condition
+        self.ignore_count = ignore_count  # Number of hits to skip before stopping
+        self.hit_count = 0  # Number of times the breakpoint was reached with its condition true
+
+    def __repr__(self):
+        """String representation for debugging."""
+        return (f"{self.__class__.__name__}(line={self.line}, condition={self.condition}, "
+                f"ignore_count={self.ignore_count}, hit_count={self.hit_count})")
+
+
+class BreakpointTable:
+    """Breakpoints indexed by instruction, so checking a line is a single dict lookup."""
+    def __init__(self):
+        self._breakpoints = {}  # Line -> Breakpoint
+
+    def add(self, line, condition=None, ignore_count=0):
+        self._breakpoints[line] = Breakpoint(line, condition, ignore_count)
+
+    def remove(self, line):
+        del self._breakpoints[line]
+
+    def get(self, line):
+        return self._breakpoints.get(line)
+
+    def should_break(self, line, runtime):
+        breakpoint = self._breakpoints.get(line)
+        if breakpoint is None:
+            return False
+        if breakpoint.predicate is not None and not breakpoint.predicate(runtime):
+            return False
+        breakpoint.hit_count += 1
+        return breakpoint.hit_count > breakpoint.ignore_count
+
+    def reset_hits(self):
+        for breakpoint in self._breakpoints.values():
+            breakpoint.hit_count = 0
+
+    def sorted(self):
+        return [self._breakpoints[line] for line in sorted(self._breakpoints)]
+
+    def __contains__(self, line):
+        return line in self._breakpoints
+
+    def __len__(self):
+        return len(self._breakpoints)
+
+
+# CONDITION COMPILER
+def compile_condition(text):
+    """Compile a condition such as 'r3 > 100 and zf == 1' into a predicate over a Runtime.
+
+    Comparisons take registers (r0-r9, sp), flags (zf, sf, of), pc, memory cells (m<N>),
+    integers and true/false as operands, and can be joined with and/or (&&/||), with
+    'and' binding tighter. Comparisons against uninitialized values are false.
+    """
+    tokens = _tokenize(text)
+    alternatives = []
+    for clause in _split(tokens, ("or", "||")):
+        terms = [_compile_comparison(comparison, text) for comparison in _split(clause, ("and", "&&"))]
+        alternatives.append(terms[0] if len(terms) == 1 else _all_of(terms))
+    return alternatives[0] if len(alternatives) == 1 else _any_of(alternatives)
+
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if match is None:
+            raise ConditionError(f"Unexpected '{text[pos:].strip()}' in condition '{text}'.")
+        tokens.append(match.group(1))
+        pos = match.end()
+    if not tokens:
+        raise ConditionError("Empty breakpoint condition.")
+    return tokens
+
+
+def _split(tokens, separators):
+    groups = [[]]
+    for token in tokens:
+        if token in separators:
+            groups.append([])
+        else:
+            groups[-1].append(token)
+    return groups
+
+
+def _compile_comparison(tokens, text):
+    if len(tokens) != 3 or tokens[1] not in COMPARISONS:
+        raise ConditionError(f"Expected '<operand> <comparison> <operand>' in condition '{text}'.")
+    compare = COMPARISONS[tokens[1]]
+    left = _compile_operand(tokens[0], text)
+    right = _compile_operand(tokens[2], text)
+    # Specialize the common 'value <op> constant' form
+    if isinstance(right, _Constant):
+        constant = right.value
+        def predicate(runtime):
+            value = left(runtime)
+            return value is not None and compare(value, constant)
+    else:
+        def predicate(runtime):
+            a = left(runtime)
+            b = right(runtime)
+            return a is not None and b is not None and compare(a, b)
+    return predicate
+
+
+def _compile_operand(token, text):
+    if token in FLAGS:
+        flag = FLAGS[token]
+        return lambda runtime: int(runtime.get_flag(flag))
+    if token == "pc":
+        return lambda runtime: runtime.get_program_counter()
+    if token == "sp" or re.fullmatch(r"r\d", token):
+        reg = decode_register(token)
+        return lambda runtime: runtime.reg_values[reg]
+    if token.startswith("m<"):
+        addr = decode_address(token)
+        def memory_value(runtime):
+            val_type = runtime.get_memory(addr)
+            return None if val_type is None else val_type[0]
+        return memory_value
+    if token in ("true", "false"):
+        return _Constant(token == "true")
+    if re.fullmatch(r"-?\d+", token):
+        return _Constant(int(token))
+    raise ConditionError(f"Unknown operand '{token}' in condition '{text}'.")
+
+
+class _Constant:
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self, runtime):
+        return self.value
+
+
+def _all_of(predicates):
+    return lambda runtime: all(predicate(runtime) for predicate in predicates)
+
+
+def _any_of(predicates):
+    return lambda runtime: any(predicate(runtime) for predicate in predicates)
@@ -0,0 +1,235 @@
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+try:
+    import fcntl
+except ImportError:  # Windows, where stats merges are not locked
+    fcntl = None
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")), "ignition", "ast")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # 64MB
+STATS_FILE = "stats.json"
+STATS_LOCK_FILE = "stats.lock"
+ENTRY_SUFFIX = ".json"
+
+
+class ASTCache:
+    """Persistent store of compiler AST output keyed by source hash and compiler image ID.
+
+    Entries are the raw JSON emitted by the compiler's `ast` command, read and written
+    as streams so an entry is never held in memory as a whole. Reads refresh an
+    entry's modification time, so eviction past `max_bytes` drops the least recently
+    used entries first.
+
+    Hit, miss and eviction counts are kept in memory and merged into the shared
+    stats file by flush_stats() (called by close()), so lookups never write the
+    file and processes sharing the cache never overwrite each other's counts.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._pending = _empty_stats()  # Counts recorded by this cache and not yet merged into the stats file
+
+    # PUBLIC METHODS
+    @staticmethod
+    def make_key(source, image_id):
+        digest = hashlib.sha256()
+        digest.update(image_id.encode())
+        digest.update(b"\0")
+        digest.update(source)
+        return digest.hexdigest()
+
+    def open_entry(self, key):
+        # Text stream of a cached entry, or None on a miss
+        path = self._entry_path(key)
+        try:
+            entry = open(path, "r")
+        except OSError:
+            self._record("misses")
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._record("hits")
+        return entry
+
+    def open_writer(self, key):
+        # Writer for a new entry, which only becomes visible once committed
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        except OSError:
+            return None
+        return CacheWriter(self, os.fdopen(fd, "w"), tmp_path, self._entry_path(key))
+
+    def invalidate(self, key):
+        # Drop an entry that turned out to be unreadable
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+
+    def stats(self):
+        stats = self._load_stats()
+        for counter, amount in self._pending.items():
+            stats[counter] += amount
+        entries = self._entries()
+        stats["entries"] = len(entries)
+        stats["bytes"] = sum(size for _, size, _ in entries)
+        stats["max_bytes"] = self.max_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        for path, _, _ in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._pending = _empty_stats()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with self._stats_lock():
+                self._write_atomic(os.path.join(self.cache_dir, STATS_FILE), json.dumps(_empty_stats()))
+        except OSError:
+            pass
+
+    def flush_stats(self):
+        # Add this cache's counts to the stats file with a locked read-modify-write
+        if not any(self._pending.values()):
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with self._stats_lock():
+                stats = self._load_stats()
+                for counter, amount in self._pending.items():
+                    stats[counter] += amount
+                self._write_atomic(os.path.join(self.cache_dir, STATS_FILE), json.dumps(stats))
+        except OSError:
+            return
+        self._pending = _empty_stats()
+
+    def close(self):
+        self.flush_stats()
+
+    # PRIVATE METHODS
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + ENTRY_SUFFIX)
+
+    def _entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(ENTRY_SUFFIX) or name == STATS_FILE:
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, st.st_size, st.st_mtime))
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        # Least recently used first
+        entries.sort(key=lambda entry: entry[2])
+        evicted = 0
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        if evicted:
+            self._record("evictions", evicted)
+
+    def _load_stats(self):
+        # Counts in the stats file
+        stats = _empty_stats()
+        try:
+            with open(os.path.join(self.cache_dir, STATS_FILE), "r") as f:
+                stats.update(json.load(f))
+        except (OSError, json.JSONDecodeError):
+            pass
+        return stats
+
+    def _record(self, counter, amount=1):
+        self._pending[counter] += amount
+
+    @contextlib.contextmanager
+    def _stats_lock(self):
+        # Exclusive lock held while the stats file is rewritten
+        with open(os.path.join(self.cache_dir, STATS_LOCK_FILE), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _write_atomic(self, path, text):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+class CacheWriter:
+    """Streams compiler output into a temporary file that is renamed into the cache on commit."""
+    def __init__(self, cache, file, tmp_path, path):
+        self.cache = cache
+        self._file = file
+        self._tmp_path = tmp_path
+        self._path = path
+        self._failed = False  # A write failed, so the entry is incomplete
+
+    def write(self, text):
+        if self._failed:
+            return
+        try:
+            self._file.write(text)
+        except OSError:
+            self._failed = True
+
+    def commit(self):
+        try:
+            self._file.close()
+            if self._failed:
+                raise OSError("incomplete cache entry")
+            os.replace(self._tmp_path, self._path)
+        except OSError:
+            self.discard()
+            return
+        self.cache._evict()
+
+    def discard(self):
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+
+def _empty_stats():
+    return {"hits": 0, "misses": 0, "evictions": 0}
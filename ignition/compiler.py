@@ -0,0 +1,252 @@
+import atexit
+import hashlib
+import io
+import json
+import os
+import signal
+import subprocess
+import threading
+from ignition import docker_image_digest
+
+DEFAULT_TIMEOUT = 60  # Seconds allowed per compile request
+KEEPALIVE_COMMAND = ["-f", "/dev/null"]  # Arguments for the 'tail' entrypoint keeping a worker alive
+
+
+class CompilerProcess:
+    """A running compile request whose output is read from `stdout` while the compiler writes it.
+
+    Standard error is collected on a background thread so neither pipe can fill up
+    and stall the compiler, and the process is killed once `timeout` seconds pass.
+    """
+    def __init__(self, args, timeout=DEFAULT_TIMEOUT):
+        self.args = args
+        self.returncode = None
+        self.timed_out = False
+        self._stderr = []
+        # In its own session on POSIX, so a timeout also kills anything the compiler started
+        self._process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                         start_new_session=os.name == "posix")
+        self.stdout = self._process.stdout
+        self._stderr_thread = threading.Thread(target=self._read_stderr, daemon=True)
+        self._stderr_thread.start()
+        self._timer = threading.Timer(timeout, self._kill)
+        self._timer.daemon = True
+        self._timer.start()
+
+    @property
+    def stderr(self):
+        return "".join(self._stderr)
+
+    def close(self):
+        # Wait for the compiler to exit and return its exit status; unread output is discarded
+        if self.returncode is None:
+            self.stdout.close()
+            self.returncode = self._process.wait()
+            self._timer.cancel()
+            self._stderr_thread.join()
+            self._process.stderr.close()
+        return self.returncode
+
+    # PRIVATE METHODS
+    def _read_stderr(self):
+        for line in self._process.stderr:
+            self._stderr.append(line)
+
+    def _kill(self):
+        self.timed_out = True
+        try:
+            if os.name == "posix":
+                os.killpg(self._process.pid, signal.SIGKILL)
+            else:
+                self._process.kill()
+        except OSError:
+            pass
+
+
+class FinishedProcess:
+    """A compile request that was answered without running a compiler."""
+    def __init__(self, args, returncode, stdout="", stderr=""):
+        self.args = args
+        self.returncode = returncode
+        self.timed_out = False
+        self.stdout = io.StringIO(stdout)
+        self.stderr = stderr
+
+    def close(self):
+        return self.returncode
+
+
+class DockerCompiler:
+    """Runs the compiler image in a fresh container for every program."""
+    def __init__(self, image, timeout=DEFAULT_TIMEOUT):
+        self.image = image
+        self.timeout = timeout
+
+    def stream(self, program_path) -> CompilerProcess:
+        return CompilerProcess(["docker", "run", "--rm", self.image, "ast", program_path], self.timeout)
+
+    def recover(self, process):
+        # Whether a failed request should be retried
+        return False
+
+    def identity(self):
+        # Image digest, so cached output is tied to the exact compiler build
+        return docker_image_digest(self.image)
+
+    def close(self):
+        pass
+
+
+class DockerWorkerCompiler:
+    """Keeps one container of the compiler image running and compiles through `docker exec`.
+
+    The container is started lazily on the first request with a no-op entrypoint, and
+    each request execs the image's real entrypoint inside it. A request that times out
+    or finds the container gone restarts the worker, and in the latter case the
+    request is retried once.
+    """
+    def __init__(self, image, timeout=DEFAULT_TIMEOUT):
+        self.image = image
+        self.timeout = timeout
+        self.container_id = None
+        self.restarts = 0
+        self._entrypoint = None
+        atexit.register(self.close)
+
+    def stream(self, program_path) -> CompilerProcess:
+        if self.container_id is None:
+            self._start()
+        return CompilerProcess(["docker", "exec", self.container_id] + self._entrypoint + ["ast", program_path],
+                               self.timeout)
+
+    def recover(self, process):
+        if process.timed_out:
+            # The compiler may still be running inside the container, so replace it
+            self._restart()
+            return False
+        if not self._is_running():
+            self._restart()
+            return True
+        return False
+
+    def identity(self):
+        return docker_image_digest(self.image)
+
+    def close(self):
+        if self.container_id is None:
+            return
+        try:
+            subprocess.run(["docker", "rm", "-f", self.container_id], capture_output=True, check=False, timeout=self.timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        self.container_id = None
+
+    # PRIVATE METHODS
+    def _start(self):
+        if self._entrypoint is None:
+            self._entrypoint = self._inspect_entrypoint()
+        result = subprocess.run(
+            ["docker", "run", "-d", "--rm", "--entrypoint", "tail", self.image] + KEEPALIVE_COMMAND,
+            text=True,
+            capture_output=True,
+            check=True,
+            timeout=self.timeout
+        )
+        self.container_id = result.stdout.strip()
+
+    def _restart(self):
+        self.close()
+        self.restarts += 1
+        self._start()
+
+    def _is_running(self):
+        try:
+            result = subprocess.run(
+                ["docker", "inspect", "--format", "{{.State.Running}}", self.container_id],
+                text=True,
+                capture_output=True,
+                check=False,
+                timeout=self.timeout
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+        return result.stdout.strip() == "true"
+
+    def _inspect_entrypoint(self):
+        result = subprocess.run(
+            ["docker", "image", "inspect", "--format", "{{json .Config.Entrypoint}}", self.image],
+            text=True,
+            capture_output=True,
+            check=True,
+            timeout=self.timeout
+        )
+        return json.loads(result.stdout) or []
+
+
+class LocalCompiler:
+    """Runs a StartASM compiler binary installed on this machine, without Docker."""
+    def __init__(self, compiler_path, timeout=DEFAULT_TIMEOUT):
+        self.compiler_path = compiler_path
+        self.timeout = timeout
+        self._identity = None
+
+    def stream(self, program_path) -> CompilerProcess:
+        return CompilerProcess([self.compiler_path, "ast", program_path], self.timeout)
+
+    def recover(self, process):
+        return False
+
+    def identity(self):
+        # Hash of the binary itself, computed once per compiler
+        if self._identity is None:
+            try:
+                with open(self.compiler_path, "rb") as f:
+                    self._identity = "sha256:" + hashlib.sha256(f.read()).hexdigest()
+            except OSError:
+                return None
+        return self._identity
+
+    def close(self):
+        pass
+
+
+class CacheOnlyCompiler:
+    """Never compiles, so only programs already in the AST cache can be loaded.
+
+    Cached output is looked up under the configured image's remembered digest,
+    without asking Docker whether the image still exists.
+    """
+    def __init__(self, image, timeout=DEFAULT_TIMEOUT):
+        self.image = image
+        self.timeout = timeout
+
+    def stream(self, program_path) -> FinishedProcess:
+        return FinishedProcess(
+            [program_path], 1, "", f"No cached compiler output for '{program_path}' (the cache compiler backend never compiles)."
+        )
+
+    def recover(self, process):
+        return False
+
+    def identity(self):
+        return docker_image_digest(self.image, validate=False)
+
+    def close(self):
+        pass
+
+
+COMPILER_BACKENDS = {
+    "docker": DockerCompiler,
+    "worker": DockerWorkerCompiler,
+    "local": LocalCompiler,
+    "cache": CacheOnlyCompiler,
+}
+
+
+def make_compiler(backend, target, timeout=DEFAULT_TIMEOUT):
+    # target is the Docker image name, or the compiler binary path for the local backend
+    try:
+        compiler_class = COMPILER_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown compiler backend: {backend}")
+    return compiler_class(target, timeout)
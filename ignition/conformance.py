@@ -0,0 +1,214 @@
+import contextlib
+import io
+import json
+import os
+import time
+import traceback
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from ignition import compiler_target
+from ignition.batch import EXIT_OK, execute_program
+from ignition.cache import ASTCache
+from ignition.decoder import Decoder, decode_register
+from ignition.errors import DecodeError
+from ignition.output import CaptureSink
+from ignition.parser import Parser
+
+DEFAULT_MAX_STEPS = 10_000_000  # Per-test instruction limit, so a looping program fails instead of hanging
+
+# Sidecar files next to each <name>.sasm
+INPUT_SUFFIX = ".in"  # Program input, one line per 'input' instruction
+OUTPUT_SUFFIX = ".out"  # Expected program output
+STATE_SUFFIX = ".state.json"  # Expected final state, e.g. {"registers": {"r3": 15}, "memory": {"234": 15}}
+
+# Per-process parser used by pool workers
+_worker_parser = None
+
+
+class TestCase:
+    def __init__(self, name, program_path, input_path=None, output_path=None, state_path=None):
+        self.name = name  # Program path relative to the test directory
+        self.program_path = program_path
+        self.input_path = input_path
+        self.output_path = output_path  # Expected output, if checked
+        self.state_path = state_path  # Expected final state, if checked
+
+    def __repr__(self):
+        """String representation for debugging."""
+        return f"{self.__class__.__name__}(name={self.name})"
+
+
+def discover_tests(test_dir):
+    # Every .sasm program with an expected output or expected state sidecar, in name order
+    cases = []
+    for dirpath, dirnames, filenames in os.walk(test_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if not filename.endswith(".sasm"):
+                continue
+            program_path = os.path.join(dirpath, filename)
+            stem = program_path[:-len(".sasm")]
+            sidecars = [stem + suffix if os.path.isfile(stem + suffix) else None
+                        for suffix in (INPUT_SUFFIX, OUTPUT_SUFFIX, STATE_SUFFIX)]
+            if sidecars[1] is None and sidecars[2] is None:
+                continue
+            cases.append(TestCase(os.path.relpath(program_path, test_dir), program_path, *sidecars))
+    return cases
+
+
+def run_tests(test_dir, jobs=None, max_steps=DEFAULT_MAX_STEPS, compiler_backend="docker", junit_path=None, json_path=None,
+              jit=False):
+    """Run every test program under test_dir across a process pool and report the results.
+
+    Prints a summary (and each failure) to stdout, optionally writes JUnit XML and
+    JSON reports, and returns 0 if every test passed or 1 otherwise.
+    """
+    cases = discover_tests(test_dir)
+    if not cases:
+        print(f"Usage Error: No .sasm programs with {OUTPUT_SUFFIX} or {STATE_SUFFIX} files found in '{test_dir}'.")
+        return 1
+    # Resolve the compiler once here rather than in every worker
+    compiler_image = compiler_target(compiler_backend, interactive=False)
+    if compiler_image is None:
+        print(f"Compiler Error: No compiler is configured for the '{compiler_backend}' backend.")
+        return 1
+
+    jobs = jobs or os.cpu_count() or 1
+    start = time.perf_counter()
+    if jobs == 1:
+        _init_worker(compiler_backend)
+        results = [run_test(case, compiler_image, max_steps, jit) for case in cases]
+    else:
+        chunksize = max(1, len(cases) // (jobs * 8))
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(compiler_backend,)) as pool:
+            results = list(pool.map(run_test, cases, [compiler_image] * len(cases), [max_steps] * len(cases),
+                                    [jit] * len(cases), chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+
+    failed = [result for result in results if result["status"] != "passed"]
+    for result in failed:
+        print(f"{result['status'].upper()}: {result['name']}")
+        print("    " + result["message"].replace("\n", "\n    "))
+    print(f"{len(results) - len(failed)} passed, {len(failed)} failed in {elapsed:.2f}s ({jobs} workers)")
+    if junit_path:
+        write_junit(results, junit_path, elapsed)
+    if json_path:
+        write_json(results, json_path, elapsed)
+    return 0 if not failed else 1
+
+
+def run_test(case, compiler_image, max_steps=DEFAULT_MAX_STEPS, jit=False):
+    """Compile and run one test case, returning its result as a dict."""
+    result = {"name": case.name, "status": "passed", "message": "", "compile_time": 0.0, "run_time": 0.0, "steps": None}
+    try:
+        _run_test(case, compiler_image, max_steps, jit, result)
+    except Exception as e:
+        # A crash fails this test only, the rest still run and are reported
+        result.update(status="error", message=f"Internal Error: {e!r}\n{traceback.format_exc().rstrip()}")
+    return result
+
+
+def write_junit(results, path, elapsed):
+    suite = ET.Element("testsuite", {
+        "name": "ignition",
+        "tests": str(len(results)),
+        "failures": str(sum(result["status"] == "failed" for result in results)),
+        "errors": str(sum(result["status"] == "error" for result in results)),
+        "time": f"{elapsed:.4f}",
+    })
+    for result in results:
+        case = ET.SubElement(suite, "testcase", {
+            "classname": os.path.dirname(result["name"]).replace(os.sep, ".") or "ignition",
+            "name": os.path.basename(result["name"]),
+            "time": f"{result['compile_time'] + result['run_time']:.4f}",
+        })
+        if result["status"] != "passed":
+            element = ET.SubElement(case, "failure" if result["status"] == "failed" else "error",
+                                    {"message": result["message"].split("\n", 1)[0]})
+            element.text = result["message"]
+    ET.ElementTree(suite).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def write_json(results, path, elapsed):
+    report = {
+        "tests": len(results),
+        "passed": sum(result["status"] == "passed" for result in results),
+        "time": elapsed,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=4)
+
+
+def _run_test(case, compiler_image, max_steps, jit, result):
+    # Fill in result for one test case
+    start = time.perf_counter()
+    parser = _worker_parser or Parser(ASTCache(), interactive=False)
+    compiler_output = io.StringIO()
+    with contextlib.redirect_stdout(compiler_output):
+        ast = parser.parse_program(case.program_path, compiler_image, False)
+    program = None
+    if ast is not None:
+        try:
+            program = Decoder().decode(ast)
+        except DecodeError as e:
+            compiler_output.write(f"Compiler Error: {e}")
+    result["compile_time"] = time.perf_counter() - start
+    if parser.cache is not None:
+        # Workers are never closed, so merge this test's cache counts now
+        parser.cache.flush_stats()
+    if program is None:
+        result.update(status="error", message=compiler_output.getvalue().strip())
+        return
+
+    start = time.perf_counter()
+    output = CaptureSink()
+    with open(case.input_path, "r") if case.input_path else io.StringIO() as input_file:
+        status, error, runtime, steps = execute_program(program, input_file, output, max_steps, jit)
+    result["run_time"] = time.perf_counter() - start
+    result["steps"] = steps
+
+    messages = []
+    if status != EXIT_OK:
+        messages.append(error)
+    if case.output_path:
+        with open(case.output_path, "r") as f:
+            expected = f.read()
+        if output.getvalue() != expected:
+            messages.append(f"Output mismatch:\n--- expected\n{expected}\n--- actual\n{output.getvalue()}")
+    if case.state_path:
+        messages.extend(_compare_state(case.state_path, runtime))
+    if messages:
+        result.update(status="failed", message="\n".join(messages))
+
+
+def _init_worker(compiler_backend):
+    global _worker_parser
+    _worker_parser = Parser(ASTCache(), compiler_backend, interactive=False)
+
+
+def _compare_state(state_path, runtime):
+    try:
+        with open(state_path, "r") as f:
+            expected = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        return [f"Invalid state file '{state_path}': {e}"]
+    messages = []
+    for reg_name, value in expected.get("registers", {}).items():
+        actual = runtime.reg_values[decode_register(reg_name)]
+        if not _values_equal(actual, value):
+            messages.append(f"Register {reg_name}: expected {value}, got {actual}")
+    for addr, value in expected.get("memory", {}).items():
+        addr = int(str(addr).removeprefix("m<").removesuffix(">"))
+        val_type = runtime.get_memory(addr)
+        actual = None if val_type is None else val_type[0]
+        if not _values_equal(actual, value):
+            messages.append(f"Memory m<{addr}>: expected {value}, got {actual}")
+    return messages
+
+
+def _values_equal(actual, expected):
+    # Characters are held as their code point, so allow 'a' to match 97
+    if isinstance(expected, str) and len(expected) == 1 and isinstance(actual, int):
+        return actual == ord(expected)
+    return actual == expected and type(actual) is type(expected)
@@ -0,0 +1,199 @@
+from ignition.ast import AbstractSyntaxTree, InstructionType, OperandType
+from ignition.errors import DecodeError
+from ignition.runtime import SP_REGISTER
+
+
+# Jump conditions, evaluated against the (z, s, o) flags
+JUMP_CONDITIONS = {
+    "greater": lambda z, s, o: not z and s == o,
+    "less": lambda z, s, o: s != o,
+    "equal": lambda z, s, o: z,
+    "zero": lambda z, s, o: z,
+    "unequal": lambda z, s, o: not z,
+    "nonzero": lambda z, s, o: not z,
+    "negative": lambda z, s, o: s,
+    "positive": lambda z, s, o: not s and not z,
+    "unconditional": lambda z, s, o: True,
+}
+
+TYPE_NAMES = {
+    "integer": OperandType.INTEGER,
+    "boolean": OperandType.BOOLEAN,
+    "character": OperandType.CHARACTER,
+    "memory": OperandType.MEMORY_ADDRESS,
+}
+
+
+class DecodedProgram:
+    """Flat instruction table built once from an AbstractSyntaxTree.
+
+    Each instruction is stored as an opcode int (the InstructionType value),
+    a tuple of pre-parsed operands and its source line, so the execution
+    engine never has to look at operand strings while running. Jump and call
+    targets are resolved to instruction indices, including label targets.
+    """
+    def __init__(self, opcodes, operands, lines, labels):
+        self.opcodes = opcodes  # InstructionType values
+        self.operands = operands  # Decoded operand tuples
+        self.lines = lines  # Source line of each instruction
+        self.labels = labels  # Label name -> instruction index
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def __repr__(self):
+        """String representation for debugging."""
+        return f"{self.__class__.__name__}(instructions={len(self.opcodes)})"
+
+
+class Decoder:
+    def __init__(self):
+        self._labels = {}  # Label name -> instruction index for the program being decoded
+        self._operand_decoders = {
+            InstructionType.MOVE: self._decode_move,
+            InstructionType.LOAD: self._decode_load,
+            InstructionType.STORE: self._decode_store,
+            InstructionType.CREATE: self._decode_create,
+            InstructionType.CAST: self._decode_cast,
+            InstructionType.ADD: self._decode_registers,
+            InstructionType.SUB: self._decode_registers,
+            InstructionType.MULTIPLY: self._decode_registers,
+            InstructionType.DIVIDE: self._decode_registers,
+            InstructionType.OR: self._decode_registers,
+            InstructionType.AND: self._decode_registers,
+            InstructionType.NOT: self._decode_registers,
+            InstructionType.SHIFT: self._decode_shift,
+            InstructionType.COMPARE: self._decode_registers,
+            InstructionType.JUMP: self._decode_jump,
+            InstructionType.CALL: self._decode_call,
+            InstructionType.PUSH: self._decode_registers,
+            InstructionType.POP: self._decode_registers,
+            InstructionType.RETURN: self._decode_nullary,
+            InstructionType.STOP: self._decode_nullary,
+            InstructionType.INPUT: self._decode_input,
+            InstructionType.OUTPUT: self._decode_registers,
+            InstructionType.PRINT: self._decode_print,
+            InstructionType.LABEL: self._decode_nullary,
+            InstructionType.COMMENT: self._decode_nullary,
+        }
+
+    def decode(self, ast: AbstractSyntaxTree) -> DecodedProgram:
+        opcodes = []
+        operands = []
+        lines = []
+        self._labels = self._collect_labels(ast)
+        for instruction in ast.root.get_children():
+            decode_operands = self._operand_decoders.get(instruction.instruction_type, self._decode_nullary)
+            opcodes.append(instruction.instruction_type.value)
+            operands.append(decode_operands(instruction.get_children()))
+            lines.append(instruction.line)
+        return DecodedProgram(tuple(opcodes), tuple(operands), tuple(lines), self._labels)
+
+    def _collect_labels(self, ast):
+        labels = {}
+        for index, instruction in enumerate(ast.root.get_children()):
+            if instruction.instruction_type != InstructionType.LABEL:
+                continue
+            name = label_name(instruction.child_at(0).value)
+            if name in labels:
+                raise DecodeError(f"Label '{name}' on line {instruction.line} is already defined.")
+            labels[name] = index
+        return labels
+
+    def _resolve_target(self, value, line):
+        # i[N] targets are instruction indices, anything else names a label
+        if value[0] == 'i':
+            return decode_address(value)
+        name = label_name(value)
+        if name not in self._labels:
+            raise DecodeError(f"Undefined label '{name}' referenced on line {line}.")
+        return self._labels[name]
+
+    # Define the operand decoders
+    def _decode_nullary(self, operands):
+        return ()
+
+    def _decode_registers(self, operands):
+        return tuple(decode_register(operand.value) for operand in operands)
+
+    def _decode_move(self, operands):
+        return decode_register(operands[0].value), decode_register(operands[1].value)
+
+    def _decode_load(self, operands):
+        source = operands[0].value
+        if source[0] == 'm':
+            return False, decode_address(source), decode_register(operands[1].value)
+        return True, decode_register(source), decode_register(operands[1].value)
+
+    def _decode_store(self, operands):
+        target = operands[1].value
+        if target[0] == 'm':
+            return decode_register(operands[0].value), False, decode_address(target)
+        return decode_register(operands[0].value), True, decode_register(target)
+
+    def _decode_create(self, operands):
+        return TYPE_NAMES.get(operands[0].value), decode_value(operands[1]), decode_register(operands[2].value)
+
+    def _decode_cast(self, operands):
+        return TYPE_NAMES.get(operands[0].value), decode_register(operands[1].value)
+
+    def _decode_shift(self, operands):
+        return operands[0].value == "left", decode_register(operands[1].value), decode_register(operands[2].value)
+
+    def _decode_jump(self, operands):
+        condition = JUMP_CONDITIONS.get(operands[0].value)
+        if condition is None:
+            raise DecodeError(f"Unknown jump condition '{operands[0].value}' on line {operands[0].line}.")
+        return condition, self._resolve_target(operands[-1].value, operands[-1].line)
+
+    def _decode_call(self, operands):
+        return (self._resolve_target(operands[-1].value, operands[-1].line),)
+
+    def _decode_input(self, operands):
+        return TYPE_NAMES.get(operands[0].value), decode_register(operands[1].value)
+
+    def _decode_print(self, operands):
+        if operands[0].value == "newline":
+            return ("\n",)
+        return (operands[0].value[1:len(operands[0].value) - 1],)
+
+
+#Operand Decoders
+def decode_register(value: str) -> int:
+    if value == 'sp':
+        return SP_REGISTER
+    return int(value[1:])
+
+
+def register_name(reg: int) -> str:
+    if reg == SP_REGISTER:
+        return 'sp'
+    return f"r{reg}"
+
+
+def decode_address(value: str) -> int:
+    # m<0234> and i[08] both become plain integers
+    return int(value[2:len(value) - 1])
+
+
+def label_name(value: str) -> str:
+    return value.strip("'")
+
+
+def decode_value(operand):
+    match operand.operand_type:
+        case OperandType.MEMORY_ADDRESS | OperandType.INSTRUCTION_ADDRESS:
+            return decode_address(operand.value)
+        case OperandType.INTEGER:
+            return int(operand.value)
+        case OperandType.BOOLEAN:
+            if operand.value == 'true':
+                return True
+            elif operand.value == 'false':
+                return False
+        case OperandType.CHARACTER:
+            return ord(operand.value)
+        case OperandType.STRING:
+            return str(operand.value)
+        case _:
+            return None
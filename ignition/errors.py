@@ -0,0 +1,10 @@
+class IgnitionError(Exception):
+    """Base class for errors raised by Ignition."""
+
+
+class DecodeError(IgnitionError):
+    """Raised when a compiled program cannot be decoded into an instruction table."""
+
+
+class ConditionError(IgnitionError):
+    """Raised when a breakpoint condition cannot be compiled."""
@@ -1,14 +1,46 @@
+import sys
+from ignition.analysis import analyze
 from ignition.ast import InstructionType, OperandType
+from ignition.decoder import register_name
+from ignition.jit import JIT_THRESHOLD, compile_loop
+from ignition.output import NullSink, StreamSink
 INT32_MIN = -2_147_483_648
 INT32_MAX = 2_147_483_647
+MASK_32 = 0xFFFFFFFF
+WRAP_32 = 0x100000000
+ARITHMETIC_TYPES = frozenset((OperandType.INTEGER, OperandType.MEMORY_ADDRESS, OperandType.BOOLEAN, OperandType.CHARACTER))
+DIVISION_TYPES = frozenset((OperandType.INTEGER,))
+# Instructions that always continue to the next one, so a following jump can be fused with them
+FLAG_SETTING_TYPES = (InstructionType.ADD, InstructionType.SUB, InstructionType.MULTIPLY, InstructionType.DIVIDE,
+                      InstructionType.OR, InstructionType.AND, InstructionType.NOT, InstructionType.SHIFT)
+# Instructions fused with a preceding create
+CREATE_OPERAND_TYPES = (InstructionType.ADD, InstructionType.SUB, InstructionType.MULTIPLY, InstructionType.DIVIDE,
+                        InstructionType.COMPARE)
 
 class ExecutionEngine:
-    def __init__(self, runtime, prog_len, silent_r, silent_o):
+    def __init__(self, runtime, program, silent_r, silent_o, jit=False, analysis=None, output=None):
         self.runtime = runtime
-        self._prog_len = prog_len+1
+        self._values = runtime.reg_values  # Register value slots
+        self._types = runtime.reg_types  # Register type slots
+        self.program = program
+        self._opcodes = program.opcodes
+        self._operands = program.operands
+        self._prog_len = len(program)
+        # Instructions following a call, the only places a return may go (ignition.analysis relies on it)
+        self._return_sites = frozenset(pc + 1 for pc, opcode in enumerate(program.opcodes)
+                                       if opcode == InstructionType.CALL.value)
         self._silent_r = silent_r
-        self._silent_o = silent_o
-        self.instruction_handlers = {
+        if output is None:
+            output = NullSink() if silent_o else StreamSink()
+        self.output = output  # Sink for program output (see ignition.output)
+        self.read_input = input  # Called with the prompt to read a line of program input
+        self.last_error = None  # Last runtime error that stopped the program
+        self.jit = jit  # Whether run() compiles hot loops (see ignition.jit)
+        self._loops = [None] * self._prog_len  # Loop head -> compiled loop function
+        self._back_edges = [0] * self._prog_len  # Loop head -> back edges taken, until compiled
+        self._jit_thresholds = [JIT_THRESHOLD] * self._prog_len  # Loop head -> back edges before the next compile
+        self.analysis = analysis if analysis is not None else analyze(program)  # Static checks (see ignition.analysis)
+        handlers = {
             InstructionType.MOVE: self._execute_move,
             InstructionType.LOAD: self._execute_load,
             InstructionType.STORE: self._execute_store,
@@ -35,356 +67,346 @@ class ExecutionEngine:
             InstructionType.LABEL: self._execute_pass,
             InstructionType.COMMENT: self._execute_pass
         }
-
-    def execute(self, instruction):
-        instruction_type = instruction.instruction_type
-        operands = instruction.get_children()
-        handler = self.instruction_handlers.get(instruction_type)
+        # Handlers indexed directly by opcode
+        self.instruction_handlers = [handlers.get(instruction_type, self._execute_pass) for instruction_type in InstructionType]
+        # Handlers without operand checks, for instructions the analysis proved safe
+        unchecked_handlers = {
+            InstructionType.ADD.value: self._execute_add_unchecked,
+            InstructionType.SUB.value: self._execute_sub_unchecked,
+            InstructionType.MULTIPLY.value: self._execute_multiply_unchecked,
+            InstructionType.DIVIDE.value: self._execute_divide_unchecked,
+            InstructionType.COMPARE.value: self._execute_compare_unchecked,
+        }
+        # (handler, operands) pairs indexed by instruction, used by the run loop
+        self._dispatch = [(unchecked_handlers[opcode] if safe else self.instruction_handlers[opcode], operands)
+                          for opcode, operands, safe in zip(self._opcodes, self._operands, self.analysis.safe)]
+        # The same with superinstructions, used by the run loop when nothing observes single instructions
+        self._fused_dispatch = self._fuse()
+        # Whether the fused dispatch entry at each instruction ends in a jump, the only back edges the JIT counts
+        jump = InstructionType.JUMP.value
+        self._ends_in_jump = [opcode == jump or (fused is not plain and self._opcodes[pc + 1] == jump)
+                              for pc, (opcode, fused, plain) in enumerate(zip(self._opcodes, self._fused_dispatch, self._dispatch))]
+
+    def execute(self, index):
+        handler, operands = self._dispatch[index]
         handler(operands)
 
+    def run(self, max_steps=None, hook=None):
+        """Execute from the current program counter until the program ends.
+
+        This is the uninstrumented fast path: no breakpoint is consulted between
+        instructions. If max_steps is given, at most that many instructions are
+        executed. If hook is given it is called with the program counter before
+        every instruction. Returns the number of instructions executed.
+
+        Without a hook, common instruction pairs run as superinstructions (see
+        _fuse), which return the number of instructions they executed. A run
+        still stops after exactly max_steps instructions, with every register,
+        flag and the program counter as if each instruction had run on its own.
+        """
+        if hook is None and self.jit:
+            return self._run_jit(max_steps)
+        runtime = self.runtime
+        prog_len = self._prog_len
+        pc = runtime.p_counter
+        steps = 0
+        if hook is not None:
+            dispatch = self._dispatch
+            limit = -1 if max_steps is None else max_steps
+            while pc < prog_len and steps != limit:
+                hook(pc)
+                handler, operands = dispatch[pc]
+                handler(operands)
+                pc = runtime.p_counter
+                steps += 1
+        elif max_steps is None:
+            dispatch = self._fused_dispatch
+            while pc < prog_len:
+                handler, operands = dispatch[pc]
+                steps += handler(operands) or 1
+                pc = runtime.p_counter
+        else:
+            # A superinstruction may run two instructions, so the last one is always run alone
+            dispatch = self._fused_dispatch
+            limit = max_steps - 1
+            while pc < prog_len and steps < limit:
+                handler, operands = dispatch[pc]
+                steps += handler(operands) or 1
+                pc = runtime.p_counter
+            dispatch = self._dispatch
+            while pc < prog_len and steps < max_steps:
+                handler, operands = dispatch[pc]
+                handler(operands)
+                pc = runtime.p_counter
+                steps += 1
+        return steps
+
+    def _run_jit(self, max_steps=None):
+        # run() with hot loops compiled: a backward jump counts towards compiling the loop it lands on,
+        # and compiled loops are entered whenever execution reaches their head. Returns are not back edges,
+        # so call sites are never taken for loops. A loop that cannot be compiled, or whose entry checks
+        # fail, is tried again after twice as many back edges.
+        runtime = self.runtime
+        prog_len = self._prog_len
+        dispatch = self._fused_dispatch
+        loops = self._loops
+        back_edges = self._back_edges
+        thresholds = self._jit_thresholds
+        ends_in_jump = self._ends_in_jump
+        limit = sys.maxsize if max_steps is None else max_steps - 1
+        pc = runtime.p_counter
+        steps = 0
+        while pc < prog_len and steps < limit:
+            loop = loops[pc]
+            if loop is not None:
+                executed = loop(limit - steps)
+                if executed:
+                    steps += executed
+                    pc = runtime.p_counter
+                    continue
+                if executed is None:
+                    # Compiled for register types the loop no longer starts with
+                    loops[pc] = None
+                    back_edges[pc] = 0
+                    thresholds[pc] *= 2
+            handler, operands = dispatch[pc]
+            steps += handler(operands) or 1
+            next_pc = runtime.p_counter
+            if next_pc < pc and ends_in_jump[pc]:
+                back_edges[next_pc] += 1
+                if back_edges[next_pc] == thresholds[next_pc]:
+                    loops[next_pc] = compile_loop(self, next_pc)
+                    if loops[next_pc] is None:
+                        back_edges[next_pc] = 0
+                        thresholds[next_pc] *= 2
+            pc = next_pc
+        if max_steps is not None:
+            dispatch = self._dispatch
+            while pc < prog_len and steps < max_steps:
+                handler, operands = dispatch[pc]
+                handler(operands)
+                pc = runtime.p_counter
+                steps += 1
+        return steps
+
     # Define the execute functions
     def _execute_move(self, operands):
-        source_reg = operands[0].value
-        target_reg = operands[1].value
-        source_val_type = self.runtime.get_register(source_reg)
-        if source_val_type is None:
-            self._report_error(f"Runtime Error: Source register {source_reg} is not initialized.")
+        source_reg, target_reg = operands
+        values = self._values
+        if values[source_reg] is None:
+            self._report_error(f"Runtime Error: Source register {register_name(source_reg)} is not initialized.")
             self.runtime.set_program_counter(self._prog_len)
         else:
-            self.runtime.set_register(target_reg, source_val_type[0], source_val_type[1])
+            values[target_reg] = values[source_reg]
+            self._types[target_reg] = self._types[source_reg]
             self.runtime.increment_program_counter()
 
     def _execute_load(self, operands):
-        source = operands[0].value
-        target_reg = operands[1].value
-        match source[0]:
-            case 'r':
-                source_val_type = self.runtime.get_register(source)
-                if source_val_type[1] != OperandType.MEMORY_ADDRESS:
-                    self._report_error(f"Runtime Error: Source register {target_reg[0]} does not contain a memory address.")
-                    self.runtime.set_program_counter(self._prog_len)
-                elif not self.runtime.addr_initialized(source_val_type[0]):
-                    self._report_error(f"Runtime Error: Memory address {source_val_type[0]} is not initialized.")
-                    self.runtime.set_program_counter(self._prog_len)
-                else:
-                    mem_val_type = self.runtime.get_memory(source_val_type[0])
-                    self.runtime.set_register(target_reg, mem_val_type[0], mem_val_type[1])
-                    self.runtime.increment_program_counter()
-            case 'm':
-                source_mem = source[2:len(source) - 1]
-                if not self.runtime.addr_initialized(source_mem):
-                    self._report_error(f"Runtime Error: Memory address {source_mem} is not initialized.")
-                    self.runtime.set_program_counter(self._prog_len)
-                else:
-                    mem_val_type = self.runtime.get_memory(source_mem)
-                    self.runtime.set_register(target_reg, mem_val_type[0], mem_val_type[1])
-                    self.runtime.increment_program_counter()
+        source_is_reg, source, target_reg = operands
+        if source_is_reg:
+            if self._values[source] is None or self._types[source] != OperandType.MEMORY_ADDRESS:
+                self._report_error(f"Runtime Error: Source register {register_name(source)} does not contain a memory address.")
+                self.runtime.set_program_counter(self._prog_len)
+                return
+            source = self._values[source]
+        if not self.runtime.addr_initialized(source):
+            self._report_error(f"Runtime Error: Memory address {source} is not initialized.")
+            self.runtime.set_program_counter(self._prog_len)
+        else:
+            mem_val_type = self.runtime.get_memory(source)
+            self._values[target_reg] = mem_val_type[0]
+            self._types[target_reg] = mem_val_type[1]
+            self.runtime.increment_program_counter()
 
     def _execute_store(self, operands):
-        source_reg = operands[0].value
-        target = operands[1].value
-        source_val_type = self.runtime.get_register(source_reg)
-        match target[0]:
-            case 'r':
-                target_val_type = self.runtime.get_register(target)
-                if source_val_type is None:
-                    self._report_error(f"Runtime Error: Source register {source_reg} is uninitialized.")
-                    self.runtime.set_program_counter(self._prog_len)
-                elif target_val_type[1] != OperandType.MEMORY_ADDRESS:
-                    self._report_error(f"Runtime Error: Target register {target} does not contain a memory address.")
-                    self.runtime.set_program_counter(self._prog_len)
-                else:
-                    self.runtime.set_memory(target_val_type[0], source_val_type[0], source_val_type[1])
-                    self.runtime.increment_program_counter()
-            case 'm':
-                target_mem = target[2:len(target) - 1]
-                if source_val_type is None:
-                    self._report_error(f"Runtime Error: Source register {source_reg} is uninitialized.")
-                    self.runtime.set_program_counter(self._prog_len)
-                else:
-                    self.runtime.set_memory(target_mem, source_val_type[0], source_val_type[1])
-                    self.runtime.increment_program_counter()
-
+        source_reg, target_is_reg, target = operands
+        values = self._values
+        if values[source_reg] is None:
+            self._report_error(f"Runtime Error: Source register {register_name(source_reg)} is uninitialized.")
+            self.runtime.set_program_counter(self._prog_len)
+            return
+        if target_is_reg:
+            if values[target] is None or self._types[target] != OperandType.MEMORY_ADDRESS:
+                self._report_error(f"Runtime Error: Target register {register_name(target)} does not contain a memory address.")
+                self.runtime.set_program_counter(self._prog_len)
+                return
+            target = values[target]
+        if not self.runtime.addr_in_range(target):
+            self._report_error(f"Runtime Error: Memory address {target} is out of range.")
+            self.runtime.set_program_counter(self._prog_len)
+            return
+        self.runtime.set_memory(target, values[source_reg], self._types[source_reg])
+        self.runtime.increment_program_counter()
 
     def _execute_create(self, operands):
-        val_type = self._convert_type_enum(operands[0].value)
-        val = self._convert_value(operands[1])
-        reg = operands[2].value
-        self.runtime.set_register(reg, val, val_type)
+        val_type, val, reg = operands
+        self._values[reg] = val
+        self._types[reg] = val_type
         self.runtime.increment_program_counter()
 
     def _execute_cast(self, operands):
-        type = operands[0].value
-        target_reg = operands[1].value
-        type_val = self.runtime.get_memory(target_reg)
-        if type_val is None:
-            self._report_error(f"Runtime Error: Target register {target_reg} is uninitialized.")
+        type, target_reg = operands
+        value = self._values[target_reg]
+        if value is None:
+            self._report_error(f"Runtime Error: Target register {register_name(target_reg)} is uninitialized.")
             self.runtime.set_program_counter(self._prog_len)
         else:
-            if type_val[1] == OperandType.BOOLEAN:
-                match type_val[0]:
-                    case True:
-                        type_val[0] = 1
-                    case _:
-                        type_val[0] = 0
+            if self._types[target_reg] == OperandType.BOOLEAN:
+                value = 1 if value is True else 0
             match type:
-                case "integer":
-                    self.runtime.set_register(target_reg, type_val[0], OperandType.INTEGER)
-                case "memory":
-                    self.runtime.set_register(target_reg, type_val[0], OperandType.MEMORY_ADDRESS)
-                case "boolean":
-                    if type_val[0] % 2 == 1:
+                case OperandType.INTEGER:
+                    self.runtime.set_register(target_reg, value, OperandType.INTEGER)
+                case OperandType.MEMORY_ADDRESS:
+                    self.runtime.set_register(target_reg, value, OperandType.MEMORY_ADDRESS)
+                case OperandType.BOOLEAN:
+                    if value % 2 == 1:
                         self.runtime.set_register(target_reg, True, OperandType.MEMORY_ADDRESS)
                     else:
                         self.runtime.set_register(target_reg, False, OperandType.MEMORY_ADDRESS)
-                case "character":
-                    type_val[0] %= 128
-                    self.runtime.set_register(target_reg, type_val[0], OperandType.CHARACTER)
+                case OperandType.CHARACTER:
+                    self.runtime.set_register(target_reg, value % 128, OperandType.CHARACTER)
             self.runtime.increment_program_counter()
 
     def _execute_add(self, operands):
-        permitted_types = [OperandType.INTEGER, OperandType.MEMORY_ADDRESS, OperandType.BOOLEAN, OperandType.CHARACTER]
-        source_reg_1 = operands[0].value
-        source_reg_2 = operands[1].value
-        dest_reg = operands[2].value
-        s1_val_type = self.runtime.get_register(source_reg_1)
-        s2_val_type = self.runtime.get_register(source_reg_2)
-        if s1_val_type is None or s2_val_type is None:
-            self._report_error(f"Runtime Error: Source reg {source_reg_1} and/or source reg {source_reg_2} is not initialized.")
-            self.runtime.set_program_counter(self._prog_len)
-        elif s1_val_type[1] != s2_val_type[1]:
-            self._report_error(f"Runtime Error: {source_reg_1} and {source_reg_2} are of different types {s1_val_type[1]}, {s2_val_type[1]}.")
-            self.runtime.set_program_counter(self._prog_len)
-        elif s1_val_type[1] not in permitted_types:
-            self._report_error(f"Runtime Error: {source_reg_1} and {source_reg_2} are of incompatible types {s1_val_type[1]}, {s2_val_type[1]} for addition.")
-            self.runtime.set_program_counter(self._prog_len)
-        else:
-            result = s1_val_type[0] + s2_val_type[0]
-            self.runtime.set_register(dest_reg, self._handle_overflow(result, s1_val_type[1]), s1_val_type[1])
+        source_reg_1, source_reg_2, dest_reg = operands
+        if self._check_operands(source_reg_1, source_reg_2, ARITHMETIC_TYPES, "addition"):
+            values = self._values
+            s_type = self._types[source_reg_1]
+            values[dest_reg] = self._handle_overflow(values[source_reg_1] + values[source_reg_2], s_type)
+            self._types[dest_reg] = s_type
             self.runtime.increment_program_counter()
 
     def _execute_sub(self, operands):
-        permitted_types = [OperandType.INTEGER, OperandType.MEMORY_ADDRESS, OperandType.BOOLEAN, OperandType.CHARACTER]
-        source_reg_1 = operands[0].value
-        source_reg_2 = operands[1].value
-        dest_reg = operands[2].value
-        s1_val_type = self.runtime.get_register(source_reg_1)
-        s2_val_type = self.runtime.get_register(source_reg_2)
-        if s1_val_type is None or s2_val_type is None:
-            self._report_error(f"Runtime Error: Source reg {source_reg_1} and/or source reg {source_reg_2} is not initialized.")
-            self.runtime.set_program_counter(self._prog_len)
-        elif s1_val_type[1] != s2_val_type[1]:
-            self._report_error(f"Runtime Error: {source_reg_1} and {source_reg_2} are of different types {s1_val_type[1]}, {s2_val_type[1]}.")
-            self.runtime.set_program_counter(self._prog_len)
-        elif s1_val_type[1] not in permitted_types:
-            self._report_error(f"Runtime Error: {source_reg_1} and {source_reg_2} are of incompatible types {s1_val_type[1]}, {s2_val_type[1]} are of different types for subtraction.")
-            self.runtime.set_program_counter(self._prog_len)
-        else:
-            result = s1_val_type[0] - s2_val_type[0]
-            self.runtime.set_register(dest_reg, self._handle_overflow(result, s1_val_type[1]), s1_val_type[1])
+        source_reg_1, source_reg_2, dest_reg = operands
+        if self._check_operands(source_reg_1, source_reg_2, ARITHMETIC_TYPES, "subtraction"):
+            values = self._values
+            s_type = self._types[source_reg_1]
+            values[dest_reg] = self._handle_overflow(values[source_reg_1] - values[source_reg_2], s_type)
+            self._types[dest_reg] = s_type
             self.runtime.increment_program_counter()
 
     def _execute_multiply(self, operands):
-        permitted_types = [OperandType.INTEGER, OperandType.MEMORY_ADDRESS, OperandType.BOOLEAN, OperandType.CHARACTER]
-        source_reg_1 = operands[0].value
-        source_reg_2 = operands[1].value
-        dest_reg = operands[2].value
-        s1_val_type = self.runtime.get_register(source_reg_1)
-        s2_val_type = self.runtime.get_register(source_reg_2)
-        if s1_val_type is None or s2_val_type is None:
-            self._report_error(f"Runtime Error: Source reg {source_reg_1} and/or source reg {source_reg_2} is not initialized.")
-            self.runtime.set_program_counter(self._prog_len)
-        elif s1_val_type[1] != s2_val_type[1]:
-            self._report_error(f"Runtime Error: {source_reg_1} and {source_reg_2} are of different types {s1_val_type[1]}, {s2_val_type[1]}.")
-            self.runtime.set_program_counter(self._prog_len)
-        elif s1_val_type[1] not in permitted_types:
-            self._report_error(f"Runtime Error: {source_reg_1} and {source_reg_2} are of incompatible types {s1_val_type[1]}, {s2_val_type[1]} are of different types for multiplication.")
-            self.runtime.set_program_counter(self._prog_len)
-        else:
-            result = s1_val_type[0] * s2_val_type[0]
-            self.runtime.set_register(dest_reg, self._handle_overflow(result, s1_val_type[1]), s1_val_type[1])
+        source_reg_1, source_reg_2, dest_reg = operands
+        if self._check_operands(source_reg_1, source_reg_2, ARITHMETIC_TYPES, "multiplication"):
+            values = self._values
+            s_type = self._types[source_reg_1]
+            values[dest_reg] = self._handle_overflow(values[source_reg_1] * values[source_reg_2], s_type)
+            self._types[dest_reg] = s_type
             self.runtime.increment_program_counter()
 
     def _execute_divide(self, operands):
-        permitted_types = [OperandType.INTEGER]
-        source_reg_1 = operands[0].value
-        source_reg_2 = operands[1].value
-        dest_reg = operands[2].value
-        s1_val_type = self.runtime.get_register(source_reg_1)
-        s2_val_type = self.runtime.get_register(source_reg_2)
-        if s1_val_type is None or s2_val_type is None:
-            self._report_error(f"Runtime Error: Source reg {source_reg_1} and/or source reg {source_reg_2} is not initialized.")
-            self.runtime.set_program_counter(self._prog_len)
-        elif s1_val_type[1] != s2_val_type[1]:
-            self._report_error(f"Runtime Error: {source_reg_1} and {source_reg_2} are of different types {s1_val_type[1]}, {s2_val_type[1]}.")
-            self.runtime.set_program_counter(self._prog_len)
-        elif s1_val_type[1] not in permitted_types:
-            self._report_error(f"Runtime Error: {source_reg_1} and {source_reg_2} are of incompatible types {s1_val_type[1]}, {s2_val_type[1]} are of different types for division.")
-            self.runtime.set_program_counter(self._prog_len)
-        else:
-            result = s1_val_type[0] // s2_val_type[0]
-            self.runtime.set_register(dest_reg, self._handle_overflow(result, s1_val_type[1]), s1_val_type[1])
+        source_reg_1, source_reg_2, dest_reg = operands
+        if self._check_operands(source_reg_1, source_reg_2, DIVISION_TYPES, "division"):
+            values = self._values
+            if values[source_reg_2] == 0:
+                self._report_division_by_zero(source_reg_2)
+                return
+            s_type = self._types[source_reg_1]
+            values[dest_reg] = self._handle_overflow(values[source_reg_1] // values[source_reg_2], s_type)
+            self._types[dest_reg] = s_type
             self.runtime.increment_program_counter()
 
     def _execute_or(self, operands):
-        reg_1 = operands[0].value
-        reg_2 = operands[1].value
-        s1_val_type = self.runtime.get_register(reg_1)
-        s2_val_type = self.runtime.get_register(reg_2)
-        if s1_val_type is None or s2_val_type is None:
-            self._report_error(f"Runtime Error: Source reg {reg_1} and/or source reg {reg_2} is not initialized.")
-            self.runtime.set_program_counter(self._prog_len)
-        elif s1_val_type[1] != s2_val_type[1]:
-            self._report_error(
-                f"Runtime Error: {reg_1} and {reg_2} are of different types {s1_val_type[1]}, {s2_val_type[1]}.")
-            self.runtime.set_program_counter(self._prog_len)
-        else:
-            mask = 0xFFFFFFFF
-            s1_val_type[0] &= mask
-            s2_val_type[0] &= mask
-            result = s1_val_type[0] | s2_val_type[0]
-            result &= mask
-            self.runtime.set_register(reg_1, self._handle_overflow(result, s1_val_type[1]), s1_val_type[1])
+        reg_1, reg_2 = operands
+        if self._check_operands(reg_1, reg_2):
+            values = self._values
+            result = (values[reg_1] & MASK_32) | (values[reg_2] & MASK_32)
+            values[reg_1] = self._handle_overflow(result, self._types[reg_1])
             self.runtime.increment_program_counter()
 
     def _execute_and(self, operands):
-        reg_1 = operands[0].value
-        reg_2 = operands[1].value
-        s1_val_type = self.runtime.get_register(reg_1)
-        s2_val_type = self.runtime.get_register(reg_2)
-        if s1_val_type is None or s2_val_type is None:
-            self._report_error(f"Runtime Error: Source reg {reg_1} and/or source reg {reg_2} is not initialized.")
-            self.runtime.set_program_counter(self._prog_len)
-        elif s1_val_type[1] != s2_val_type[1]:
-            self._report_error(
-                f"Runtime Error: {reg_1} and {reg_2} are of different types {s1_val_type[1]}, {s2_val_type[1]}.")
-            self.runtime.set_program_counter(self._prog_len)
-        else:
-            mask = 0xFFFFFFFF
-            s1_val_type[0] &= mask
-            s2_val_type[0] &= mask
-            result = s1_val_type[0] & s2_val_type[0]
-            self.runtime.set_register(reg_1, self._handle_overflow(result, s1_val_type[1]), s1_val_type[1])
+        reg_1, reg_2 = operands
+        if self._check_operands(reg_1, reg_2):
+            values = self._values
+            result = (values[reg_1] & MASK_32) & (values[reg_2] & MASK_32)
+            values[reg_1] = self._handle_overflow(result, self._types[reg_1])
             self.runtime.increment_program_counter()
 
     def _execute_not(self, operands):
-        reg = operands[0].value
-        val_type = self.runtime.get_register(reg)
-        if val_type is None:
-            self._report_error(f"Runtime Error: Source register {reg} is not initialized.")
+        reg, = operands
+        value = self._values[reg]
+        if value is None:
+            self._report_error(f"Runtime Error: Source register {register_name(reg)} is not initialized.")
             self.runtime.set_program_counter(self._prog_len)
         else:
-            if val_type[1] == OperandType.BOOLEAN:
-                self.runtime.set_register(reg, self._handle_overflow((not val_type[0]), val_type[1]), OperandType.BOOLEAN)
-                self.runtime.increment_program_counter()
+            val_type = self._types[reg]
+            if val_type == OperandType.BOOLEAN:
+                self._values[reg] = self._handle_overflow((not value), val_type)
             else:
-                mask = 0xFFFFFFFF
-                value = mask & val_type[0]
-                result = ~value & mask
-                self.runtime.set_register(reg, self._handle_overflow(result, val_type[1]), val_type[1])
-                self.runtime.increment_program_counter()
+                result = ~(value & MASK_32) & MASK_32
+                self._values[reg] = self._handle_overflow(result, val_type)
+            self.runtime.increment_program_counter()
 
     def _execute_shift(self, operands):
-        direction = operands[0].value
-        source_reg = operands[1].value
-        shift_reg = operands[2].value
-        source_val_type = self.runtime.get_register(source_reg)
-        shift_val_type = self.runtime.get_register(shift_reg)
-        if source_val_type is None:
-            self._report_error(f"Runtime Error: Source register {source_reg} is not initialized.")
+        is_left, source_reg, shift_reg = operands
+        values = self._values
+        if values[source_reg] is None:
+            self._report_error(f"Runtime Error: Source register {register_name(source_reg)} is not initialized.")
             self.runtime.set_program_counter(self._prog_len)
-        elif shift_val_type is None:
-            self._report_error(f"Runtime Error: Shift register {shift_reg} is not initialized.")
+        elif values[shift_reg] is None:
+            self._report_error(f"Runtime Error: Shift register {register_name(shift_reg)} is not initialized.")
             self.runtime.set_program_counter(self._prog_len)
-        elif shift_val_type[1] != OperandType.INTEGER:
-            self._report_error(f"Runtime Error: Shift register {shift_reg} does not contain type int.")
+        elif self._types[shift_reg] != OperandType.INTEGER:
+            self._report_error(f"Runtime Error: Shift register {register_name(shift_reg)} does not contain type int.")
             self.runtime.set_program_counter(self._prog_len)
         else:
-            if source_val_type[1] == OperandType.BOOLEAN:
-                self.runtime.set_register(source_reg, self._handle_overflow(False, OperandType.BOOLEAN), OperandType.BOOLEAN)
-                self.runtime.increment_program_counter()
+            source_type = self._types[source_reg]
+            if source_type == OperandType.BOOLEAN:
+                values[source_reg] = self._handle_overflow(False, OperandType.BOOLEAN)
             else:
-                mask = 0xFFFFFFFF
-                shift = shift_val_type[0]
-                value = source_val_type[0]&mask
-                result = None
-                if direction == "left":
-                    result = (value << shift) & mask
+                shift = values[shift_reg]
+                value = values[source_reg] & MASK_32
+                if is_left:
+                    result = (value << shift) & MASK_32
                 else:
                     if value > 0x7FFFFFFF:
-                        value -= 0x100000000
-                    result = (value >> shift) & mask
-                self.runtime.set_register(source_reg, self._handle_overflow(result, source_val_type[1]), source_val_type[1])
-                self.runtime.increment_program_counter()
+                        value -= WRAP_32
+                    result = (value >> shift) & MASK_32
+                values[source_reg] = self._handle_overflow(result, source_type)
+            self.runtime.increment_program_counter()
 
     def _execute_compare(self, operands):
-        permitted_types = [OperandType.INTEGER, OperandType.MEMORY_ADDRESS, OperandType.BOOLEAN, OperandType.CHARACTER]
-        source_reg_1 = operands[0].value
-        source_reg_2 = operands[1].value
-        s1_val_type = self.runtime.get_register(source_reg_1)
-        s2_val_type = self.runtime.get_register(source_reg_2)
-        if s1_val_type is None or s2_val_type is None:
-            self._report_error(f"Runtime Error: Source reg {source_reg_1} and/or source reg {source_reg_2} is not initialized.")
-            self.runtime.set_program_counter(self._prog_len)
-        elif s1_val_type[1] != s2_val_type[1]:
-            self._report_error(f"Runtime Error: {source_reg_1} and {source_reg_2} are of different types {s1_val_type[1]}, {s2_val_type[1]}.")
-            self.runtime.set_program_counter(self._prog_len)
-        elif s1_val_type[1] not in permitted_types:
-            self._report_error(f"Runtime Error: {source_reg_1} and {source_reg_2} are of incompatible types {s1_val_type[1]}, {s2_val_type[1]} are of different types for subtraction.")
-            self.runtime.set_program_counter(self._prog_len)
-        else:
-            result = s1_val_type[0] - s2_val_type[0]
-            self._handle_overflow(result, s1_val_type[1])
+        source_reg_1, source_reg_2 = operands
+        if self._check_operands(source_reg_1, source_reg_2, ARITHMETIC_TYPES, "subtraction"):
+            values = self._values
+            self._handle_overflow(values[source_reg_1] - values[source_reg_2], self._types[source_reg_1])
             self.runtime.increment_program_counter()
 
     def _execute_jump(self, operands):
-        condition = operands[0].value
-        destination = int(operands[1].value[2:len(operands[1].value) - 1])
-        s_flag = self.runtime.get_flag('s')
-        o_flag = self.runtime.get_flag('o')
-        z_flag = self.runtime.get_flag('z')
-        match condition:
-            case "greater" if not z_flag and (s_flag == o_flag):
-                self.runtime.set_program_counter(destination)
-            case "less" if s_flag != o_flag:
-                self.runtime.set_program_counter(destination)
-            case "equal" | "zero" if z_flag:
-                self.runtime.set_program_counter(destination)
-            case "unequal" | "nonzero" if not z_flag:
-                self.runtime.set_program_counter(destination)
-            case "negative" if s_flag:
-                self.runtime.set_program_counter(destination)
-            case "positive" if not s_flag and not z_flag:
-                self.runtime.set_program_counter(destination)
-            case "unconditional":
-                self.runtime.set_program_counter(destination)
-            case _:
-                self.runtime.increment_program_counter()
+        condition, destination = operands
+        runtime = self.runtime
+        value = runtime.flag_value
+        overflow = runtime.overflow_value
+        if condition(value == 0, value < 0, overflow < INT32_MIN or overflow > INT32_MAX):
+            runtime.set_program_counter(destination)
+        else:
+            runtime.increment_program_counter()
 
     def _execute_call(self, operands):
-        destination = int(operands[1].value[2:len(operands[1].value) - 1])
+        destination, = operands
         curr_line = self.runtime.get_program_counter()
         self.runtime.push_stack(curr_line+1, OperandType.INSTRUCTION_ADDRESS)
         self.runtime.set_program_counter(destination)
 
     def _execute_push(self, operands):
-        source_reg = operands[0].value
-        source_val_type = self.runtime.get_register(source_reg)
-        if source_val_type is None:
-            self._report_error(f"Runtime Error: Source register {source_reg} is not initialized.")
+        source_reg, = operands
+        value = self._values[source_reg]
+        if value is None:
+            self._report_error(f"Runtime Error: Source register {register_name(source_reg)} is not initialized.")
             self.runtime.set_program_counter(self._prog_len)
         else:
-            self.runtime.push_stack(source_val_type[0], source_val_type[1])
+            self.runtime.push_stack(value, self._types[source_reg])
             self.runtime.increment_program_counter()
 
     def _execute_pop(self, operands):
-        dest_reg = operands[0].value
-        stack_top = self.runtime.pop_stack
+        dest_reg, = operands
+        stack_top = self.runtime.pop_stack()
         if stack_top is None:
             self._report_error(f"Runtime Error: Empty stack referenced.")
             self.runtime.set_program_counter(self._prog_len)
         else:
-            self.runtime.set_register(dest_reg, stack_top[0], stack_top[1])
+            self._values[dest_reg] = stack_top[0]
+            self._types[dest_reg] = stack_top[1]
             self.runtime.increment_program_counter()
 
     def _execute_return(self, operands):
@@ -393,7 +415,10 @@ class ExecutionEngine:
             self._report_error(f"Runtime Error: Empty stack referenced when trying to return.")
             self.runtime.set_program_counter(self._prog_len)
         elif dest_line[1] != OperandType.INSTRUCTION_ADDRESS:
-            self._report_error(f"Runtime Error: Attempted to return from non-instruction address '{self._convert_output(dest_line[0])}'")
+            self._report_error(f"Runtime Error: Attempted to return from non-instruction address '{self._convert_output(dest_line)}'")
+            self.runtime.set_program_counter(self._prog_len)
+        elif dest_line[0] not in self._return_sites:
+            self._report_error(f"Runtime Error: Attempted to return to i[{dest_line[0]}], which does not follow a call.")
             self.runtime.set_program_counter(self._prog_len)
         else:
             self.runtime.set_program_counter(dest_line[0])
@@ -402,9 +427,9 @@ class ExecutionEngine:
         self.runtime.set_program_counter(self._prog_len)
 
     def _execute_input(self, operands):
-        input_type = self._convert_type_enum(operands[0].value)
-        input_dest = operands[1].value
-        user_input = input("stdin: ")
+        input_type, input_dest = operands
+        self.output.flush()  # Output written so far comes before the prompt
+        user_input = self.read_input("stdin: ")
         if len(user_input) > 0:
             if input_type == OperandType.INTEGER:
                 try:
@@ -412,12 +437,12 @@ class ExecutionEngine:
                     self.runtime.set_register(input_dest, user_input, input_type)
                     self.runtime.increment_program_counter()
                 except ValueError:
-                    self._report_error(f"Input Error: Invalid input {user_input} for type int.")
+                    self._report_error(f"Input Error: Invalid input {user_input} for type int.", fatal=False)
             elif input_type == OperandType.CHARACTER:
                 if len(user_input) > 1:
-                    self._report_error(f"Input Error: Excess input {user_input} for type char.")
+                    self._report_error(f"Input Error: Excess input {user_input} for type char.", fatal=False)
                 elif ord(user_input) > 127:
-                    self._report_error(f"Input Error: Input {user_input} out of ASCII range.")
+                    self._report_error(f"Input Error: Input {user_input} out of ASCII range.", fatal=False)
                 else:
                     self.runtime.set_register(input_dest, ord(user_input), input_type)
                     self.runtime.increment_program_counter()
@@ -425,7 +450,7 @@ class ExecutionEngine:
                 valid_trues = ['true', '1', 'True', 't', 'TRUE', 'T']
                 valid_falses = ['false', '0', 'False', 'f', 'FALSE', 'F']
                 if user_input not in valid_trues or user_input not in valid_falses:
-                    self._report_error(f"Input Error: Invalid input {user_input} for type bool.")
+                    self._report_error(f"Input Error: Invalid input {user_input} for type bool.", fatal=False)
                 elif user_input in valid_trues:
                     self.runtime.set_register(input_dest, True, input_type)
                     self.runtime.increment_program_counter()
@@ -434,69 +459,180 @@ class ExecutionEngine:
                     self.runtime.increment_program_counter()
 
     def _execute_output(self, operands):
-        source_reg = operands[0].value
+        source_reg, = operands
         source_val_type = self.runtime.get_register(source_reg)
         if source_val_type is None:
-            self._report_error(f"Runtime Error: {source_reg} is not defined.")
+            self._report_error(f"Runtime Error: {register_name(source_reg)} is not defined.")
             self.runtime.set_program_counter(self._prog_len)
         else:
-            converted_output = self._convert_output(source_val_type)
-            if not self._silent_o:
-                print(converted_output, end="")
+            self.output.write(str(self._convert_output(source_val_type)))
             self.runtime.increment_program_counter()
 
     def _execute_print(self, operands):
-        if not self._silent_o:
-            if operands[0].value == "newline":
-                print()
-            else:
-                print(operands[0].value[1:(len(operands[0].value)-1)], end="")
+        self.output.write(operands[0])
         self.runtime.increment_program_counter()
 
     def _execute_pass(self, operands):
         self.runtime.increment_program_counter()
 
+    # Handlers for instructions whose operands always have one permitted type, so nothing is checked
+    def _execute_add_unchecked(self, operands):
+        source_reg_1, source_reg_2, dest_reg = operands
+        values = self._values
+        s_type = self._types[source_reg_1]
+        values[dest_reg] = self._handle_overflow(values[source_reg_1] + values[source_reg_2], s_type)
+        self._types[dest_reg] = s_type
+        self.runtime.p_counter += 1
+
+    def _execute_sub_unchecked(self, operands):
+        source_reg_1, source_reg_2, dest_reg = operands
+        values = self._values
+        s_type = self._types[source_reg_1]
+        values[dest_reg] = self._handle_overflow(values[source_reg_1] - values[source_reg_2], s_type)
+        self._types[dest_reg] = s_type
+        self.runtime.p_counter += 1
+
+    def _execute_multiply_unchecked(self, operands):
+        source_reg_1, source_reg_2, dest_reg = operands
+        values = self._values
+        s_type = self._types[source_reg_1]
+        values[dest_reg] = self._handle_overflow(values[source_reg_1] * values[source_reg_2], s_type)
+        self._types[dest_reg] = s_type
+        self.runtime.p_counter += 1
+
+    def _execute_divide_unchecked(self, operands):
+        # The operand types are known, the divisor still has to be checked
+        source_reg_1, source_reg_2, dest_reg = operands
+        values = self._values
+        if values[source_reg_2] == 0:
+            self._report_division_by_zero(source_reg_2)
+            return
+        s_type = self._types[source_reg_1]
+        values[dest_reg] = self._handle_overflow(values[source_reg_1] // values[source_reg_2], s_type)
+        self._types[dest_reg] = s_type
+        self.runtime.p_counter += 1
+
+    def _execute_compare_unchecked(self, operands):
+        source_reg_1, source_reg_2 = operands
+        values = self._values
+        self._handle_overflow(values[source_reg_1] - values[source_reg_2], self._types[source_reg_1])
+        self.runtime.p_counter += 1
+
+    # Superinstructions, each returning the number of instructions it executed
+    def _execute_compare_jump(self, operands):
+        (source_reg_1, source_reg_2), (condition, destination) = operands
+        values = self._values
+        types = self._types
+        s_type = types[source_reg_1]
+        value_1 = values[source_reg_1]
+        value_2 = values[source_reg_2]
+        if value_1 is None or value_2 is None or s_type != types[source_reg_2] or s_type not in ARITHMETIC_TYPES:
+            # Report the error as the compare itself would
+            self._execute_compare(operands[0])
+            return 1
+        self._handle_overflow(value_1 - value_2, s_type)
+        runtime = self.runtime
+        value = runtime.flag_value
+        overflow = runtime.overflow_value
+        if condition(value == 0, value < 0, overflow < INT32_MIN or overflow > INT32_MAX):
+            runtime.p_counter = destination
+        else:
+            runtime.p_counter += 2
+        return 2
+
+    def _execute_compare_jump_unchecked(self, operands):
+        (source_reg_1, source_reg_2), (condition, destination) = operands
+        values = self._values
+        self._handle_overflow(values[source_reg_1] - values[source_reg_2], self._types[source_reg_1])
+        runtime = self.runtime
+        value = runtime.flag_value
+        overflow = runtime.overflow_value
+        if condition(value == 0, value < 0, overflow < INT32_MIN or overflow > INT32_MAX):
+            runtime.p_counter = destination
+        else:
+            runtime.p_counter += 2
+        return 2
+
+    def _execute_then_jump(self, operands):
+        # A flag-setting instruction followed by a conditional jump
+        handler, first_operands, (condition, destination) = operands
+        runtime = self.runtime
+        next_pc = runtime.p_counter + 1
+        handler(first_operands)
+        if runtime.p_counter != next_pc:
+            return 1
+        value = runtime.flag_value
+        overflow = runtime.overflow_value
+        if condition(value == 0, value < 0, overflow < INT32_MIN or overflow > INT32_MAX):
+            runtime.p_counter = destination
+        else:
+            runtime.p_counter = next_pc + 1
+        return 2
+
+    def _execute_create_then(self, operands):
+        # A create followed by an instruction reading registers
+        (val_type, val, reg), handler, second_operands = operands
+        self._values[reg] = val
+        self._types[reg] = val_type
+        self.runtime.p_counter += 1
+        handler(second_operands)
+        return 2
+
+    def _fuse(self):
+        # Dispatch table where an instruction starting a common pair runs the pair as one superinstruction.
+        # Entries are per instruction, so a jump into the middle of a pair runs the second instruction alone.
+        dispatch = list(self._dispatch)
+        opcodes = [InstructionType(opcode) for opcode in self._opcodes]
+        operands = self._operands
+        handlers = [handler for handler, _ in self._dispatch]
+        safe = self.analysis.safe
+        for pc in range(len(opcodes) - 1):
+            first, second = opcodes[pc], opcodes[pc + 1]
+            if second == InstructionType.JUMP and first == InstructionType.COMPARE:
+                handler = self._execute_compare_jump_unchecked if safe[pc] else self._execute_compare_jump
+                dispatch[pc] = (handler, (operands[pc], operands[pc + 1]))
+            elif second == InstructionType.JUMP and first in FLAG_SETTING_TYPES:
+                dispatch[pc] = (self._execute_then_jump, (handlers[pc], operands[pc], operands[pc + 1]))
+            elif first == InstructionType.CREATE and second in CREATE_OPERAND_TYPES:
+                # Leave a compare that is itself followed by a jump to that pair
+                if second == InstructionType.COMPARE and pc + 2 < len(opcodes) and opcodes[pc + 2] == InstructionType.JUMP:
+                    continue
+                dispatch[pc] = (self._execute_create_then, (operands[pc], handlers[pc + 1], operands[pc + 1]))
+        return dispatch
+
 
     # HELPER FUNCTIONS
+    def _check_operands(self, reg_1, reg_2, permitted_types=None, operation=None):
+        # Validate two source registers, reporting a runtime error if they cannot be combined
+        values = self._values
+        types = self._types
+        if values[reg_1] is None or values[reg_2] is None:
+            self._report_error(f"Runtime Error: Source reg {register_name(reg_1)} and/or source reg {register_name(reg_2)} is not initialized.")
+        elif types[reg_1] != types[reg_2]:
+            self._report_error(f"Runtime Error: {register_name(reg_1)} and {register_name(reg_2)} are of different types {types[reg_1]}, {types[reg_2]}.")
+        elif permitted_types is not None and types[reg_1] not in permitted_types:
+            self._report_error(f"Runtime Error: {register_name(reg_1)} and {register_name(reg_2)} are of incompatible types {types[reg_1]}, {types[reg_2]} for {operation}.")
+        else:
+            return True
+        self.runtime.set_program_counter(self._prog_len)
+        return False
+
+    def _report_division_by_zero(self, divisor_reg):
+        self._report_error(f"Runtime Error: Division by zero, {register_name(divisor_reg)} contains 0.")
+        self.runtime.set_program_counter(self._prog_len)
+
     def _handle_overflow(self, result, type):
+        # Wrap the result and keep the results the flags are derived from, this runs for every arithmetic
+        # instruction while the flags are only worked out when a jump, breakpoint or dump reads them
+        runtime = self.runtime
         if type == OperandType.CHARACTER:
-            wrapped_result = result % 128
+            result %= 128
         else:
-            wrapped_result = (result + 2 ** 31) % 2 ** 32 - 2 ** 31
-            if result < INT32_MIN or result > INT32_MAX:
-                self.runtime.set_flag('o', True)
-            else:
-                self.runtime.set_flag('o', False)
-        if wrapped_result == 0:
-            self.runtime.set_flag('z', True)
-            self.runtime.set_flag('s', False)
-        elif wrapped_result < 0:
-            self.runtime.set_flag('z', False)
-            self.runtime.set_flag('s', True)
-        else:
-            self.runtime.set_flag('z', False)
-            self.runtime.set_flag('s', False)
-        return wrapped_result
-
+            runtime.overflow_value = result
+            result = (result - INT32_MIN) % WRAP_32 + INT32_MIN
+        runtime.flag_value = result
+        return result
 
-    def _convert_value(self, operand):
-        op_type = operand.operand_type
-        match op_type:
-            case OperandType.MEMORY_ADDRESS | OperandType.INSTRUCTION_ADDRESS:
-                return int(operand.value[2:len(operand.value) - 1])
-            case OperandType.INTEGER:
-                return int(operand.value)
-            case OperandType.BOOLEAN:
-                if operand.value == 'true':
-                    return True
-                elif operand.value == 'false':
-                    return False
-            case OperandType.CHARACTER:
-                return ord(operand.value)
-            case OperandType.STRING:
-                return str(operand.value)
-            case _:
-                return None
 
     def _convert_output(self, operand):
         op_type = operand[1]
@@ -520,18 +656,10 @@ class ExecutionEngine:
             case _:
                 return None
 
-    def _convert_type_enum(self, str_type):
-        match str_type:
-            case "integer":
-                return OperandType.INTEGER
-            case "boolean":
-                return OperandType.BOOLEAN
-            case "character":
-                return OperandType.CHARACTER
-            case "memory":
-                return OperandType.MEMORY_ADDRESS
-
-    def _report_error(self, str):
+    def _report_error(self, str, fatal=True):
+        if fatal:
+            self.last_error = str
         if not self._silent_r:
+            self.output.flush()
             print(str)
 
@@ -0,0 +1,181 @@
+from collections import deque
+from ignition.ast import InstructionType, OperandType
+from ignition.output import NullSink
+from ignition.runtime import SP_REGISTER
+
+DEFAULT_BUDGET = 64 * 1024 * 1024  # Bytes of undo log kept in memory
+ENTRY_COST = 200  # Approximate bytes per logged instruction
+DEFAULT_SNAPSHOT_INTERVAL = 100_000  # Instructions between full snapshots
+DEFAULT_MAX_SNAPSHOTS = 32
+
+
+class ExecutionHistory:
+    """Bounded undo log of per-instruction state deltas, used for reverse stepping.
+
+    Before each instruction runs, the log records its program counter, the flags
+    and the previous contents of the registers and memory cell it can write. The
+    write set of every instruction is known from its decoded operands, so recording
+    never has to diff state. Once the log is over budget the oldest entries are
+    dropped. Full copy-on-write snapshots are taken periodically, so stepping back
+    past the log restores the nearest snapshot and replays forward from it, feeding
+    back recorded input.
+    """
+    def __init__(self, runtime, engine, base_snapshot, budget=DEFAULT_BUDGET,
+                 snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL, max_snapshots=DEFAULT_MAX_SNAPSHOTS):
+        self.runtime = runtime
+        self.engine = engine
+        self.step = 0  # Instructions executed since the base snapshot
+        self.snapshot_interval = snapshot_interval
+        self._next_snapshot = snapshot_interval  # Step at which the next snapshot is taken
+        self._log = deque(maxlen=max(budget // ENTRY_COST, 1))
+        self._base = base_snapshot  # State at step 0, never evicted
+        self._snapshots = deque(maxlen=max_snapshots)  # (step, RuntimeSnapshot)
+        self._inputs = {}  # Step -> raw input read by that step
+        self._reg_writes, self._mem_writes = _write_sets(engine.program)
+        self._read_input = engine.read_input
+        engine.read_input = self._record_input
+
+    # PUBLIC METHODS
+    def record(self, pc):
+        runtime = self.runtime
+        if self.step == self._next_snapshot:
+            self._snapshots.append((self.step, runtime.snapshot()))
+            self._next_snapshot += self.snapshot_interval
+        values = runtime.reg_values
+        types = runtime.reg_types
+        regs = self._reg_writes[pc]
+        reg_undo = tuple([(reg, values[reg], types[reg]) for reg in regs]) if regs else None
+        mem_undo = None
+        mem_write = self._mem_writes[pc]
+        if mem_write is not None:
+            addr = mem_write(values, types)
+            if addr is not None:
+                mem_undo = (addr, runtime.memory.get(addr))
+        self._log.append((pc, runtime.flag_value, runtime.overflow_value, reg_undo, mem_undo))
+        self.step += 1
+
+    def back(self, steps):
+        # Returns the number of instructions actually undone
+        steps = min(steps, self.step)
+        if steps <= len(self._log):
+            for _ in range(steps):
+                self._undo()
+            return steps
+        target = self.step - steps
+        snap_step, snapshot = self._base_for(target)
+        self.runtime.restore(snapshot)
+        while self._snapshots and self._snapshots[-1][0] > snap_step:
+            self._snapshots.pop()
+        self._log.clear()
+        self.step = snap_step
+        self._next_snapshot = snap_step + self.snapshot_interval
+        self._replay(target - snap_step)
+        return steps
+
+    def back_until(self, stop):
+        # Undo logged instructions until stop(pc) holds for the restored pc, returns the number undone
+        undone = 0
+        while self._log:
+            self._undo()
+            undone += 1
+            if stop(self.runtime.p_counter):
+                break
+        return undone
+
+    def close(self):
+        self.engine.read_input = self._read_input
+
+    def __len__(self):
+        return len(self._log)
+
+    # PRIVATE METHODS
+    def _undo(self):
+        runtime = self.runtime
+        pc, runtime.flag_value, runtime.overflow_value, reg_undo, mem_undo = self._log.pop()
+        if reg_undo:
+            values = runtime.reg_values
+            types = runtime.reg_types
+            for reg, val, type in reg_undo:
+                values[reg] = val
+                types[reg] = type
+        if mem_undo:
+            addr, val_type = mem_undo
+            if val_type is None:
+                runtime.memory.clear(addr)
+            else:
+                runtime.memory.set(addr, val_type[0], val_type[1])
+        runtime.p_counter = pc
+        self.step -= 1
+
+    def _base_for(self, target):
+        for snap_step, snapshot in reversed(self._snapshots):
+            if snap_step <= target:
+                return snap_step, snapshot
+        return 0, self._base
+
+    def _replay(self, steps):
+        # Re-execute quietly, answering input prompts with what was read the first time
+        output = self.engine.output
+        self.engine.output = NullSink()
+        self.engine.read_input = self._replay_input
+        try:
+            self.engine.run(steps, self.record)
+        finally:
+            self.engine.output = output
+            self.engine.read_input = self._record_input
+
+    def _record_input(self, prompt):
+        user_input = self._read_input(prompt)
+        self._inputs[self.step - 1] = user_input
+        return user_input
+
+    def _replay_input(self, prompt):
+        return self._inputs.get(self.step - 1, "")
+
+
+def _write_sets(program):
+    # Registers and memory address function written by each instruction
+    reg_writes = []
+    mem_writes = []
+    for opcode, operands in zip(program.opcodes, program.operands):
+        regs = ()
+        mem_write = None
+        match InstructionType(opcode):
+            case InstructionType.MOVE | InstructionType.CAST | InstructionType.INPUT:
+                regs = (operands[1],)
+            case InstructionType.LOAD | InstructionType.CREATE | InstructionType.ADD | InstructionType.SUB | \
+                    InstructionType.MULTIPLY | InstructionType.DIVIDE:
+                regs = (operands[2],)
+            case InstructionType.OR | InstructionType.AND | InstructionType.NOT:
+                regs = (operands[0],)
+            case InstructionType.SHIFT:
+                regs = (operands[1],)
+            case InstructionType.STORE:
+                _, target_is_reg, target = operands
+                mem_write = _register_address(target) if target_is_reg else _fixed_address(target)
+            case InstructionType.CALL | InstructionType.PUSH:
+                regs = (SP_REGISTER,)
+                mem_write = _stack_address
+            case InstructionType.POP:
+                regs = (SP_REGISTER, operands[0])
+            case InstructionType.RETURN:
+                regs = (SP_REGISTER,)
+        reg_writes.append(regs)
+        mem_writes.append(mem_write)
+    return reg_writes, mem_writes
+
+
+def _stack_address(values, types):
+    return values[SP_REGISTER] - 1
+
+
+def _fixed_address(addr):
+    return lambda values, types: addr
+
+
+def _register_address(reg):
+    def address(values, types):
+        if values[reg] is None or types[reg] != OperandType.MEMORY_ADDRESS:
+            return None
+        return values[reg]
+    return address
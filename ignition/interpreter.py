@@ -1,99 +1,131 @@
+import sys
+from itertools import islice
+from ignition.analysis import analyze, format_error
 from ignition.parser import Parser
-from ignition.runtime import Runtime
+from ignition.cache import ASTCache
+from ignition.decoder import Decoder, register_name
+from ignition.breakpoints import BreakpointTable
+from ignition.history import ExecutionHistory
+from ignition.profiler import Profiler
+from ignition.tracer import Tracer, DEFAULT_CAPACITY, read_trace_file
+from ignition.errors import DecodeError, ConditionError
+from ignition.runtime import Runtime, GENERAL_REGISTERS
+from ignition.memory import ADDRESS_LIMIT
 from ignition.execution import ExecutionEngine
+from ignition.output import NullSink, StreamSink
 
 class Interpreter:
-    _instance = None  #Singleton
-
-    def __new__(cls, *args, **kwargs):
-        if not cls._instance:
-            cls._instance = super(Interpreter, cls).__new__(cls)
-        return cls._instance
-
-    def __init__(self, compiler_image, silent_i, silent_c, silent_r, silent_o):
-        if not hasattr(self, "_initialized"):
-            # Core components (all singletons)
-            self.ast = None  # Abstract Syntax Tree
-            self.parser = Parser()  # Parser
-            self.runtime = None  # Runtime environment
-            self.execution_engine = None #Execution engine
-            self.compiler_image = compiler_image # Compiler image
-            self.silent_c = silent_c # Supress Compiler Errors
-            self.silent_i = silent_i # Supress Usage Errors
-            self.silent_r = silent_r # Supress Runtime Errors
-            self.silent_o = silent_o # Supress Output
-            self._initialized = True # Whether the interpreter has been initialized (singleton)
-            self._EOF = False # Whether at EOF
-            self._prog_len = 0 # Length of current program
-            self._breakpoints = []
+    """One debugging session: a loaded program with its own runtime, engine, breakpoints and history.
+
+    Interpreters share no mutable state, so any number can be created in one process
+    (see ignition.session.SessionManager). Sessions may share a parser, and sessions
+    loaded from the same source share the decoded program, which is never modified.
+    """
+    def __init__(self, compiler_image, silent_i, silent_c, silent_r, silent_o, compiler_backend="docker", parser=None,
+                 jit=False, output=None):
+        # Core components
+        self.ast = None  # Abstract Syntax Tree
+        self.program = None  # Decoded instruction table
+        self.parser = parser if parser is not None else Parser(ASTCache(), compiler_backend)  # Parser
+        self.runtime = None  # Runtime environment
+        self.execution_engine = None #Execution engine
+        self.compiler_image = compiler_image # Compiler image
+        self.silent_c = silent_c # Supress Compiler Errors
+        self.silent_i = silent_i # Supress Usage Errors
+        self.silent_r = silent_r # Supress Runtime Errors
+        self.silent_o = silent_o # Supress Output
+        self.jit = jit  # Compile hot loops when running without breakpoints
+        if output is None:
+            output = NullSink() if silent_o else StreamSink()
+        self.output = output  # Sink for program output (see ignition.output)
+        self._EOF = False # Whether at EOF
+        self._prog_len = 0 # Length of current program
+        self._breakpoints = BreakpointTable()
+        self._checkpoints = {}  # Checkpoint name -> (RuntimeSnapshot, EOF)
+        self._initial_snapshot = None  # Post-initialization state, restored by restart
+        self.history = None  # Undo log for reverse stepping, when recording
+        self.profiler = None  # Execution profile, when profiling
+        self._last_profile = None  # Profile kept after profiling is turned off
+        self.tracer = None  # Execution trace, when tracing
+        self._last_trace = None  # Trace kept after tracing is turned off
 
     # PUBLIC METHODS
     def initialize(self, program):
-        #Create a new blank runtime
-        self.runtime = Runtime()
         #Call the parser to parse the given program at the local path
-        self.ast = self.parser.parse_program(program, self.compiler_image, self.silent_c)
-        if self.ast is None:
+        ast = self.parser.parse_program(program, self.compiler_image, self.silent_c)
+        if ast is None:
             return False
-        self._prog_len = len(self.ast.root.get_children())-1
-        # Create a new execution engine with the runtime instance
-        self.execution_engine = ExecutionEngine(self.runtime, self._prog_len, self.silent_r, self.silent_o)
+        # Decode the AST once so execution never has to parse operand strings
+        try:
+            decoded = Decoder().decode(ast)
+        except DecodeError as e:
+            if not self.silent_c:
+                print(f"Compiler Error: {e}")
+            return False
+        analysis = analyze(decoded)
+        if not self.silent_r:
+            for pc, message in analysis.errors:
+                print(format_error(decoded, pc, message))
+        self.load(ast, decoded, analysis)
         return True
 
+    def load(self, ast, program, analysis=None):
+        # Start a fresh run of an already decoded (and optionally analysed) program
+        self.ast = ast
+        self.program = program
+        #Create a new blank runtime
+        self.runtime = Runtime()
+        self._prog_len = len(self.program)-1
+        # Create a new execution engine with the runtime instance
+        self.execution_engine = ExecutionEngine(self.runtime, self.program, self.silent_r, self.silent_o, self.jit, analysis,
+                                                self.output)
+        self._initial_snapshot = self.runtime.snapshot()
+
     def forward(self, steps):
         if self._EOF and not self.silent_i:
             print(
                 "Usage Error: 'examples/SimpleCode.sasm' is already at the end of execution. Run 'restart' to execute again.")
         else:
+            self._start_run()
             curr_line = self.runtime.get_program_counter()
             if curr_line in self._breakpoints:
                 self._execute_step()
                 steps -=1
                 curr_line = self.runtime.get_program_counter()
-            while curr_line not in self._breakpoints and steps and not self._EOF:
-                self._execute_step()
-                steps -= 1
-                curr_line = self.runtime.get_program_counter()
+            if not self._is_instrumented():
+                self._run_fast(steps)
+            else:
+                while steps and not self._EOF and not self._breakpoints.should_break(curr_line, self.runtime):
+                    self._execute_step()
+                    steps -= 1
+                    curr_line = self.runtime.get_program_counter()
+            self._end_run()
 
     def finish(self):
         if self._EOF and not self.silent_i:
             print("Usage Error: Program is already at the end of execution. Run 'restart' to execute again.")
         else:
+            self._start_run()
             curr_line = self.runtime.get_program_counter()
             if curr_line in self._breakpoints:
                 self._execute_step()
                 curr_line = self.runtime.get_program_counter()
-            while curr_line not in self._breakpoints and not self._EOF:
-                self._execute_step()
-                curr_line = self.runtime.get_program_counter()
+            if not self._is_instrumented():
+                self._run_fast()
+            else:
+                while not self._EOF and not self._breakpoints.should_break(curr_line, self.runtime):
+                    self._execute_step()
+                    curr_line = self.runtime.get_program_counter()
+            self._end_run()
 
-    def dump(self, dump_reg, dump_mem, dump_stack, dump_flags, dump_prog, is_verbose):
+    def dump(self, dump_reg, dump_mem, dump_stack, dump_flags, dump_prog, is_verbose, mem_range=None, limit=None, page=0,
+             dump_profile=False):
         if not self.silent_o:
-            def make_verbose(output, category):
-                if category == "registers":
-                    verbose_output = []
-                    for reg_entry in output.split():
-                        reg, value = reg_entry.split(":")
-                        val_0, val_1 = value.strip("()").split("(")
-                        verbose_output.append(f"Register {reg} -> Value: {val_0}, Type: {val_1}")
-                    return "\n".join(verbose_output)
-
-                elif category == "memory":
-                    verbose_output = []
-                    for mem_entry in output.split():
-                        addr, value = mem_entry.split(":")
-                        val_0, val_1 = value.strip("()").split("(")
-                        verbose_output.append(f"Memory Address {addr} -> Value: {val_0}, Type: {val_1}")
-                    return "\n".join(verbose_output)
-
-                elif category == "stack":
-                    verbose_output = []
-                    for stack_entry in output.split():
-                        val_0, val_1 = stack_entry.strip("()").split("(")
-                        verbose_output.append(f"Stack Entry -> Value: {val_0}, Type: {val_1}")
-                    return "\n".join(verbose_output)
+            out = sys.stdout
+            start, end = mem_range if mem_range is not None else (0, ADDRESS_LIMIT)
 
-                elif category == "flags":
+            def make_verbose(output, category):
+                if category == "flags":
                     verbose_output = []
                     # Map of flag acronyms to full names
                     flag_names = {
@@ -122,31 +154,32 @@ class Interpreter:
                     return "\n".join(verbose_output)
 
             if dump_reg:
-                reg_output = self.runtime.dump_registers()
                 if is_verbose:
-                    print("=== Register Dump ===")
-                    print(make_verbose(reg_output, "registers"))
-                    print("=====================")
+                    out.write("=== Register Dump ===\n")
+                    for reg in range(GENERAL_REGISTERS):
+                        val_type = self.runtime.get_register(reg) or (None, None)
+                        out.write(f"Register {register_name(reg)} -> Value: {val_type[0]}, Type: {val_type[1]}\n")
+                    out.write("=====================\n")
                 else:
-                    print(reg_output)
+                    out.write(self.runtime.dump_registers() + "\n")
 
             if dump_mem:
-                mem_output = self.runtime.dump_memory()
+                entries = self.runtime.iter_memory(start, end)
                 if is_verbose:
-                    print("=== Memory Dump ===")
-                    print(make_verbose(mem_output, "memory"))
-                    print("===================")
+                    out.write("=== Memory Dump ===\n")
+                    self._write_entries(out, entries, limit, page, "Memory Address {0} -> Value: {1}, Type: {2}", False)
+                    out.write("===================\n")
                 else:
-                    print(mem_output)
+                    self._write_entries(out, entries, limit, page, "{0}:{1}({2})", True)
 
             if dump_stack:
-                stack_output = self.runtime.dump_stack()
+                entries = self.runtime.iter_stack(start, end)
                 if is_verbose:
-                    print("=== Stack Dump ===")
-                    print(make_verbose(stack_output, "stack"))
-                    print("==================")
+                    out.write("=== Stack Dump ===\n")
+                    self._write_entries(out, entries, limit, page, "Stack Entry -> Value: {1}, Type: {2}", False)
+                    out.write("==================\n")
                 else:
-                    print(stack_output)
+                    self._write_entries(out, entries, limit, page, "{1}({2})", True)
 
             if dump_flags:
                 flags_output = self.runtime.dump_flags()
@@ -166,54 +199,313 @@ class Interpreter:
                 else:
                     print(prog_output)
 
+            if dump_profile:
+                self._dump_profile(out, limit)
+
     def terminate(self):
         #Clear the runtime and AST
         self.runtime = None
         self.execution_engine = None
         self.ast = None
+        self.program = None
         self._EOF = False
         self._prog_len = 0
+        self._checkpoints = {}
+        self._initial_snapshot = None
+        self.history = None
+        self.profiler = None
+        self._last_profile = None
+        if self.tracer is not None:
+            self.tracer.close()
+        self.tracer = None
+        self._last_trace = None
 
     def restart(self):
         self._EOF = False
-        self.runtime = Runtime()
-        self.execution_engine = ExecutionEngine(self.runtime, self._prog_len, self.silent_r, self.silent_o)
+        self._breakpoints.reset_hits()
+        self.runtime.restore(self._initial_snapshot)
+        self._reset_history()
+
+    def save_checkpoint(self, name):
+        self._checkpoints[name] = (self.runtime.snapshot(), self._EOF)
+
+    def restore_checkpoint(self, name):
+        if name not in self._checkpoints:
+            if not self.silent_i:
+                print(f"Usage Error: Checkpoint '{name}' does not exist.")
+            return
+        snapshot, self._EOF = self._checkpoints[name]
+        self.runtime.restore(snapshot)
+        self._reset_history()
 
-    def set_breakpoint(self, line):
-        if line in self._breakpoints and not self.silent_i:
-            print(f"Usage Error: Breakpoint at line {line} already exists.")
-        self._breakpoints.append(line)
+    def enable_history(self):
+        if self.history is None:
+            self.history = ExecutionHistory(self.runtime, self.execution_engine, self.runtime.snapshot())
+
+    def disable_history(self):
+        if self.history is not None:
+            self.history.close()
+            self.history = None
+
+    def back(self, steps):
+        if self.history is None:
+            if not self.silent_i:
+                print("Usage Error: Execution history is not being recorded. Run 'history on' first.")
+            return
+        undone = self.history.back(steps)
+        if undone < steps and not self.silent_i:
+            print(f"Usage Warning: Only {undone} step(s) of history available. Stopped at the start of recorded history.")
+        self._EOF = False
+        self._check_eof()
+
+    def reverse_run(self):
+        if self.history is None:
+            if not self.silent_i:
+                print("Usage Error: Execution history is not being recorded. Run 'history on' first.")
+            return
+        def at_breakpoint(line):
+            breakpoint = self._breakpoints.get(line)
+            return breakpoint is not None and (breakpoint.predicate is None or breakpoint.predicate(self.runtime))
+        self.history.back_until(at_breakpoint)
+        if not at_breakpoint(self.runtime.get_program_counter()) and not self.silent_i:
+            print("Usage Warning: No earlier breakpoint in recorded history. Stopped at the start of recorded history.")
+        self._EOF = False
+        self._check_eof()
+
+    def enable_profiler(self, sample_interval=None):
+        # Start a new profile, exact or sampling every sample_interval instructions
+        self.profiler = Profiler(self.program, sample_interval)
+
+    def disable_profiler(self):
+        # Stop profiling, keeping the collected profile for 'dump --profile'
+        if self.profiler is not None:
+            self._last_profile = self.profiler
+            self.profiler = None
+
+    def enable_tracer(self, path=None, capacity=DEFAULT_CAPACITY):
+        # Start a new trace in a ring buffer of capacity records, or streamed to path
+        if self.tracer is not None:
+            self.tracer.close()
+        try:
+            self.tracer = Tracer(self.runtime, self.program, capacity, path)
+        except OSError as e:
+            if not self.silent_i:
+                print(f"Usage Error: Cannot write trace file '{path}': {e.strerror}.")
+
+    def disable_tracer(self):
+        if self.tracer is not None:
+            self.tracer.close()
+            self._last_trace = self.tracer
+            self.tracer = None
+
+    def show_trace(self, count, path=None):
+        # Decode the most recent records of the current trace, or of a trace file written for this program
+        instructions = self.ast.root.get_children()
+        if path is not None:
+            try:
+                records, recorded = read_trace_file(path, count)
+            except OSError as e:
+                if not self.silent_i:
+                    print(f"Usage Error: Cannot read trace file '{path}': {e.strerror}.")
+                return
+            except ValueError as e:
+                if not self.silent_i:
+                    print(f"Usage Error: {e}")
+                return
+            if any(record.pc >= len(instructions) or record.opcode != self.program.opcodes[record.pc] for record in records):
+                if not self.silent_i:
+                    print(f"Usage Error: Trace file '{path}' was not recorded from the initialized program.")
+                return
+        else:
+            tracer = self.tracer or self._last_trace
+            if tracer is None:
+                if not self.silent_i:
+                    print("Usage Error: No trace recorded. Run 'trace on' first.")
+                return
+            records = tracer.last(count)
+            recorded = tracer.recorded
+        print(f"===Trace (last {len(records)} of {recorded})===")
+        for record in records:
+            instruction = instructions[record.pc]
+            text = " ".join([instruction.value] + [operand.value for operand in instruction.get_children()])
+            value = "" if record.value is None else f" -> {record.value}"
+            print(f"i[{record.pc}] line {instruction.line}: {text}{value} "
+                  f"(zf:{int(record.z)} sf:{int(record.s)} of:{int(record.o)})")
+        print("===========")
+
+    def delete_checkpoint(self, name):
+        if name not in self._checkpoints:
+            if not self.silent_i:
+                print(f"Usage Error: Checkpoint '{name}' does not exist.")
+        else:
+            del self._checkpoints[name]
+
+    def list_checkpoints(self):
+        print("===Checkpoints===")
+        if len(self._checkpoints) == 0:
+            print("No checkpoints saved")
+        else:
+            for name, (snapshot, _) in self._checkpoints.items():
+                print(f"Checkpoint '{name}': pc {snapshot.p_counter}")
+        print("=================")
+
+    def cache_stats(self):
+        stats = self.parser.cache.stats()
+        print("===AST Cache===")
+        print(f"Entries: {stats['entries']} ({stats['bytes']}/{stats['max_bytes']} Bytes)")
+        print(f"Hits: {stats['hits']} Misses: {stats['misses']} Evictions: {stats['evictions']}")
+        print(f"Hit Rate: {stats['hit_rate']:.1%}")
+        print("===============")
+
+    def clear_cache(self):
+        self.parser.cache.clear()
+
+    def set_breakpoint(self, line, condition=None, ignore_count=0):
+        if line in self._breakpoints:
+            if not self.silent_i:
+                print(f"Usage Error: Breakpoint at line {line} already exists.")
+            return
+        try:
+            self._breakpoints.add(line, condition, ignore_count)
+        except ConditionError as e:
+            if not self.silent_i:
+                print(f"Usage Error: {e}")
 
     def remove_breakpoint(self, line):
-        if line not in self._breakpoints and not self.silent_i:
-            print(f"Usage Error: Breakpoint at line {line} does not exist.")
+        if line not in self._breakpoints:
+            if not self.silent_i:
+                print(f"Usage Error: Breakpoint at line {line} does not exist.")
         else:
             self._breakpoints.remove(line)
 
     def list_breakpoints(self):
-        self._breakpoints.sort()
         curr = 1
         print("===Breakpoints===")
         if len(self._breakpoints) == 0:
             print("No breakpoints set")
         else:
-            for line in self._breakpoints:
-                print(f"Breakpoint {curr}: {line}")
+            for breakpoint in self._breakpoints.sorted():
+                details = f"Breakpoint {curr}: {breakpoint.line} (hits: {breakpoint.hit_count}"
+                if breakpoint.ignore_count:
+                    details += f", ignore: {breakpoint.ignore_count}"
+                details += ")"
+                if breakpoint.condition:
+                    details += f" if {breakpoint.condition}"
+                print(details)
                 curr +=1
         print("=================")
 
 
     # PRIVATE METHODS
+    def _dump_profile(self, out, limit):
+        profiler = self.profiler or self._last_profile
+        if profiler is None:
+            if not self.silent_i:
+                print("Usage Error: No profile collected. Run 'profile on' first.")
+            return
+        lines = profiler.by_line()
+        total_hits = sum(line[3] for line in lines) or 1
+        total_time = sum(line[4] for line in lines)
+        mode = "exact" if profiler.sample_interval is None else f"sampled every {profiler.sample_interval}"
+        out.write(f"=== Profile ({mode}) ===\n")
+        out.write(f"Instructions Executed -> {profiler.executed}, Host Time -> {total_time:.4f}s\n")
+        out.write("--- By Line ---\n")
+        lines.sort(key=lambda line: (-line[3], line[0]))
+        for pc, line, instruction_type, hits, seconds in lines[:limit]:
+            out.write(f"Line {line} (i[{pc}] {instruction_type.name.lower()}) -> Hits: {hits} ({hits / total_hits:.1%}), Time: {seconds:.4f}s\n")
+        if limit is not None and len(lines) > limit:
+            out.write(f"({len(lines) - limit} more lines)\n")
+        out.write("--- By Instruction Type ---\n")
+        for instruction_type, (hits, seconds) in sorted(profiler.by_type().items(), key=lambda item: -item[1][1]):
+            out.write(f"{instruction_type.name.lower()} -> Hits: {hits} ({hits / total_hits:.1%}), Time: {seconds:.4f}s\n")
+        out.write("=======================\n")
+
+    def _write_entries(self, out, entries, limit, page, entry_format, inline):
+        # Stream (address, (value, type)) entries as they are read, optionally one page of 'limit' entries
+        if limit is not None:
+            entries = islice(entries, page * limit, (page + 1) * limit + 1)
+        more = False
+        for written, (addr, (val, type)) in enumerate(entries):
+            if written == limit:
+                more = True
+                break
+            if inline and written:
+                out.write(" ")
+            out.write(entry_format.format(addr, val, type))
+            if not inline:
+                out.write("\n")
+        if inline:
+            out.write("\n")
+        if more:
+            out.write(f"(more entries, use --page {page + 1})\n")
+
     def _execute_step(self):
         if self._EOF and not self.silent_i:
             print("Usage Error: Program is already at the end of execution. Run 'restart' to execute again.")
         else:
-            curr_instruction = self.ast.root.child_at(self.runtime.get_program_counter())
-            self.execution_engine.execute(curr_instruction)
+            pc = self.runtime.get_program_counter()
+            if self.history is not None:
+                self.history.record(pc)
+            if self.profiler is not None:
+                self.profiler.hook(pc)
+            if self.tracer is not None:
+                self.tracer.record(pc)
+            self.execution_engine.execute(pc)
+        self._check_eof()
 
+    def _run_fast(self, steps=None):
+        # Run on the engine's fast loop, with a hook only if something needs every instruction
+        hook = self._step_hook()
+        if self.profiler is not None and self.profiler.sample_interval is not None:
+            self.profiler.run(self.execution_engine, steps, hook)
+        else:
+            self.execution_engine.run(steps, hook)
+        self._check_eof()
+
+    def _check_eof(self):
         # Set EOF Var if reached EOF
         if self.runtime.get_program_counter() > self._prog_len:
             self._EOF = True
 
+    def _step_hook(self):
+        # Called before every instruction on the fast path, if anything needs it
+        hooks = []
+        if self.history is not None:
+            hooks.append(self.history.record)
+        if self.profiler is not None and self.profiler.sample_interval is None:
+            hooks.append(self.profiler.hook)
+        if self.tracer is not None:
+            hooks.append(self.tracer.record)
+        if not hooks:
+            return None
+        if len(hooks) == 1:
+            return hooks[0]
+        def step_hook(pc):
+            for hook in hooks:
+                hook(pc)
+        return step_hook
+
+    def _start_run(self):
+        if self.profiler is not None:
+            self.profiler.start()
+
+    def _end_run(self):
+        # Execution paused: write out program output, close the profiler's timing and complete the last trace record
+        self.output.flush()
+        if self.profiler is not None:
+            self.profiler.stop()
+        if self.tracer is not None:
+            self.tracer.flush()
+
+    def _reset_history(self):
+        # Recorded history no longer leads to the current state
+        if self.history is not None:
+            self.disable_history()
+            self.enable_history()
+
+    def _is_instrumented(self):
+        # Whether anything needs to observe the program between instructions
+        return len(self._breakpoints) > 0
+
 
 
@@ -0,0 +1,335 @@
+from ignition.ast import InstructionType, OperandType
+from ignition.decoder import JUMP_CONDITIONS, register_name
+from ignition.memory import ADDRESS_LIMIT
+
+JIT_THRESHOLD = 50  # Back edges to a loop head before the loop is compiled
+MAX_LOOP_LENGTH = 256  # Longest loop body compiled, in instructions
+
+ARITHMETIC_TYPES = (OperandType.INTEGER, OperandType.MEMORY_ADDRESS, OperandType.BOOLEAN, OperandType.CHARACTER)
+OPERATORS = {
+    InstructionType.ADD: "+",
+    InstructionType.SUB: "-",
+    InstructionType.MULTIPLY: "*",
+    InstructionType.DIVIDE: "//",
+}
+
+# Each jump condition over the flag locals z, s and o
+CONDITION_SOURCE = {
+    "greater": "not z and s == o",
+    "less": "s != o",
+    "equal": "z",
+    "zero": "z",
+    "unequal": "not z",
+    "nonzero": "not z",
+    "negative": "s",
+    "positive": "not s and not z",
+    "unconditional": "True",
+}
+_CONDITION_NAMES = {condition: name for name, condition in JUMP_CONDITIONS.items()}
+
+DYNAMIC = "dynamic"  # Register type only known at run time, held in the local t<reg>
+
+
+class NotCompilable(Exception):
+    pass
+
+
+class LoopCompiler:
+    """Translates one loop of a decoded program into a Python function.
+
+    The loop runs from its head to the first jump back to the head. Registers live
+    in locals for the whole run, and register types are checked once on entry so
+    arithmetic is specialized to them. Registers the loop only ever writes with
+    create need no value on entry. The function runs whole iterations while they
+    fit in its step budget and returns the number of instructions executed, 0 if
+    the budget does not cover an iteration, or None if its entry checks fail and
+    the loop should be compiled again for the registers it now starts with.
+
+    Any instruction whose runtime check could fail (an uninitialized memory cell,
+    a register holding another type after a load, a division by zero, ...) is
+    guarded: if the guard fails the state is written back with the program counter
+    on that instruction, so the interpreter runs it and reports the error. A jump
+    out of the loop writes the state back the same way. Only loops made of create,
+    move, arithmetic, compare, load, store, jump, label and comment instructions,
+    with no jumps into their own body other than to the head, are compiled.
+    """
+    def __init__(self, engine, head, tail):
+        self.engine = engine
+        self.head = head  # Index of the loop's first instruction
+        self.tail = tail  # Index of the jump back to the head
+        self._opcodes = [InstructionType(opcode) for opcode in engine.program.opcodes[head:tail + 1]]
+        self._operands = engine.program.operands[head:tail + 1]
+        self._constants = {}  # Namespace name -> value
+        self._registers = set()  # Registers used by the loop
+        self._written = set()  # Registers the loop writes, the only ones written back on exit
+        self._entry_types = {}  # Register -> type checked on entry
+        self._create_only = set()  # Registers the loop only writes with create, their current type is kept in t<reg>
+        self._head_types = {}  # Register -> type at the loop head, or DYNAMIC
+        self._types = {}  # Register -> type at the point being compiled, or DYNAMIC
+
+    # PUBLIC METHODS
+    def compile(self):
+        # The loop function, or None if the loop cannot be compiled
+        try:
+            source = self._generate()
+        except NotCompilable:
+            return None
+        runtime = self.engine.runtime
+        namespace = {
+            "values": runtime.reg_values,
+            "types": runtime.reg_types,
+            "runtime": runtime,
+            "get_memory": runtime.get_memory,
+            "set_memory": runtime.set_memory,
+            **self._constants,
+        }
+        exec(compile(source, f"<loop i[{self.head}]>", "exec"), namespace)
+        return namespace["loop"]
+
+    # PRIVATE METHODS
+    def _generate(self):
+        self._collect_registers()
+        length = self.tail - self.head + 1
+        steps = []
+        for offset, (opcode, operands) in enumerate(zip(self._opcodes, self._operands)):
+            steps.append(self._compile_instruction(self.head + offset, offset, opcode, operands))
+        live = self._live_flags(steps)
+
+        lines = ["def loop(budget):", f"    if budget < {length}:", "        return 0"]
+        guards = [f"types[{reg}] is not {self._type_name(reg_type)}" for reg, reg_type in sorted(self._entry_types.items())]
+        if guards:
+            lines += [f"    if {' or '.join(guards)}:", "        return None"]
+        lines += [f"    r{reg} = values[{reg}]" for reg in sorted(self._registers)]
+        lines += [f"    t{reg} = types[{reg}]" for reg in sorted(self._create_only)]
+        lines += ["    z, s, o = runtime.flags()", "    executed = 0",
+                  f"    while executed + {length} <= budget:"]
+        for (render, _, _), flags_live in zip(steps, live):
+            lines += ["        " + line for line in render(flags_live)]
+        lines += ["    " + line for line in self._exit(self.head, 0, self._head_types)]
+        return "\n".join(lines) + "\n"
+
+    def _collect_registers(self):
+        # Every register the loop reads, or writes other than with create, must hold a value of a known type on entry
+        runtime = self.engine.runtime
+        created = set()
+        for opcode, operands in zip(self._opcodes, self._operands):
+            match opcode:
+                case InstructionType.CREATE:
+                    registers = ()
+                    created.add(operands[2])
+                    self._written.add(operands[2])
+                case InstructionType.MOVE:
+                    registers = operands
+                    self._written.add(operands[1])
+                case InstructionType.ADD | InstructionType.SUB | InstructionType.MULTIPLY | InstructionType.DIVIDE:
+                    registers = operands
+                    self._written.add(operands[2])
+                case InstructionType.COMPARE:
+                    registers = operands
+                case InstructionType.LOAD:
+                    registers = ((operands[1],) if operands[0] else ()) + (operands[2],)
+                    self._written.add(operands[2])
+                case InstructionType.STORE:
+                    registers = (operands[0],) + ((operands[2],) if operands[1] else ())
+                case InstructionType.JUMP | InstructionType.LABEL | InstructionType.COMMENT:
+                    registers = ()
+                case _:
+                    raise NotCompilable(f"{opcode.name.lower()} is not compiled")
+            self._registers.update(registers)
+        self._create_only = created - self._registers
+        for reg in self._registers:
+            reg_type = runtime.reg_types[reg]
+            if reg_type is None or runtime.reg_values[reg] is None:
+                raise NotCompilable(f"{register_name(reg)} is not initialized")
+            self._entry_types[reg] = reg_type
+        self._registers |= self._create_only
+        self._head_types = {**self._entry_types, **dict.fromkeys(self._create_only, DYNAMIC)}
+        self._types = dict(self._head_types)
+
+    def _compile_instruction(self, index, offset, opcode, operands):
+        # (render(live), the flags the instruction sets, whether it may observe the flags before setting them).
+        # live is (whether z and s are observed, whether o is observed) before the flags are next set.
+        match opcode:
+            case InstructionType.CREATE:
+                val_type, val, reg = operands
+                if val_type is None or val.__class__ is not int and val.__class__ is not bool:
+                    raise NotCompilable("Only typed integer and boolean constants are compiled")
+                self._types[reg] = val_type
+                lines = [f"r{reg} = {val!r}"]
+                if reg in self._create_only:
+                    lines.append(f"t{reg} = {self._type_name(val_type)}")  # For exits before the next create
+                return (lambda live: lines), None, False
+            case InstructionType.MOVE:
+                source, target = operands
+                self._types[target] = self._types[source]
+                lines = [f"r{target} = r{source}"]
+                if self._types[source] is DYNAMIC:
+                    lines.append(f"t{target} = t{source}")
+                return (lambda live: lines), None, False
+            case InstructionType.ADD | InstructionType.SUB | InstructionType.MULTIPLY | InstructionType.DIVIDE:
+                return self._compile_arithmetic(index, offset, opcode, *operands)
+            case InstructionType.COMPARE:
+                return self._compile_arithmetic(index, offset, InstructionType.SUB, operands[0], operands[1], None)
+            case InstructionType.LOAD:
+                return self._compile_load(index, offset, *operands)
+            case InstructionType.STORE:
+                return self._compile_store(index, offset, *operands)
+            case InstructionType.JUMP:
+                return self._compile_jump(index, offset, *operands)
+            case _:
+                return (lambda live: []), None, False
+
+    def _compile_arithmetic(self, index, offset, opcode, reg_1, reg_2, dest_reg):
+        guards, reg_type = self._type_guards(index, offset, reg_1, reg_2)
+        if reg_type not in ARITHMETIC_TYPES or opcode == InstructionType.DIVIDE and reg_type != OperandType.INTEGER:
+            raise NotCompilable("Operands always fail their type check")
+        if opcode == InstructionType.DIVIDE:
+            # Division by zero is left to the interpreter
+            guards += [f"if r{reg_2} == 0:"] + self._indent(self._exit(index, offset, self._types))
+        if dest_reg is not None:
+            self._types[dest_reg] = reg_type
+        expression = f"r{reg_1} {OPERATORS[opcode]} r{reg_2}"
+
+        def render(live):
+            zs_live, o_live = live
+            if dest_reg is None and not zs_live and not o_live:
+                return guards  # A compare whose flags are never read
+            lines = list(guards)
+            if reg_type == OperandType.CHARACTER:
+                lines.append(f"v = ({expression}) % 128")
+            else:
+                lines.append(f"v = {expression}")
+                if o_live:
+                    lines += ["if -2147483648 <= v <= 2147483647:", "    o = False", "else:",
+                              "    v = (v + 2147483648) % 4294967296 - 2147483648", "    o = True"]
+                else:
+                    lines += ["if not -2147483648 <= v <= 2147483647:", "    v = (v + 2147483648) % 4294967296 - 2147483648"]
+            if zs_live:
+                lines += ["z = v == 0", "s = v < 0"]
+            if dest_reg is not None:
+                lines.append(f"r{dest_reg} = v")
+            return lines
+        return render, "zs" if reg_type == OperandType.CHARACTER else "zso", bool(guards)
+
+    def _compile_load(self, index, offset, source_is_reg, source, target_reg):
+        guards = []
+        if source_is_reg:
+            guards += self._address_guard(index, offset, source)
+            address = f"r{source}"
+        else:
+            address = repr(source)
+        guards += [f"cell = get_memory({address})", "if cell is None:"] + self._indent(self._exit(index, offset, self._types))
+        self._types[target_reg] = DYNAMIC
+        lines = guards + [f"r{target_reg}, t{target_reg} = cell"]
+        return (lambda live: lines), None, True
+
+    def _compile_store(self, index, offset, source_reg, target_is_reg, target):
+        guards = []
+        if target_is_reg:
+            guards += self._address_guard(index, offset, target)
+            guards += [f"if not 0 <= r{target} < {ADDRESS_LIMIT}:"] + self._indent(self._exit(index, offset, self._types))
+            address = f"r{target}"
+        elif not 0 <= target < ADDRESS_LIMIT:
+            raise NotCompilable("Store address is out of range")
+        else:
+            address = repr(target)
+        lines = guards + [f"set_memory({address}, r{source_reg}, {self._type_expression(source_reg, self._types)})"]
+        return (lambda live: lines), None, bool(guards)
+
+    def _compile_jump(self, index, offset, condition, destination):
+        name = _CONDITION_NAMES.get(condition)
+        if name is None:
+            raise NotCompilable("Unknown jump condition")
+        test = CONDITION_SOURCE[name]
+        if index == self.tail:
+            # The back edge: run the next iteration, or leave the loop if the jump is not taken
+            lines = []
+            if name != "unconditional":
+                lines += [f"if not ({test}):"] + self._indent(self._exit(index + 1, offset + 1, self._types))
+            lines += self._back_edge(index, offset + 1)
+        elif destination == self.head:
+            lines = [f"if {test}:"] + self._indent(self._back_edge(index, offset + 1))
+        elif self.head <= destination <= self.tail or name == "unconditional":
+            raise NotCompilable("Only jumps to the loop head or out of the loop are compiled")
+        else:
+            lines = [f"if {test}:"] + self._indent(self._exit(destination, offset + 1, self._types))
+        return (lambda live: lines), None, True
+
+    def _back_edge(self, index, executed):
+        # Continue with the next iteration if every register still has its entry type
+        lines = []
+        for reg, reg_type in sorted(self._entry_types.items()):
+            if self._types[reg] is DYNAMIC:
+                lines += [f"if t{reg} is not {self._type_name(reg_type)}:"]
+                lines += self._indent(self._exit(self.head, executed, self._types))
+            elif self._types[reg] != reg_type:
+                raise NotCompilable(f"{register_name(reg)} changes type in the loop")
+        return lines + [f"executed += {executed}", "continue"]
+
+    def _type_guards(self, index, offset, reg_1, reg_2):
+        # Checks that two registers hold the same type, and that type if it is known here
+        type_1, type_2 = self._types[reg_1], self._types[reg_2]
+        expected = type_1 if type_1 is not DYNAMIC else type_2 if type_2 is not DYNAMIC else OperandType.INTEGER
+        if type_1 is not DYNAMIC and type_2 is not DYNAMIC and type_1 != type_2:
+            raise NotCompilable("Operands always fail their type check")
+        guards = []
+        for reg in (reg_1, reg_2):
+            if self._types[reg] is DYNAMIC:
+                guards += [f"if t{reg} is not {self._type_name(expected)}:"]
+                guards += self._indent(self._exit(index, offset, self._types))
+                self._types[reg] = expected
+        return guards, expected
+
+    def _address_guard(self, index, offset, reg):
+        reg_type = self._types[reg]
+        if reg_type is DYNAMIC:
+            self._types[reg] = OperandType.MEMORY_ADDRESS
+            return [f"if t{reg} is not {self._type_name(OperandType.MEMORY_ADDRESS)}:"] + \
+                self._indent(self._exit(index, offset, {**self._types, reg: DYNAMIC}))
+        if reg_type != OperandType.MEMORY_ADDRESS:
+            raise NotCompilable(f"{register_name(reg)} never holds a memory address")
+        return []
+
+    def _exit(self, pc, executed, types):
+        # Write the state back and return to the interpreter at pc
+        lines = [f"values[{reg}] = r{reg}" for reg in sorted(self._written)]
+        lines += [f"types[{reg}] = {self._type_expression(reg, types)}" for reg in sorted(self._written)]
+        lines += ["runtime.set_flags(z, s, o)", f"runtime.p_counter = {pc}",
+                  f"return executed + {executed}"]
+        return lines
+
+    def _live_flags(self, steps):
+        # For each instruction, whether the z/s and o flags it sets can be read before they are set again
+        live = [(True, True)] * len(steps)
+        zs_observed = o_observed = True  # Flags are written back at the end of the run
+        for position in range(len(steps) - 1, -1, -1):
+            _, sets_flags, observes = steps[position]
+            if sets_flags is not None:
+                live[position] = (zs_observed, o_observed and "o" in sets_flags)
+                zs_observed = False
+                if "o" in sets_flags:
+                    o_observed = False
+            if observes:
+                zs_observed = o_observed = True
+        return live
+
+    def _type_expression(self, reg, types):
+        return f"t{reg}" if types[reg] is DYNAMIC else self._type_name(types[reg])
+
+    def _type_name(self, reg_type):
+        name = f"T_{reg_type.name}"
+        self._constants[name] = reg_type
+        return name
+
+    def _indent(self, lines):
+        return ["    " + line for line in lines]
+
+
+def compile_loop(engine, head):
+    # Compile the loop starting at head, returning its function or None
+    opcodes = engine.program.opcodes
+    operands = engine.program.operands
+    for index in range(head, min(head + MAX_LOOP_LENGTH, len(opcodes))):
+        if opcodes[index] == InstructionType.JUMP.value and operands[index][1] == head:
+            return LoopCompiler(engine, head, index).compile()
+    return None
@@ -1,8 +1,18 @@
 import argparse
+import copy
 import json
 import os
-from ignition import ensure_docker_image
+import shlex
+import sys
+from ignition import get_config, save_config
+from ignition.batch import EXIT_USAGE_ERROR, run_batch
+from ignition.bench import DEFAULT_THRESHOLD, bench
+from ignition.compiler import COMPILER_BACKENDS
+from ignition.conformance import DEFAULT_MAX_STEPS, run_tests
 from ignition.interpreter import Interpreter
+from ignition.memory import ADDRESS_LIMIT
+from ignition.output import FLUSH_POLICIES, NullSink, StreamSink
+from ignition.tracer import DEFAULT_CAPACITY
 
 # Path to the configuration file
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), "config.json")
@@ -41,8 +51,28 @@ def load_state():
 
 
 def save_state(state):
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(state, f, indent=4)
+    # Merge into the current file so compiler settings written since load_state are kept
+    try:
+        config = get_config()
+    except json.JSONDecodeError:
+        config = {}
+    config.update(state)
+    save_config(config)
+
+
+def parse_range(text):
+    # 'A:B' (either side optional, m<..> allowed) -> (start, end) with end exclusive
+    start, sep, end = text.partition(":")
+    if not sep:
+        return None
+    try:
+        start = int(start.strip().removeprefix("m<").removesuffix(">") or 0)
+        end = int(end.strip().removeprefix("m<").removesuffix(">") or ADDRESS_LIMIT)
+    except ValueError:
+        return None
+    if start < 0 or end < start:
+        return None
+    return start, end
 
 
 def process_command(state, args, interpreter):
@@ -127,11 +157,30 @@ def process_command(state, args, interpreter):
                 save_state(state)
 
         elif operation == "dump":
-            if not any([args.r, args.m, args.s, args.f, args.p]):
+            if not any([args.r, args.m, args.s, args.f, args.p, args.profile]):
                 if not state["silent_flags"]["silenti"]:
                     print("Usage Error: No attributes chosen to dump. Run '--help' for available flags.")
                 return state
-            interpreter.dump(args.r, args.m, args.s, args.f, args.p, args.verbose)
+            mem_range = None
+            if args.range is not None:
+                mem_range = parse_range(args.range)
+                if mem_range is None:
+                    if not state["silent_flags"]["silenti"]:
+                        print(f"Usage Error: Invalid address range '{args.range}'. Expected START:END, e.g. 100:200.")
+                    return state
+            if args.limit is not None and args.limit < 1:
+                if not state["silent_flags"]["silenti"]:
+                    print("Usage Error: --limit must be at least 1.")
+                return state
+            if args.page is not None and args.page < 0:
+                if not state["silent_flags"]["silenti"]:
+                    print("Usage Error: --page must be at least 0.")
+                return state
+            if args.page is not None and args.limit is None:
+                if not state["silent_flags"]["silenti"]:
+                    print("Usage Error: --page needs --limit to set the number of entries per page.")
+                return state
+            interpreter.dump(args.r, args.m, args.s, args.f, args.p, args.verbose, mem_range, args.limit, args.page or 0, args.profile)
 
     elif operation == "terminate":
         if not state["initialized"]:
@@ -153,7 +202,7 @@ def process_command(state, args, interpreter):
             return state
         if args.set is not None:
             line_num = args.set
-            interpreter.set_breakpoint(line_num)  # Set a breakpoint at the specified line
+            interpreter.set_breakpoint(line_num, args.condition, args.ignore or 0)  # Set a breakpoint at the specified line
         elif args.remove is not None:
             line_num = args.remove
             interpreter.remove_breakpoint(line_num)  # Remove the breakpoint at the specified line
@@ -163,6 +212,86 @@ def process_command(state, args, interpreter):
             if not state["silent_flags"]["silenti"]:
                 print("Usage Error: You must specify either --set, --remove, or --list.")
 
+    elif operation in ["back", "reverse-run", "history"]:
+        if not state["initialized"]:
+            if not state["silent_flags"]["silenti"]:
+                print("Usage Error: Cannot step back. No .sasm program has been initialized.")
+            return state
+        if operation == "back":
+            interpreter.back(args.steps or 1)  # Undo the given number of instructions
+        elif operation == "reverse-run":
+            interpreter.reverse_run()  # Undo until the previous breakpoint
+        elif args.params == ["on"]:
+            interpreter.enable_history()  # Start recording the undo log
+        elif args.params == ["off"]:
+            interpreter.disable_history()
+        else:
+            if not state["silent_flags"]["silenti"]:
+                print("Usage Error: Expected 'history on' or 'history off'.")
+
+    elif operation == "profile":
+        if not state["initialized"]:
+            if not state["silent_flags"]["silenti"]:
+                print("Usage Error: Cannot profile. No .sasm program has been initialized.")
+            return state
+        if args.sample is not None and args.sample < 1:
+            if not state["silent_flags"]["silenti"]:
+                print("Usage Error: --sample must be at least 1.")
+        elif args.params == ["on"]:
+            interpreter.enable_profiler(args.sample)  # Start a new profile
+        elif args.params == ["off"]:
+            interpreter.disable_profiler()
+        else:
+            if not state["silent_flags"]["silenti"]:
+                print("Usage Error: Expected 'profile on [--sample N]' or 'profile off'.")
+
+    elif operation == "trace":
+        if not state["initialized"]:
+            if not state["silent_flags"]["silenti"]:
+                print("Usage Error: Cannot trace. No .sasm program has been initialized.")
+            return state
+        if args.size is not None and args.size < 1 or args.last is not None and args.last < 1:
+            if not state["silent_flags"]["silenti"]:
+                print("Usage Error: --size and --last must be at least 1.")
+        elif args.params == ["on"]:
+            interpreter.enable_tracer(args.file, args.size or DEFAULT_CAPACITY)  # Start a new trace
+        elif args.params == ["off"]:
+            interpreter.disable_tracer()
+        elif args.params == ["show"]:
+            interpreter.show_trace(args.last or 20, args.file)  # Decode the most recent records
+        else:
+            if not state["silent_flags"]["silenti"]:
+                print("Usage Error: Expected 'trace on [--file PATH] [--size N]', 'trace off' or 'trace show [--last N] [--file PATH]'.")
+
+    elif operation == "checkpoint":
+        if not state["initialized"]:
+            if not state["silent_flags"]["silenti"]:
+                print("Usage Error: Cannot manage checkpoints. No .sasm program has been initialized.")
+            return state
+        action = args.params[0] if args.params else None
+        if action in ["save", "restore", "delete"] and len(args.params) == 2:
+            name = args.params[1]
+            if action == "save":
+                interpreter.save_checkpoint(name)  # Snapshot the current program state
+            elif action == "restore":
+                interpreter.restore_checkpoint(name)  # Return to a saved program state
+            else:
+                interpreter.delete_checkpoint(name)
+        elif action == "list" and len(args.params) == 1:
+            interpreter.list_checkpoints()
+        else:
+            if not state["silent_flags"]["silenti"]:
+                print("Usage Error: Expected 'checkpoint save|restore|delete <name>' or 'checkpoint list'.")
+
+    elif operation == "cache":
+        if args.clear:
+            interpreter.clear_cache()  # Drop all cached compiler output
+        elif args.stats:
+            interpreter.cache_stats()  # Show cache hit/miss statistics
+        else:
+            if not state["silent_flags"]["silenti"]:
+                print("Usage Error: You must specify either --stats or --clear.")
+
     elif operation == "end":
         if state["initialized"]:
             if not state["silent_flags"]["silenti"]:
@@ -174,32 +303,112 @@ def process_command(state, args, interpreter):
             })
             interpreter.terminate()
             save_state(state)  # Save the state after terminating
+        interpreter.parser.close()  # Stop compiler workers and save cache statistics
         exit(0)
 
     return state
 
 
-def main():
-    # Get Docker image (ensures it exists)
-    compiler_image = ensure_docker_image()
+def build_operation_parser():
+    # Argument parser for interpreter operations, built once per session
+    parser = argparse.ArgumentParser(description="Enter a command for the interpreter.")
+    parser.add_argument(
+        "operation",
+        choices=["initialize", "restart", "forward", "run", "terminate", "dump", "breakpoint", "checkpoint", "back", "reverse-run", "history", "profile", "trace", "cache", "end"],
+        help="The interpreter operation to perform."
+    )
+    parser.add_argument("params", nargs="*", help="operation arguments, e.g. 'save <name>' (used with 'checkpoint').")
+    parser.add_argument("-r", action="store_true", help="dump registers to console.")
+    parser.add_argument("-m", action="store_true", help="dump memory to console.")
+    parser.add_argument("-s", action="store_true", help="dump stack to console.")
+    parser.add_argument("-f", action="store_true", help="dump flags to console.")
+    parser.add_argument("-p", action="store_true", help="dump program data to console.")
+    parser.add_argument("--profile", action="store_true", help="dump the execution profile by line and instruction type (used with 'dump').")
+    parser.add_argument("--verbose", action="store_true", help="provide verbose output (used with 'dump') ")  # Add verbose flag
+    parser.add_argument("--range", type=str, help="only dump memory/stack addresses in START:END (used with 'dump -m/-s').")
+    parser.add_argument("--limit", type=int, help="dump at most N memory/stack entries per page (used with 'dump -m/-s').")
+    parser.add_argument("--page", type=int, help="page of --limit entries to dump, starting at 0 (used with 'dump -m/-s').")
+    parser.add_argument("--file", type=str, help="path to the .sasm program file (used with 'initialize'), or a file to stream the trace to or read it from (used with 'trace on' and 'trace show').")
+    parser.add_argument("--size", type=int, help="number of records kept in the trace ring buffer (used with 'trace on').")
+    parser.add_argument("--last", type=int, help="number of trace records to show, default 20 (used with 'trace show').")
+    parser.add_argument("--steps", type=int, help="number of steps to move forward or back (used with 'forward' and 'back').")  # Add steps argument
+    parser.add_argument("--sample", type=int, help="profile by sampling every N instructions instead of counting every one (used with 'profile on').")
+    parser.add_argument("--set", type=int, help="set a breakpoint at the specified line number (used with 'breakpoint').")
+    parser.add_argument("--condition", type=str, help="only stop at the breakpoint when a condition such as \"r3 > 100\" holds (used with 'breakpoint --set').")
+    parser.add_argument("--ignore", type=int, help="number of hits to skip before stopping at the breakpoint (used with 'breakpoint --set').")
+    parser.add_argument("--remove", type=int, help="remove the breakpoint at the specified line number (used with 'breakpoint').")
+    parser.add_argument("--list", action="store_true", help="list all active breakpoints (used with 'breakpoint').")
+    parser.add_argument("--stats", action="store_true", help="show compiler output cache statistics (used with 'cache').")
+    parser.add_argument("--clear", action="store_true", help="remove all cached compiler output (used with 'cache').")
+    return parser
 
+
+def main():
     # Parse the initial command
     parser = argparse.ArgumentParser(description="Ignition: The StartASM interpreter and step-through debugger.")
-    parser.add_argument(
-        "command",
-        choices=["start"],
-        help="Command to start the interpreter loop."
-    )
-    parser.add_argument("--silentc", action="store_true", help="suppress StartASM Compiler errors.")
-    parser.add_argument("--silenti", action="store_true", help="suppress Ignition usage errors.")
-    parser.add_argument("--silentr", action="store_true", help="suppress StartASM runtime errors.")
-    parser.add_argument("--truesilent", action="store_true", help="suppress all output, including errors")
+    # Silent flags are accepted before the command ('ignition --silentc start') as well as after it
+    silent_flags = [
+        ("--silentc", "suppress StartASM Compiler errors."),
+        ("--silenti", "suppress Ignition usage errors."),
+        ("--silentr", "suppress StartASM runtime errors."),
+        ("--truesilent", "suppress all output, including errors"),
+    ]
+    for flag, help in silent_flags:
+        parser.add_argument(flag, action="store_true", help=help)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    start_parser = commands.add_parser("start", help="start the interactive interpreter loop.")
+    for flag, help in silent_flags:
+        # Suppressed defaults leave a flag given before the command in place
+        start_parser.add_argument(flag, action="store_true", default=argparse.SUPPRESS, help=help)
+    start_parser.add_argument("--compiler", choices=sorted(COMPILER_BACKENDS), help="compiler backend: a container per program (docker), one warm container (worker), a local compiler binary (local) or cached output only (cache).")
+    start_parser.add_argument("--jit", action="store_true", help="compile hot loops to Python when running without breakpoints.")
+    start_parser.add_argument("--flush", choices=FLUSH_POLICIES, help="write program output after every instruction, at each newline or when the buffer fills (default: line on a terminal, full otherwise). Output is always written before input prompts and when execution pauses.")
+
+    run_parser = commands.add_parser("run", help="compile and run a program to completion without the interactive loop.")
+    run_parser.add_argument("file", help="path to the .sasm program file.")
+    run_parser.add_argument("--input", type=str, help="read program input from this file instead of stdin.")
+    run_parser.add_argument("--output", type=str, help="write program output to this file instead of stdout.")
+    run_parser.add_argument("--max-steps", type=int, help="stop with an error after this many instructions.")
+    run_parser.add_argument("--stats", action="store_true", help="print compile/run timings and instruction counts to stderr.")
+    run_parser.add_argument("--compiler", choices=sorted(COMPILER_BACKENDS), help="compiler backend: a container per program (docker), one warm container (worker), a local compiler binary (local) or cached output only (cache).")
+    run_parser.add_argument("--jit", action="store_true", help="compile hot loops to Python.")
+    run_parser.add_argument("--flush", choices=FLUSH_POLICIES, help="write program output to stdout after every instruction, at each newline or when the buffer fills (default: line on a terminal, full otherwise).")
+    test_parser = commands.add_parser("test", help="run every .sasm program in a directory against its expected output and state.")
+    test_parser.add_argument("dir", help="directory searched recursively for .sasm programs with .out or .state.json files.")
+    test_parser.add_argument("--jobs", type=int, help="number of worker processes (default: all cores).")
+    test_parser.add_argument("--max-steps", type=int, default=DEFAULT_MAX_STEPS, help="fail a test after this many instructions.")
+    test_parser.add_argument("--junit", type=str, help="write a JUnit XML report to this file.")
+    test_parser.add_argument("--json", type=str, help="write a JSON report with per-test timings to this file.")
+    test_parser.add_argument("--compiler", choices=sorted(COMPILER_BACKENDS), help="compiler backend: a container per program (docker), one warm container (worker), a local compiler binary (local) or cached output only (cache).")
+    test_parser.add_argument("--jit", action="store_true", help="compile hot loops to Python.")
+    bench_parser = commands.add_parser("bench", help="benchmark opcode handlers, whole programs and AST parsing.")
+    bench_parser.add_argument("--quick", action="store_true", help="run smaller benchmarks with fewer repeats.")
+    bench_parser.add_argument("--output", type=str, help="write the results as JSON to this file.")
+    bench_parser.add_argument("--baseline", type=str, help="compare against results saved with --output, failing on regressions.")
+    bench_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="percent slowdown counted as a regression (default: %(default)s).")
     args = parser.parse_args()
 
-    # Ensure the user provided the 'start' command
-    if args.command != "start":
-        print("Usage Error: You must provide the 'start' command to begin.")
-        exit(1)
+    if args.command == "bench":
+        exit(bench(args.quick, args.output, args.baseline, args.threshold))
+
+    if args.command == "test":
+        if not os.path.isdir(args.dir):
+            print(f"Usage Error: '{args.dir}' is not a directory.")
+            exit(EXIT_USAGE_ERROR)
+        if (args.jobs is not None and args.jobs < 1) or args.max_steps < 1:
+            print("Usage Error: --jobs and --max-steps must be at least 1.")
+            exit(EXIT_USAGE_ERROR)
+        compiler_backend = args.compiler or load_state().get("compiler_backend", "docker")
+        exit(run_tests(args.dir, args.jobs, args.max_steps, compiler_backend, args.junit, args.json, args.jit))
+
+    if args.command == "run":
+        if args.max_steps is not None and args.max_steps < 1:
+            print("Usage Error: --max-steps must be at least 1.", file=sys.stderr)
+            exit(EXIT_USAGE_ERROR)
+        compiler_backend = args.compiler or load_state().get("compiler_backend", "docker")
+        exit(run_batch(args.file, None, args.input, args.output, args.max_steps, args.stats, compiler_backend, args.jit,
+                       args.flush))
 
     # Initialize silent flags in state
     state = load_state()
@@ -214,32 +423,23 @@ def main():
         state["silent_flags"]["silenti"] = True
         state["silent_flags"]["silentr"] = True
     save_state(state)
+    saved_state = copy.deepcopy(state)
 
-    interpreter = Interpreter(compiler_image, state["silent_flags"]["silenti"], state["silent_flags"]["silentc"], state["silent_flags"]["silentr"], state["silent_flags"]["truesilent"])
+    compiler_backend = args.compiler or state.get("compiler_backend", "docker")
+    # The compiler is discovered on the first 'initialize', not at startup
+    interpreter = Interpreter(None, state["silent_flags"]["silenti"], state["silent_flags"]["silentc"], state["silent_flags"]["silentr"], state["silent_flags"]["truesilent"], compiler_backend, jit=args.jit,
+                              output=NullSink() if state["silent_flags"]["truesilent"] else StreamSink(flush_policy=args.flush))
 
     # Main loop for processing commands
+    parser = build_operation_parser()
     while True:
-        # Argument parser setup for operations
-        parser = argparse.ArgumentParser(description="Enter a command for the interpreter.")
-        parser.add_argument(
-            "operation",
-            choices=["initialize", "restart", "forward", "run", "terminate", "dump", "breakpoint", "end"],
-            help="The interpreter operation to perform."
-        )
-        parser.add_argument("-r", action="store_true", help="dump registers to console.")
-        parser.add_argument("-m", action="store_true", help="dump memory to console.")
-        parser.add_argument("-s", action="store_true", help="dump stack to console.")
-        parser.add_argument("-f", action="store_true", help="dump flags to console.")
-        parser.add_argument("-p", action="store_true", help="dump program data to console.")
-        parser.add_argument("--verbose", action="store_true", help="provide verbose output (used with 'dump') ")  # Add verbose flag
-        parser.add_argument("--file", type=str, help="path to the .sasm program file (used with 'initialize').")
-        parser.add_argument("--steps", type=int, help="number of steps to move forward (used with 'forward').")  # Add steps argument
-        parser.add_argument("--set", type=int, help="set a breakpoint at the specified line number (used with 'breakpoint').")
-        parser.add_argument("--remove", type=int, help="remove the breakpoint at the specified line number (used with 'breakpoint').")
-        parser.add_argument("--list", action="store_true", help="list all active breakpoints (used with 'breakpoint').")
-
         # Prompt user for input
-        user_input = input("> ").strip().split()
+        try:
+            user_input = shlex.split(input("> "))
+        except ValueError:
+            if not state["silent_flags"]["silenti"]:
+                print("Usage Error: Unbalanced quotes in command.")
+            continue
         if not user_input:
             continue
 
@@ -252,8 +452,10 @@ def main():
         # Process the command
         state = process_command(state, args, interpreter)
 
-        # Save state after every command
-        save_state(state)
+        # Save state when the command changed it
+        if state != saved_state:
+            save_state(state)
+            saved_state = copy.deepcopy(state)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,162 @@
+from array import array
+from bisect import bisect_left, insort
+from ignition.ast import OperandType
+
+PAGE_BITS = 12
+PAGE_SIZE = 1 << PAGE_BITS  # Cells per page
+PAGE_MASK = PAGE_SIZE - 1
+ADDRESS_LIMIT = 1 << 32  # Addresses are unsigned 32-bit
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+# Type tags stored per cell, 0 marks an uninitialized cell
+TYPE_TAGS = {operand_type: operand_type.value + 1 for operand_type in OperandType}
+TAG_TYPES = [None] + list(OperandType)
+BOOLEAN_TAG = TYPE_TAGS[OperandType.BOOLEAN]
+
+_ZERO_VALUES = array('q', bytes(8 * PAGE_SIZE))
+_ZERO_TYPES = bytes(PAGE_SIZE)
+
+
+class MemoryPage:
+    __slots__ = ("values", "types", "count", "objects")
+
+    def __init__(self):
+        self.values = array('q', _ZERO_VALUES)  # Integer cell values
+        self.types = bytearray(_ZERO_TYPES)  # Type tag per cell
+        self.count = 0  # Number of initialized cells
+        self.objects = None  # Offset -> value for cells that do not fit in an int64
+
+    def copy(self):
+        page = MemoryPage.__new__(MemoryPage)
+        page.values = array('q', self.values)
+        page.types = bytearray(self.types)
+        page.count = self.count
+        page.objects = dict(self.objects) if self.objects else None
+        return page
+
+
+class MemorySnapshot:
+    __slots__ = ("pages", "page_index", "count")
+
+    def __init__(self, pages, page_index, count):
+        self.pages = pages  # Page number -> MemoryPage, never written after the snapshot
+        self.page_index = page_index  # Sorted page numbers
+        self.count = count  # Initialized cells
+
+
+class PagedMemory:
+    """Sparse VM memory over the 32-bit address space.
+
+    Cells live in fixed-size pages of an int64 value array plus a type-tag byte
+    array, and a page is only allocated the first time one of its cells is
+    written. Values that are not integers (or do not fit in 64 bits, or are not
+    a real bool in a boolean cell) are kept in a small per-page side table. Allocated page numbers are also kept in a sorted
+    index so that ordered and ranged walks never sort the whole memory.
+
+    Snapshots are copy-on-write: taking or restoring one only copies the page
+    table, and a page shared with a snapshot is copied the first time it is
+    written afterwards.
+    """
+    def __init__(self):
+        self.pages = {}  # Page number -> MemoryPage
+        self._page_index = []  # Sorted allocated page numbers
+        self._count = 0  # Initialized cells across all pages
+        self._shared = set()  # Page numbers whose page is also held by a snapshot
+
+    def set(self, addr, val, type):
+        page = self.pages.get(addr >> PAGE_BITS)
+        if page is None:
+            if not 0 <= addr < ADDRESS_LIMIT:
+                raise IndexError(f"Memory address {addr} is out of range.")
+            page = self.pages[addr >> PAGE_BITS] = MemoryPage()
+            insort(self._page_index, addr >> PAGE_BITS)
+        elif self._shared and addr >> PAGE_BITS in self._shared:
+            page = self._unshare(addr >> PAGE_BITS)
+        offset = addr & PAGE_MASK
+        if not page.types[offset]:
+            page.count += 1
+            self._count += 1
+        tag = page.types[offset] = TYPE_TAGS[type] if type is not None else TYPE_TAGS[OperandType.UNKNOWN]
+        # Boolean cells in the value array read back as bool, so other values under that tag go to the side table
+        if (val.__class__ is bool) if tag == BOOLEAN_TAG else (val.__class__ is int and INT64_MIN <= val <= INT64_MAX):
+            page.values[offset] = val
+            if page.objects:
+                page.objects.pop(offset, None)
+        else:
+            if page.objects is None:
+                page.objects = {}
+            page.objects[offset] = val
+
+    def get(self, addr):
+        page = self.pages.get(addr >> PAGE_BITS)
+        if page is None:
+            return None
+        offset = addr & PAGE_MASK
+        tag = page.types[offset]
+        if not tag:
+            return None
+        if page.objects and offset in page.objects:
+            return page.objects[offset], TAG_TYPES[tag]
+        if tag == BOOLEAN_TAG:
+            return bool(page.values[offset]), TAG_TYPES[tag]
+        return page.values[offset], TAG_TYPES[tag]
+
+    def clear(self, addr):
+        # Return a cell to the uninitialized state
+        page = self.pages.get(addr >> PAGE_BITS)
+        if page is None:
+            return
+        if self._shared and addr >> PAGE_BITS in self._shared:
+            page = self._unshare(addr >> PAGE_BITS)
+        offset = addr & PAGE_MASK
+        if page.types[offset]:
+            page.types[offset] = 0
+            page.values[offset] = 0
+            page.count -= 1
+            self._count -= 1
+            if page.objects:
+                page.objects.pop(offset, None)
+
+    def contains(self, addr):
+        page = self.pages.get(addr >> PAGE_BITS)
+        return page is not None and page.types[addr & PAGE_MASK] != 0
+
+    def items(self, start=0, end=ADDRESS_LIMIT, reverse=False):
+        # (address, (value, type)) pairs for start <= address < end, in address order
+        if start >= end:
+            return
+        first = bisect_left(self._page_index, start >> PAGE_BITS)
+        last = bisect_left(self._page_index, ((end - 1) >> PAGE_BITS) + 1)
+        page_nums = self._page_index[first:last]
+        for page_num in (reversed(page_nums) if reverse else page_nums):
+            page = self.pages[page_num]
+            if not page.count:
+                continue
+            base = page_num << PAGE_BITS
+            offsets = range(max(start - base, 0), min(end - base, PAGE_SIZE))
+            types = page.types
+            for offset in (reversed(offsets) if reverse else offsets):
+                if types[offset]:
+                    yield base + offset, self.get(base + offset)
+
+    def snapshot(self):
+        self._shared = set(self.pages)
+        return MemorySnapshot(dict(self.pages), list(self._page_index), self._count)
+
+    def restore(self, snapshot):
+        self.pages = dict(snapshot.pages)
+        self._page_index = list(snapshot.page_index)
+        self._count = snapshot.count
+        self._shared = set(self.pages)
+
+    def _unshare(self, page_num):
+        page = self.pages[page_num] = self.pages[page_num].copy()
+        self._shared.discard(page_num)
+        return page
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, addr):
+        return self.contains(addr)
@@ -0,0 +1,100 @@
+import io
+import sys
+
+# Flush policies for buffered streams
+FLUSH_ALWAYS = "always"  # Write out after every output instruction
+FLUSH_LINE = "line"  # Write out when a newline is written
+FLUSH_FULL = "full"  # Write out when the buffer fills
+FLUSH_POLICIES = (FLUSH_ALWAYS, FLUSH_LINE, FLUSH_FULL)
+DEFAULT_BUFFER_SIZE = 8192  # Characters held before a full buffer is written out
+
+# Program output ('output' and 'print' instructions) goes to a sink with write(text), flush() and close().
+# The execution engine flushes its sink whenever anything else may appear on the terminal: before reading
+# input, before reporting an error and whenever execution pauses, so buffering never reorders program output
+# relative to prompts or messages.
+
+
+class StreamSink:
+    """Buffered writes to a text stream, sys.stdout by default.
+
+    Without a stream the sink writes to whatever sys.stdout is when the buffer is
+    written out, so it follows contextlib.redirect_stdout. Without a flush policy,
+    the buffer is written out at each newline on a terminal and when it fills
+    otherwise.
+    """
+    def __init__(self, stream=None, flush_policy=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.stream = stream  # Text stream, or None for the current sys.stdout
+        if flush_policy is None:
+            target = stream if stream is not None else sys.stdout
+            flush_policy = FLUSH_LINE if _isatty(target) else FLUSH_FULL
+        self.flush_policy = flush_policy
+        self._limit = 0 if flush_policy == FLUSH_ALWAYS else buffer_size  # Buffered characters that force a write
+        self._line = flush_policy == FLUSH_LINE
+        self._buffer = []
+        self._size = 0  # Characters in the buffer
+
+    def write(self, text):
+        self._buffer.append(text)
+        self._size += len(text)
+        if self._size >= self._limit or self._line and "\n" in text:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write("".join(self._buffer))
+        stream.flush()
+        self._buffer.clear()
+        self._size = 0
+
+    def close(self):
+        self.flush()
+
+
+class FileSink(StreamSink):
+    """Buffered writes to a file, which the sink opens and closes."""
+    def __init__(self, path, flush_policy=FLUSH_FULL, buffer_size=DEFAULT_BUFFER_SIZE):
+        super().__init__(open(path, "w"), flush_policy, buffer_size)
+        self.path = path
+
+    def close(self):
+        self.flush()
+        self.stream.close()
+
+
+class CaptureSink:
+    """Keeps all output in memory, for tests and services."""
+    def __init__(self):
+        self._buffer = io.StringIO()
+
+    def write(self, text):
+        self._buffer.write(text)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def getvalue(self):
+        return self._buffer.getvalue()
+
+
+class NullSink:
+    """Discards all output."""
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _isatty(stream):
+    try:
+        return stream.isatty()
+    except (AttributeError, ValueError):
+        return False
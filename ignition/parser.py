@@ -1,74 +1,264 @@
-import subprocess
 import json
-from ignition.ast import AbstractSyntaxTree, RootNode, InstructionNode, OperandNode, InstructionType, OperandType
-from ignition.ast import decode_operand_type, decode_instruction_type, NumOperands
+import subprocess
+from ignition import compiler_target
+from ignition.compiler import make_compiler, DEFAULT_TIMEOUT
+from ignition.ast import AbstractSyntaxTree, decode_operand_type, decode_instruction_type, NumOperands
+
+CHUNK_SIZE = 1 << 16  # Characters read from the compiler's output at a time
+WHITESPACE = " \t\n\r"
 
 
 class Parser:
-    def __init__(self):
-        self.json_output = None
+    """Builds ASTs from the compiler's JSON output.
+
+    The output is read as a stream: the root's instructions are decoded and added
+    to the tree's arrays one at a time as the compiler writes them, so no copy of
+    the whole JSON document is held in memory. Output is
+    written through to the AST cache while it is read, and cache hits are streamed
+    from the cache file the same way.
+    """
+    def __init__(self, cache=None, backend="docker", timeout=DEFAULT_TIMEOUT, interactive=True):
+        self.cache = cache  # Optional ASTCache
+        self.backend = backend  # Compiler backend name (see ignition.compiler)
+        self.timeout = timeout  # Seconds allowed per compile
+        self.interactive = interactive  # Whether the user may be asked for a compiler image
+        self._compilers = {}  # Compiler target -> backend instance
+        self._identities = {}  # Compiler target -> compiler identity used in cache keys
 
     def parse_program(self, program_path, compiler_image, silent_c) -> AbstractSyntaxTree:
-        self._call_compiler(program_path, compiler_image, silent_c)
+        # A compiler_image of None is resolved from the configuration on first use
+        if compiler_image is None:
+            compiler_image = compiler_target(self.backend, self.interactive)
+            if compiler_image is None:
+                if not silent_c:
+                    print(f"Compiler Error: No compiler is configured for the '{self.backend}' backend.")
+                return None
+        return self._call_compiler(program_path, compiler_image, silent_c)
+
+    def build_ast(self, json_output) -> AbstractSyntaxTree:
+        # Build a tree from already loaded compiler JSON
+        if json_output.get("type") != "ROOT":
+            raise ValueError(f"Expected a ROOT node, got: {json_output.get('type')}")
         ast = AbstractSyntaxTree()
-        if self.json_output is None:
-            return None
-        root_node = self._build_ast(self.json_output)
-        ast.set_root(root_node)
+        for instruction in json_output.get("children", []):
+            self._add_instruction(ast, instruction)
         return ast
 
+    def close(self):
+        for compiler in self._compilers.values():
+            compiler.close()
+        self._compilers = {}
+        if self.cache is not None:
+            self.cache.close()
+
+    # PRIVATE METHODS
     def _call_compiler(self, program_path, compiler_image, silent_c):
-        compiler_command = ["docker", "run", "--rm", compiler_image, "ast", program_path]
+        cache_key = self._cache_key(program_path, compiler_image)
+        if cache_key is not None:
+            ast = self._read_cached(cache_key)
+            if ast is not None:
+                return ast
         try:
-            result = subprocess.run(
-                compiler_command,
-                text=True,
-                capture_output=True,
-                check=False
-            )
-            if result.returncode != 0 and not silent_c:
-                print(f"Compiler Error: Syntax issues encountered during compilation:\n{result.stderr.strip()}")
-                self.json_output = None
-            else:
-                self.json_output = json.loads(result.stdout)
+            return self._compile(program_path, compiler_image, cache_key, silent_c)
         except Exception as e:
             if not silent_c:
                 print(f"Compiler Error: Failed to call compiler image {str(e)}")
-            self.json_output = None
-
-    def _build_ast(self, json_node) -> RootNode:
-        node_type = json_node.get("type")
-        value = json_node.get("value", "")
-        children = json_node.get("children", [])
-        ast_node = None
-        if node_type == "ROOT":
-            ast_node = RootNode()
-        elif node_type == "INSTRUCTION":
-            instruction_type = decode_instruction_type(json_node.get("instruction_type"))
-            num_operands = NumOperands(json_node.get("num_operands"))
-            line = json_node.get("line", -1)
-            ast_node = InstructionNode(
-                value=value,
-                instruction_type=instruction_type,
-                num_operands=num_operands,
-                line=line,
-            )
-        elif node_type == "OPERAND":
-            operand_type = decode_operand_type(json_node.get("operand_type"))
-            line = json_node.get("line", -1)
-            pos = json_node.get("position", -1)
-            ast_node = OperandNode(
-                value=value,
-                operand_type=operand_type,
-                line=line,
-                pos=pos,
+            return None
+
+    def _read_cached(self, cache_key):
+        entry = self.cache.open_entry(cache_key)
+        if entry is None:
+            return None
+        try:
+            with entry:
+                return self._read_program(entry)
+        except (OSError, ValueError, TypeError, AttributeError):
+            # An unreadable entry is dropped and the program compiled again
+            self.cache.invalidate(cache_key)
+            return None
+
+    def _compile(self, program_path, compiler_image, cache_key, silent_c):
+        compiler = self._get_compiler(compiler_image)
+        for attempt in range(2):
+            process = compiler.stream(program_path)
+            writer = self.cache.open_writer(cache_key) if cache_key is not None else None
+            ast = error = None
+            try:
+                ast = self._read_program(process.stdout, writer)
+            except ValueError as e:
+                # Output that is not a complete AST, which is reported below unless the compiler failed
+                error = e
+            finally:
+                returncode = process.close()
+                if writer is not None:
+                    if ast is not None and returncode == 0:
+                        writer.commit()
+                    else:
+                        writer.discard()
+            if returncode != 0 and compiler.recover(process) and attempt == 0:
+                continue
+            if process.timed_out:
+                raise subprocess.TimeoutExpired(process.args, self.timeout)
+            if returncode != 0:
+                if not silent_c:
+                    print(f"Compiler Error: Syntax issues encountered during compilation:\n{process.stderr.strip()}")
+                return None
+            if error is not None:
+                raise error
+            return ast
+
+    def _read_program(self, stream, tee=None) -> AbstractSyntaxTree:
+        # Build the tree from a stream of compiler JSON, one instruction at a time
+        reader = JSONStreamReader(stream, tee)
+        ast = AbstractSyntaxTree()
+        node_type = None
+        reader.expect("{")
+        more = not reader.end("}")
+        while more:
+            key = reader.value()
+            reader.expect(":")
+            if key == "children":
+                reader.expect("[")
+                more_children = not reader.end("]")
+                while more_children:
+                    self._add_instruction(ast, reader.value())
+                    more_children = reader.next_item("]")
+            elif key == "type":
+                node_type = reader.value()
+            else:
+                reader.value()
+            more = reader.next_item("}")
+        reader.finish()
+        if node_type != "ROOT":
+            raise ValueError(f"Expected a ROOT node, got: {node_type}")
+        return ast
+
+    def _get_compiler(self, compiler_image):
+        if compiler_image not in self._compilers:
+            self._compilers[compiler_image] = make_compiler(self.backend, compiler_image, self.timeout)
+        return self._compilers[compiler_image]
+
+    def _cache_key(self, program_path, compiler_image):
+        if self.cache is None:
+            return None
+        image_id = self._identity(compiler_image)
+        if image_id is None:
+            return None
+        try:
+            with open(program_path, "rb") as f:
+                source = f.read()
+        except OSError:
+            return None
+        return self.cache.make_key(source, image_id)
+
+    def _identity(self, compiler_image):
+        if compiler_image not in self._identities:
+            identity = self._get_compiler(compiler_image).identity()
+            if identity is None:
+                return None
+            self._identities[compiler_image] = identity
+        return self._identities[compiler_image]
+
+    def _add_instruction(self, ast, json_node):
+        if json_node.get("type") != "INSTRUCTION":
+            raise ValueError(f"Expected an INSTRUCTION node, got: {json_node.get('type')}")
+        line = json_node.get("line", -1)
+        ast.add_instruction(
+            value=json_node.get("value", ""),
+            instruction_type=decode_instruction_type(json_node.get("instruction_type")),
+            num_operands=NumOperands(json_node.get("num_operands")),
+            line=line,
+        )
+        for operand in json_node.get("children", []):
+            if operand.get("type") != "OPERAND":
+                raise ValueError(f"Expected an OPERAND node, got: {operand.get('type')}")
+            if operand.get("children"):
+                raise ValueError(f"Operand on line {operand.get('line', line)} has children")
+            ast.add_operand(
+                value=operand.get("value", ""),
+                operand_type=decode_operand_type(operand.get("operand_type")),
+                line=operand.get("line", -1),
+                pos=operand.get("position", -1),
             )
-        else:
-            raise ValueError(f"Unknown node type: {node_type}")
 
-        # Recursively process and add children
-        for child_json in children:
-            child_node = self._build_ast(child_json)
-            ast_node.add_child(child_node)
 
-        return ast_node
+class JSONStreamReader:
+    """Reads one JSON document from a text stream piece by piece.
+
+    Containers are walked with expect/end/next_item and their elements decoded
+    whole with value(), refilling the buffer from the stream as needed. Everything
+    read is also written to `tee` when one is given.
+    """
+    def __init__(self, stream, tee=None):
+        self.stream = stream
+        self.tee = tee
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    # PUBLIC METHODS
+    def value(self):
+        # Decode the next complete value
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"Expected '{char}' in compiler output, got: {self._peek() or 'end of output'}")
+        self._pos += 1
+
+    def end(self, close):
+        # Consume the closing character of an empty container
+        if self._peek() == close:
+            self._pos += 1
+            return True
+        return False
+
+    def next_item(self, close):
+        # After an element: whether another one follows, consuming the separator or closing character
+        if self._peek() == ",":
+            self._pos += 1
+            return True
+        self.expect(close)
+        return False
+
+    def finish(self):
+        # Read to the end of the stream, which may only hold whitespace
+        if self._peek() != "":
+            raise ValueError("Unexpected data after the end of the compiler output")
+
+    # PRIVATE METHODS
+    def _peek(self):
+        # Next non-whitespace character, or "" at the end of the stream
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def _fill(self):
+        if self._eof:
+            return False
+        chunk = self.stream.read(CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        if self.tee is not None:
+            self.tee.write(chunk)
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
@@ -0,0 +1,100 @@
+import random
+from time import perf_counter
+from ignition.ast import InstructionType
+
+
+class Profiler:
+    """Per-instruction execution profile of a program.
+
+    In exact mode every executed instruction is counted and the host time until
+    the next instruction is charged to it. In sampling mode the program runs in
+    chunks of about sample_interval instructions with no per-instruction hook, and
+    the instruction about to run at the end of each chunk is sampled and charged
+    with the chunk's time. Chunk lengths are jittered so that loops whose length
+    divides the interval are not always sampled at the same instruction. Totals
+    per instruction type and per source line are derived from the per-instruction
+    figures when the report is built.
+    """
+    def __init__(self, program, sample_interval=None):
+        self.program = program
+        self.sample_interval = sample_interval  # None for exact counting
+        self.counts = [0] * len(program)  # Instruction index -> hits (samples in sampling mode)
+        self.times = [0.0] * len(program)  # Instruction index -> host seconds
+        self.executed = 0  # Instructions executed while profiling
+        self._last_pc = None  # Instruction charged with the time since _last_time
+        self._last_time = 0.0
+        self._random = random.Random(0)  # Sample interval jitter
+        self._until_sample = self._next_interval()  # Instructions left before the next sample
+        self.hook = self._count if sample_interval is None else self._tick  # Per-instruction hook
+
+    # PUBLIC METHODS
+    def run(self, engine, max_steps=None, hook=None):
+        # Sampling fast path: run in chunks without a profiling hook, returning instructions executed
+        total = 0
+        while max_steps is None or total < max_steps:
+            chunk = self._until_sample if max_steps is None else min(self._until_sample, max_steps - total)
+            steps = engine.run(chunk, hook)
+            total += steps
+            self.executed += steps
+            self._until_sample -= steps
+            if self._until_sample == 0:
+                self._sample(engine.runtime.p_counter)
+            if steps < chunk:
+                break
+        return total
+
+    def start(self):
+        # Begin timing, called before the program resumes
+        self._last_pc = None
+        self._last_time = perf_counter()
+
+    def stop(self):
+        # Charge the time since the last instruction or sample, called when the program pauses
+        now = perf_counter()
+        if self._last_pc is not None and self._last_pc < len(self.times):
+            self.times[self._last_pc] += now - self._last_time
+        self._last_pc = None
+
+    def by_line(self):
+        # (instruction index, source line, instruction type, hits, seconds) for every profiled instruction
+        return [(pc, self.program.lines[pc], InstructionType(self.program.opcodes[pc]), self.counts[pc], self.times[pc])
+                for pc in range(len(self.counts)) if self.counts[pc] or self.times[pc]]
+
+    def by_type(self):
+        # Instruction type -> [hits, seconds]
+        totals = {}
+        for pc, _, instruction_type, hits, seconds in self.by_line():
+            total = totals.setdefault(instruction_type, [0, 0.0])
+            total[0] += hits
+            total[1] += seconds
+        return totals
+
+    # PRIVATE METHODS
+    def _count(self, pc):
+        now = perf_counter()
+        if self._last_pc is not None:
+            self.times[self._last_pc] += now - self._last_time
+        self.counts[pc] += 1
+        self.executed += 1
+        self._last_pc = pc
+        self._last_time = now
+
+    def _tick(self, pc):
+        # Sampling on the instrumented path, where a hook runs anyway
+        self.executed += 1
+        self._until_sample -= 1
+        if self._until_sample == 0:
+            self._sample(pc)
+
+    def _sample(self, pc):
+        now = perf_counter()
+        if pc < len(self.counts):
+            self.counts[pc] += 1
+            self.times[pc] += now - self._last_time
+        self._last_time = now
+        self._until_sample = self._next_interval()
+
+    def _next_interval(self):
+        if self.sample_interval is None:
+            return None
+        return self._random.randint((self.sample_interval + 1) // 2, self.sample_interval * 3 // 2)
@@ -1,50 +1,99 @@
 from ignition.ast import OperandType
+from ignition.memory import PagedMemory, ADDRESS_LIMIT
 INT32_MIN = -2_147_483_648
 INT32_MAX = 2_147_483_647
+GENERAL_REGISTERS = 10  # r0-r9
+SP_REGISTER = 10  # Register index used for 'sp'
+REGISTER_COUNT = 11
+
+class RuntimeSnapshot:
+    __slots__ = ("reg_values", "reg_types", "p_counter", "flags", "memory")
+
+    def __init__(self, reg_values, reg_types, p_counter, flags, memory):
+        self.reg_values = reg_values  # Copy of the register value slots
+        self.reg_types = reg_types  # Copy of the register type slots
+        self.p_counter = p_counter  # Program counter
+        self.flags = flags  # (flag value, overflow value)
+        self.memory = memory  # MemorySnapshot
+
 
 class Runtime:
     def __init__(self):
-        # Registers (Val, Type)
-        self.registers = [[None, None], [None, None], [None, None], [None, None], [None, None], [None, None], [None, None], [None, None], [None, None], [None, None]]
+        # Register file (r0-r9 and sp), values and types held in separate slots
+        self.reg_values = [None] * REGISTER_COUNT
+        self.reg_types = [None] * REGISTER_COUNT
+        self.reg_values[SP_REGISTER] = INT32_MAX+1  # Stack Pointer
+        self.reg_types[SP_REGISTER] = OperandType.MEMORY_ADDRESS
         # Memory
-        self.memory = {}
+        self.memory = PagedMemory()
         # Counters and pointers
-        self.s_pointer = INT32_MAX+1  # Stack Pointer
         self.p_counter = 0  # Program Counter
-        # Flags (State, Iteration)
-        self.z_flag = False  # Zero Flag
-        self.o_flag = False  # Overflow Flag
-        self.s_flag = False  # Sign Flag
+        # Flags (State, Iteration), kept as the results they are derived from and only worked out when read
+        self.flag_value = 1  # Wrapped result of the last flag-setting instruction, gives the zero and sign flags
+        self.overflow_value = 0  # Unwrapped result of the last integer flag-setting instruction, gives the overflow flag
+
+    @property
+    def z_flag(self):
+        return self.flag_value == 0
+
+    @z_flag.setter
+    def z_flag(self, state):
+        self.flag_value = 0 if state else -1 if self.flag_value < 0 else 1
+
+    @property
+    def s_flag(self):
+        return self.flag_value < 0
+
+    @s_flag.setter
+    def s_flag(self, state):
+        # A result is never both zero and negative, so setting the sign flag clears the zero flag
+        self.flag_value = -1 if state else 0 if self.flag_value == 0 else 1
+
+    @property
+    def o_flag(self):
+        return self.overflow_value < INT32_MIN or self.overflow_value > INT32_MAX
+
+    @o_flag.setter
+    def o_flag(self, state):
+        self.overflow_value = INT32_MAX + 1 if state else 0
+
+    @property
+    def s_pointer(self):
+        return self.reg_values[SP_REGISTER]
+
+    @s_pointer.setter
+    def s_pointer(self, value):
+        self.reg_values[SP_REGISTER] = value
 
     # REGISTER OPERATIONS
     def set_register(self, reg, val, type):
-        self.registers[int(reg[1])] = [val,type]
+        self.reg_values[reg] = val
+        self.reg_types[reg] = type
     def get_register(self, reg):
-        if reg == 'sp':
-            return [self.s_pointer, OperandType.MEMORY_ADDRESS]
-        elif self.registers[int(reg[1])][0] is None:
+        val = self.reg_values[reg]
+        if val is None:
             return None
-        else:
-            return self.registers[int(reg[1])]
+        return (val, self.reg_types[reg])
 
     # MEMORY OPERATIONS
     def set_memory(self, addr, val, type):
-        self.memory[addr] = [val, type]
+        self.memory.set(addr, val, type)
     def get_memory(self, addr):
-        if addr not in self.memory.keys():
-            return None
-        else:
-            return self.memory[addr]
+        return self.memory.get(addr)
     def addr_initialized(self, addr):
-        return addr in self.memory.keys()
+        return self.memory.contains(addr)
+    def addr_in_range(self, addr):
+        return 0 <= addr < ADDRESS_LIMIT
 
     # STACK OPERATIONS
     def push_stack(self, val, type):
-        self.memory[self.s_pointer-1] = [val, type]
+        self.memory.set(self.s_pointer-1, val, type)
         self.s_pointer -=1
     def pop_stack(self):
+        if self.s_pointer > INT32_MAX:
+            return None
         self.s_pointer += 1
-        return self.memory[self.s_pointer-1]
+        return self.memory.get(self.s_pointer-1)
     def get_stack_pointer(self):
         return self.s_pointer
 
@@ -66,6 +115,15 @@ class Runtime:
             case 's':
                 self.s_flag = state
 
+    def flags(self):
+        # (z, s, o)
+        value = self.flag_value
+        return value == 0, value < 0, self.overflow_value < INT32_MIN or self.overflow_value > INT32_MAX
+
+    def set_flags(self, z, s, o):
+        self.flag_value = 0 if z else -1 if s else 1
+        self.overflow_value = INT32_MAX + 1 if o else 0
+
     def get_flag(self, flag):
         match flag:
             case 'z':
@@ -75,20 +133,33 @@ class Runtime:
             case 's':
                 return self.s_flag
 
+    # SNAPSHOT OPERATIONS
+    def snapshot(self):
+        return RuntimeSnapshot(list(self.reg_values), list(self.reg_types), self.p_counter,
+                               (self.flag_value, self.overflow_value), self.memory.snapshot())
+    def restore(self, snapshot):
+        # Registers are restored in place, the execution engine holds the slot lists
+        self.reg_values[:] = snapshot.reg_values
+        self.reg_types[:] = snapshot.reg_types
+        self.p_counter = snapshot.p_counter
+        self.flag_value, self.overflow_value = snapshot.flags
+        self.memory.restore(snapshot.memory)
+
     # DUMP OPERATIONS
     def dump_registers(self):
-        reg_output = " ".join(f"r{i}:{val[0]}({val[1]})" if val[0] is not None else f"r{i}:None(None)" for i, val in enumerate(self.registers))
+        reg_output = " ".join(f"r{i}:{self.reg_values[i]}({self.reg_types[i]})" if self.reg_values[i] is not None else f"r{i}:None(None)" for i in range(GENERAL_REGISTERS))
         return reg_output
-    def dump_memory(self):
-        mem_output = " ".join(f"{addr}:{val[0]}({val[1]})"for addr, val in sorted(self.memory.items())if addr < self.s_pointer)
-        return mem_output
-    def dump_stack(self):
-        stack_output = " ".join(f"{val[0]}({val[1]})"for addr, val in sorted(self.memory.items(), key=lambda item: item[0], reverse=True)if addr >= self.s_pointer)
-        return stack_output
+    def iter_memory(self, start=0, end=ADDRESS_LIMIT):
+        # Heap cells (below the stack pointer) in ascending address order
+        return self.memory.items(start, min(end, self.s_pointer))
+    def iter_stack(self, start=0, end=ADDRESS_LIMIT):
+        # Stack cells from the top of the stack (highest address) down
+        return self.memory.items(max(start, self.s_pointer), end, reverse=True)
     def dump_flags(self):
-        flag_output = f"zf:{int(self.z_flag)} "
-        flag_output += f"sf:{int(self.s_flag)} "
-        flag_output += f"of:{int(self.o_flag)}"
+        z_flag, s_flag, o_flag = self.flags()
+        flag_output = f"zf:{int(z_flag)} "
+        flag_output += f"sf:{int(s_flag)} "
+        flag_output += f"of:{int(o_flag)}"
         return flag_output
     def dump_program_state(self):
         prog_state = f"pc:{self.p_counter} "
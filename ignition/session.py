@@ -0,0 +1,104 @@
+import hashlib
+from itertools import count
+from ignition.analysis import analyze, format_error
+from ignition.cache import ASTCache
+from ignition.decoder import Decoder
+from ignition.errors import DecodeError
+from ignition.interpreter import Interpreter
+from ignition.parser import Parser
+
+
+class SessionManager:
+    """Holds many independent interpreter sessions in one process.
+
+    All sessions use one parser (and so one compiler backend and AST cache). Programs
+    are compiled, decoded and analysed once per distinct source: sessions opened on
+    the same source share its AST, decoded program and analysis, which are released
+    when the last of those sessions is closed.
+    """
+    def __init__(self, compiler_image=None, compiler_backend="docker", silent_i=True, silent_c=False,
+                 silent_r=False, silent_o=False, parser=None, jit=False):
+        self.compiler_image = compiler_image  # None resolves the compiler from the configuration
+        self.parser = parser if parser is not None else Parser(ASTCache(), compiler_backend)
+        self.silent_i = silent_i
+        self.silent_c = silent_c
+        self.silent_r = silent_r
+        self.silent_o = silent_o
+        self.jit = jit  # Compile hot loops (see ignition.jit)
+        self._sessions = {}  # Session ID -> Interpreter
+        self._session_sources = {}  # Session ID -> source hash
+        self._programs = {}  # Source hash -> [AST, DecodedProgram, ProgramAnalysis, open session count]
+        self._ids = count(1)
+
+    # PUBLIC METHODS
+    def open(self, program_path, output=None):
+        # Load a program into a new session, returning its ID or None if it could not be loaded.
+        # Program output goes to the given sink (see ignition.output), or to stdout.
+        try:
+            with open(program_path, "rb") as f:
+                source_hash = hashlib.sha256(f.read()).hexdigest()
+        except OSError as e:
+            if not self.silent_c:
+                print(f"Compiler Error: Cannot read program '{program_path}': {e.strerror}.")
+            return None
+        entry = self._programs.get(source_hash)
+        if entry is None:
+            entry = self._load_program(program_path)
+            if entry is None:
+                return None
+            self._programs[source_hash] = entry
+        interpreter = Interpreter(self.compiler_image, self.silent_i, self.silent_c, self.silent_r, self.silent_o,
+                                  parser=self.parser, jit=self.jit, output=output)
+        interpreter.load(entry[0], entry[1], entry[2])
+        entry[3] += 1
+        session_id = next(self._ids)
+        self._sessions[session_id] = interpreter
+        self._session_sources[session_id] = source_hash
+        return session_id
+
+    def get(self, session_id):
+        return self._sessions[session_id]
+
+    def close(self, session_id):
+        interpreter = self._sessions.pop(session_id)
+        interpreter.terminate()
+        source_hash = self._session_sources.pop(session_id)
+        entry = self._programs[source_hash]
+        entry[3] -= 1
+        if entry[3] == 0:
+            del self._programs[source_hash]
+
+    def close_all(self):
+        for session_id in list(self._sessions):
+            self.close(session_id)
+        self.parser.close()
+
+    def program_count(self):
+        # Number of distinct decoded programs held
+        return len(self._programs)
+
+    def __contains__(self, session_id):
+        return session_id in self._sessions
+
+    def __iter__(self):
+        return iter(self._sessions)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    # PRIVATE METHODS
+    def _load_program(self, program_path):
+        ast = self.parser.parse_program(program_path, self.compiler_image, self.silent_c)
+        if ast is None:
+            return None
+        try:
+            program = Decoder().decode(ast)
+        except DecodeError as e:
+            if not self.silent_c:
+                print(f"Compiler Error: {e}")
+            return None
+        analysis = analyze(program)
+        if not self.silent_r:
+            for pc, message in analysis.errors:
+                print(format_error(program, pc, message))
+        return [ast, program, analysis, 0]
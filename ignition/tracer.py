@@ -0,0 +1,143 @@
+import os
+import struct
+from ignition.ast import InstructionType
+
+# One record per executed instruction: pc, opcode, flag bits, destination value
+RECORD = struct.Struct("<IBBq")
+TRACE_MAGIC = b"IGNTRC01"  # Header of trace files
+DEFAULT_CAPACITY = 1_000_000  # Records kept in the in-memory ring buffer
+
+# Flag bits
+Z_BIT = 1
+S_BIT = 2
+O_BIT = 4
+VALUE_BIT = 8  # The record carries a destination value
+
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+
+class TraceRecord:
+    __slots__ = ("pc", "opcode", "value", "z", "s", "o")
+
+    def __init__(self, pc, opcode, bits, value):
+        self.pc = pc  # Instruction index
+        self.opcode = opcode  # InstructionType value
+        self.value = value if bits & VALUE_BIT else None  # Value written by the instruction
+        self.z = bool(bits & Z_BIT)
+        self.s = bool(bits & S_BIT)
+        self.o = bool(bits & O_BIT)
+
+
+class Tracer:
+    """Binary trace of executed instructions, kept in a ring buffer or streamed to a file.
+
+    Each executed instruction becomes a fixed-size packed record of its index,
+    opcode, the flags after it ran and the value it wrote (the destination
+    register for register writes, the stored or pushed value for store and push).
+    A record is completed when the next instruction starts or execution pauses.
+    """
+    def __init__(self, runtime, program, capacity=DEFAULT_CAPACITY, path=None):
+        self.runtime = runtime
+        self.program = program
+        self.path = path  # Trace file, or None for the ring buffer
+        self.capacity = capacity  # Ring buffer size in records
+        self.recorded = 0  # Records written since tracing started
+        self._destinations = _destination_registers(program)
+        self._pending = None  # Instruction started but not yet recorded
+        if path is None:
+            self._buffer = bytearray(RECORD.size * capacity)
+            self._file = None
+        else:
+            self._buffer = None
+            self._file = open(path, "wb")
+            self._file.write(TRACE_MAGIC)
+
+    # PUBLIC METHODS
+    def record(self, pc):
+        # Step hook: complete the previous instruction's record and start this one
+        if self._pending is not None:
+            self._write(self._pending)
+        self._pending = pc
+
+    def flush(self):
+        # Complete the pending record, called when execution pauses
+        if self._pending is not None:
+            self._write(self._pending)
+            self._pending = None
+        if self._file is not None:
+            self._file.flush()
+
+    def last(self, count):
+        # The most recent records, oldest first
+        self.flush()
+        if self.path is not None:
+            return read_trace_file(self.path, count)[0]
+        count = min(count, self.recorded, self.capacity)
+        if count <= 0:
+            return []
+        start = (self.recorded - count) % self.capacity * RECORD.size
+        end = self.recorded % self.capacity * RECORD.size
+        if start < end:
+            data = bytes(self._buffer[start:end])
+        else:
+            data = bytes(self._buffer[start:]) + bytes(self._buffer[:end])
+        return [TraceRecord(*fields) for fields in RECORD.iter_unpack(data)]
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # PRIVATE METHODS
+    def _write(self, pc):
+        runtime = self.runtime
+        z_flag, s_flag, o_flag = runtime.flags()
+        bits = (Z_BIT if z_flag else 0) | (S_BIT if s_flag else 0) | (O_BIT if o_flag else 0)
+        value = 0
+        reg = self._destinations[pc]
+        if reg is not None:
+            reg_value = runtime.reg_values[reg]
+            if reg_value.__class__ is int or reg_value.__class__ is bool:
+                if INT64_MIN <= reg_value <= INT64_MAX:
+                    value = reg_value
+                    bits |= VALUE_BIT
+        if self.path is None:
+            RECORD.pack_into(self._buffer, (self.recorded % self.capacity) * RECORD.size,
+                             pc, self.program.opcodes[pc], bits, value)
+        else:
+            self._file.write(RECORD.pack(pc, self.program.opcodes[pc], bits, value))
+        self.recorded += 1
+
+
+def read_trace_file(path, count=None):
+    # The last count records of a trace file written by Tracer (all of them by default), oldest first,
+    # and the number of records in the file
+    with open(path, "rb") as f:
+        if f.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+            raise ValueError(f"'{path}' is not an Ignition trace file.")
+        total = (os.fstat(f.fileno()).st_size - len(TRACE_MAGIC)) // RECORD.size
+        count = total if count is None else max(min(count, total), 0)
+        f.seek(len(TRACE_MAGIC) + (total - count) * RECORD.size)
+        data = f.read(count * RECORD.size)
+    return [TraceRecord(*fields) for fields in RECORD.iter_unpack(data)], total
+
+
+def _destination_registers(program):
+    # Register holding the value each instruction writes, or None
+    destinations = []
+    for opcode, operands in zip(program.opcodes, program.operands):
+        reg = None
+        match InstructionType(opcode):
+            case InstructionType.MOVE | InstructionType.CAST | InstructionType.INPUT | InstructionType.SHIFT:
+                reg = operands[1]
+            case InstructionType.LOAD | InstructionType.CREATE | InstructionType.ADD | InstructionType.SUB | \
+                    InstructionType.MULTIPLY | InstructionType.DIVIDE:
+                reg = operands[2]
+            case InstructionType.OR | InstructionType.AND | InstructionType.NOT | InstructionType.POP:
+                reg = operands[0]
+            case InstructionType.STORE | InstructionType.PUSH:
+                reg = operands[0]
+        destinations.append(reg)
+    return destinations
@@ -0,0 +1,34 @@
+from ignition.bench import assemble
+from ignition.decoder import Decoder
+from ignition.execution import ExecutionEngine
+from ignition.memory import ADDRESS_LIMIT
+from ignition.output import CaptureSink
+from ignition.parser import Parser
+from ignition.runtime import Runtime
+
+
+def decode(source):
+    # Decoded program for StartASM source in the forms ignition.bench.assemble understands
+    return Decoder().decode(Parser().build_ast(assemble(source)))
+
+
+def make_engine(program, inputs=(), **kwargs):
+    # Engine on a fresh runtime with captured output and scripted input lines
+    output = CaptureSink()
+    engine = ExecutionEngine(Runtime(), program, True, True, output=output, **kwargs)
+    lines = iter(inputs)
+    engine.read_input = lambda prompt: next(lines)
+    return engine
+
+
+def state(engine):
+    # Everything a program can observe or leave behind, for comparing two runs
+    runtime = engine.runtime
+    return {
+        "registers": list(zip(runtime.reg_values, runtime.reg_types)),
+        "flags": runtime.flags(),
+        "pc": runtime.p_counter,
+        "memory": list(runtime.memory.items(0, ADDRESS_LIMIT)),
+        "output": engine.output.getvalue(),
+        "error": engine.last_error,
+    }
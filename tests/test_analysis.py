@@ -0,0 +1,256 @@
+import pytest
+from ignition.analysis import CHECKED_ARITHMETIC, ProgramAnalysis, analyze, format_error
+from ignition.ast import OperandType
+from tests.support import decode, make_engine, state
+
+TYPE_BITS = {operand_type: 1 << operand_type.value for operand_type in OperandType}
+
+
+def safe_lines(source):
+    # Source lines of the instructions marked safe
+    program = decode(source)
+    analysis = analyze(program)
+    return [program.lines[pc] for pc in range(len(program)) if analysis.safe[pc]]
+
+
+def test_arithmetic_on_created_values_is_safe():
+    assert safe_lines("""
+        create integer 6 to r1
+        create integer 3 to r2
+        add r1 with r2 to r3
+        sub r3 with r2 to r4
+        multiply r4 with r1 to r5
+        divide r5 with r2 to r6
+        compare r6 with r1
+        create memory m<4> to r7
+        create memory m<1> to r8
+        add r7 with r8 to r7
+        create character a to r9
+        compare r9 with r9
+    """) == [3, 4, 5, 6, 7, 10, 12]
+
+
+def test_merged_types_are_not_safe():
+    assert safe_lines("""
+        create integer 1 to r1
+        create integer 2 to r2
+        compare r1 with r2
+        jump if less to 'other'
+        create character a to r1
+        create character b to r2
+        label 'other'
+        add r1 with r2 to r3
+        create integer 5 to r1
+        create integer 5 to r2
+        add r1 with r2 to r3
+    """) == [3, 11]
+
+
+def test_loaded_and_popped_values_are_not_safe():
+    assert safe_lines("""
+        create integer 1 to r1
+        store r1 to m<10>
+        load m<10> to r2
+        add r1 with r2 to r3
+        push r1
+        pop to r4
+        add r1 with r4 to r3
+        input integer to r5
+        add r1 with r5 to r3
+    """) == [9]
+
+
+def test_casts():
+    program = decode("""
+        create integer 1 to r1
+        create character a to r2
+        cast integer r2
+        add r1 with r2 to r3
+        cast boolean r2
+        add r1 with r2 to r3
+    """)
+    analysis = analyze(program)
+    assert analysis.safe[3] and not analysis.safe[5]
+    assert analysis.errors == [(5, "r1 and r2 never hold the same type.")]
+
+
+def test_returns_join_every_call_site():
+    program = decode("""
+        create integer 1 to r1
+        call to 'double'
+        add r1 with r1 to r2
+        create character a to r1
+        call to 'double'
+        stop
+        label 'double'
+        add r1 with r1 to r1
+        return
+    """)
+    analysis = analyze(program)
+    # r1 may hold a character on return to the first call site, and an integer in the function
+    assert not analysis.safe[2] and not analysis.safe[7]
+    assert analysis.errors == []
+
+
+def test_errors():
+    # Each failing instruction is on its own branch, as nothing after one is reachable
+    program = decode("""
+        create integer 1 to r1
+        create character a to r2
+        compare r1 with r1
+        jump if zero to 'a'
+        add r1 with r3 to r4
+        label 'a'
+        jump if zero to 'b'
+        add r1 with r2 to r4
+        label 'b'
+        jump if zero to 'c'
+        divide r2 with r2 to r4
+        label 'c'
+        jump if zero to 'd'
+        store r1 to m<4294967296>
+        label 'd'
+        jump if zero to 'e'
+        move r5 to r6
+        label 'e'
+        jump if zero to 'f'
+        output r7
+        label 'f'
+        return
+    """)
+    errors = analyze(program).errors
+    assert errors == [
+        (4, "Source reg r1 and/or source reg r3 is not initialized."),
+        (7, "r1 and r2 never hold the same type."),
+        (10, "r2 and r2 never hold a type permitted for division."),
+        (13, "Memory address 4294967296 is out of range."),
+        (16, "Source register r5 is not initialized."),
+        (19, "r7 is not defined."),
+        (21, "Attempted to return with no call in the program."),
+    ]
+    assert format_error(program, *errors[1]) == \
+        "Analysis Warning: Instruction i[7] (line 8) always fails when reached: r1 and r2 never hold the same type."
+
+
+def test_unreachable_instructions_are_not_reported():
+    program = decode("""
+        jump if unconditional to 'end'
+        add r1 with r2 to r3
+        label 'end'
+    """)
+    analysis = analyze(program)
+    assert analysis.errors == [] and analysis.safe == [False] * 3
+
+
+PROGRAMS = [
+    # Loops over memory, with a loaded value changing type
+    """
+        create integer 0 to r1
+        create integer 1 to r2
+        create memory m<0> to r5
+        create memory m<1> to r6
+        create integer 20 to r3
+        label 'fill'
+        store r1 to r5
+        add r5 with r6 to r5
+        add r1 with r2 to r1
+        compare r1 with r3
+        jump if less to 'fill'
+        create character a to r7
+        store r7 to m<15>
+        create memory m<0> to r5
+        create integer 0 to r0
+        label 'sum'
+        load r5 to r4
+        add r0 with r4 to r0
+        add r5 with r6 to r5
+        jump if unconditional to 'sum'
+    """,
+    # Calls from two sites with different types
+    """
+        create integer 3 to r1
+        call to 'twice'
+        output r1
+        create memory m<7> to r1
+        call to 'twice'
+        output r1
+        create character a to r1
+        call to 'twice'
+        output r1
+        stop
+        label 'twice'
+        add r1 with r1 to r1
+        compare r1 with r1
+        return
+    """,
+    # Stack traffic and an overflowing multiply, then a division by zero
+    """
+        create integer 65536 to r1
+        push r1
+        pop to r2
+        multiply r1 with r2 to r3
+        output r3
+        create integer 0 to r4
+        divide r3 with r4 to r5
+    """,
+]
+
+
+def run_checked(program, analysis):
+    # Run one instruction at a time, failing if an instruction marked safe would fail its operand checks
+    engine = make_engine(program, analysis=analysis)
+    runtime = engine.runtime
+    opcodes = program.opcodes
+    operands = program.operands
+
+    def check(pc):
+        if engine.analysis.safe[pc]:
+            permitted = CHECKED_ARITHMETIC[opcodes[pc]][0]
+            reg_1, reg_2 = operands[pc][:2]
+            type_1, type_2 = runtime.reg_types[reg_1], runtime.reg_types[reg_2]
+            assert runtime.reg_values[reg_1] is not None and runtime.reg_values[reg_2] is not None
+            assert type_1 == type_2 and TYPE_BITS[type_1] & permitted, pc
+
+    steps = engine.run(None, check)
+    return state(engine), steps
+
+
+@pytest.mark.parametrize("source", PROGRAMS)
+def test_safe_instructions_never_fail_their_checks(source):
+    run_checked(decode(source), None)
+
+
+@pytest.mark.parametrize("source", PROGRAMS)
+def test_analysis_does_not_change_results(source):
+    program = decode(source)
+    unchecked = ProgramAnalysis([False] * len(program), [])
+    assert run_checked(program, None) == run_checked(program, unchecked)
+    for analysis in (None, unchecked):
+        engine = make_engine(program, analysis=analysis)
+        engine.run()
+        assert state(engine) == run_checked(program, None)[0]
+
+
+@pytest.mark.parametrize("jit", [False, True])
+def test_returns_only_go_after_calls(jit):
+    # The return address is shifted to skip 'create', so the safe add would run on an uninitialized r3
+    program = decode("""
+        call to 'f'
+        create integer 1 to r3
+        add r3 with r3 to r4
+        stop
+        label 'f'
+        create integer 1 to r5
+        pop to r1
+        shift left r1 by r5
+        push r1
+        return
+    """)
+    assert analyze(program).safe[2]
+    engine = make_engine(program, jit=jit)
+    engine.run()
+    assert engine.last_error == "Runtime Error: Attempted to return to i[2], which does not follow a call."
+    stepped = make_engine(program)
+    while stepped.runtime.p_counter < len(program):
+        stepped.execute(stepped.runtime.p_counter)
+    assert state(stepped) == state(engine)
@@ -0,0 +1,60 @@
+import io
+import pytest
+from ignition.batch import EXIT_INPUT_ERROR, EXIT_OK, EXIT_RUNTIME_ERROR, EXIT_STEP_LIMIT, execute_program
+from ignition.output import CaptureSink
+from tests.support import decode
+
+DIVIDE = """
+    input integer to r2
+    create integer 12 to r1
+    divide r1 with r2 to r3
+    output r3
+    stop
+"""
+
+
+@pytest.mark.parametrize("jit", [False, True])
+def test_division(jit):
+    output = CaptureSink()
+    status, error, runtime, steps = execute_program(decode(DIVIDE), io.StringIO("4\n"), output, jit=jit)
+    assert (status, error, steps) == (EXIT_OK, None, 5)
+    assert output.getvalue() == "3"
+
+
+@pytest.mark.parametrize("jit", [False, True])
+def test_division_by_zero_is_a_runtime_error(jit):
+    output = CaptureSink()
+    status, error, runtime, steps = execute_program(decode(DIVIDE), io.StringIO("0\n"), output, jit=jit)
+    assert status == EXIT_RUNTIME_ERROR
+    assert error == "Runtime Error: Division by zero, r2 contains 0."
+    assert output.getvalue() == ""
+
+
+def test_division_by_zero_in_a_loop():
+    # The loop is compiled and its guard hands the failing division back to the interpreter
+    program = decode("""
+        create integer 100000 to r1
+        create integer 0 to r2
+        create integer 1 to r4
+        label 'loop'
+        sub r1 with r4 to r1
+        divide r4 with r1 to r3
+        jump if unconditional to 'loop'
+    """)
+    results = [execute_program(program, io.StringIO(), CaptureSink(), jit=jit)[:2] for jit in (False, True)]
+    assert results[0] == results[1] == (EXIT_RUNTIME_ERROR, "Runtime Error: Division by zero, r1 contains 0.")
+
+
+def test_input_and_step_limit_errors():
+    status, error, _, _ = execute_program(decode(DIVIDE), io.StringIO(), CaptureSink())
+    assert (status, error) == (EXIT_INPUT_ERROR, "Input Error: Program input ended before the program finished.")
+    status, error, runtime, steps = execute_program(decode(DIVIDE), io.StringIO("4\n"), CaptureSink(), max_steps=2)
+    assert (status, steps, runtime.p_counter) == (EXIT_STEP_LIMIT, 2, 2)
+
+
+def test_engine_failures_are_runtime_errors():
+    stream = io.StringIO("4\n")
+    stream.close()
+    status, error, _, _ = execute_program(decode(DIVIDE), stream, CaptureSink())
+    assert status == EXIT_RUNTIME_ERROR
+    assert error.startswith("Runtime Error: Instruction i[0] failed: ValueError(")
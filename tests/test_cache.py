@@ -0,0 +1,53 @@
+import json
+import time
+import ignition
+from ignition.cache import ASTCache
+from ignition.compiler import DockerCompiler
+
+
+def test_lookups_do_not_write_stats(tmp_path):
+    cache = ASTCache(str(tmp_path))
+    cache.open_entry("missing")
+    assert not (tmp_path / "stats.json").exists()
+    assert cache.stats()["misses"] == 1
+
+
+def test_counts_from_several_caches_are_merged(tmp_path):
+    first = ASTCache(str(tmp_path))
+    second = ASTCache(str(tmp_path))
+    writer = first.open_writer("key")
+    writer.write("{}")
+    writer.commit()
+    for _ in range(3):
+        first.open_entry("key").close()
+    second.open_entry("key").close()
+    second.open_entry("missing")
+    first.close()
+    second.close()
+    stats = ASTCache(str(tmp_path)).stats()
+    assert (stats["hits"], stats["misses"]) == (4, 1)
+    assert stats["entries"] == 1
+
+
+def test_clear_resets_counts(tmp_path):
+    cache = ASTCache(str(tmp_path))
+    cache.open_entry("missing")
+    cache.close()
+    cache.open_entry("missing")
+    cache.clear()
+    cache.close()
+    assert ASTCache(str(tmp_path)).stats()["misses"] == 0
+
+
+def test_identity_inspects_the_image_once_per_process(tmp_path, monkeypatch):
+    # A digest remembered within the TTL is not used, as the image may have been rebuilt since
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"docker_image_digest": {"image": "asm", "id": "old", "validated_at": time.time()}}))
+    inspected = []
+    monkeypatch.setattr(ignition, "CONFIG_FILE", str(config))
+    monkeypatch.setattr(ignition, "_inspected_digests", {})
+    monkeypatch.setattr(ignition, "inspect_docker_image", lambda image: inspected.append(image) or "new")
+    compiler = DockerCompiler("asm")
+    assert compiler.identity() == compiler.identity() == "new"
+    assert inspected == ["asm"]
+    assert json.loads(config.read_text())["docker_image_digest"]["id"] == "new"
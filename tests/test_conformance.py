@@ -0,0 +1,153 @@
+import json
+import xml.etree.ElementTree as ET
+import pytest
+from ignition import conformance
+from ignition.ast import OperandType
+from ignition.bench import assemble
+from ignition.conformance import _compare_state, discover_tests, run_test, write_json, write_junit
+from ignition.parser import Parser
+from ignition.runtime import Runtime
+
+PROGRAM = """
+    input integer to r1
+    create integer 5 to r2
+    add r1 with r2 to r3
+    store r3 to m<234>
+    output r3
+    stop
+"""
+
+
+class AssemblingParser:
+    # Builds the AST from source directly, in place of the compiler
+    cache = None
+
+    def parse_program(self, program_path, compiler_image, silent_c):
+        with open(program_path, "r") as f:
+            return Parser().build_ast(assemble(f.read()))
+
+
+@pytest.fixture
+def assembling_parser(monkeypatch):
+    monkeypatch.setattr(conformance, "_worker_parser", AssemblingParser())
+
+
+def write_files(directory, files):
+    for name, content in files.items():
+        path = directory / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+
+def test_discovery_matches_sidecars(tmp_path):
+    write_files(tmp_path, {
+        "b.sasm": "", "b.out": "",
+        "a.sasm": "", "a.in": "", "a.state.json": "{}",
+        "untested.sasm": "", "untested.in": "",
+        "sub/c.sasm": "", "sub/c.out": "", "sub/c.state.json": "{}",
+        "orphan.out": "",
+    })
+    cases = discover_tests(str(tmp_path))
+    assert [case.name for case in cases] == ["a.sasm", "b.sasm", "sub/c.sasm"]
+    a, b, c = cases
+    assert (a.input_path, a.output_path, a.state_path) == (str(tmp_path / "a.in"), None, str(tmp_path / "a.state.json"))
+    assert (b.input_path, b.output_path, b.state_path) == (None, str(tmp_path / "b.out"), None)
+    assert c.output_path and c.state_path and c.input_path is None
+
+
+def test_compare_state(tmp_path):
+    runtime = Runtime()
+    runtime.set_register(3, 15, OperandType.INTEGER)
+    runtime.set_register(4, 97, OperandType.CHARACTER)
+    runtime.set_register(5, True, OperandType.BOOLEAN)
+    runtime.set_memory(234, 15, OperandType.INTEGER)
+    state_path = tmp_path / "expected.state.json"
+    state_path.write_text(json.dumps({
+        "registers": {"r3": 15, "r4": "a", "r5": True},
+        "memory": {"234": 15, "m<234>": 15},
+    }))
+    assert _compare_state(str(state_path), runtime) == []
+
+    state_path.write_text(json.dumps({"registers": {"r3": 16, "r5": 1, "r6": 0}, "memory": {"235": 15}}))
+    assert _compare_state(str(state_path), runtime) == [
+        "Register r3: expected 16, got 15",
+        "Register r5: expected 1, got True",
+        "Register r6: expected 0, got None",
+        "Memory m<235>: expected 15, got None",
+    ]
+
+    state_path.write_text("{")
+    messages = _compare_state(str(state_path), runtime)
+    assert len(messages) == 1 and messages[0].startswith(f"Invalid state file '{state_path}'")
+
+
+def test_run_test_results(tmp_path, assembling_parser):
+    write_files(tmp_path, {
+        "pass.sasm": PROGRAM, "pass.in": "10\n", "pass.out": "15",
+        "pass.state.json": json.dumps({"registers": {"r3": 15}, "memory": {"234": 15}}),
+        "fail.sasm": PROGRAM, "fail.in": "11\n", "fail.out": "15",
+        "error.sasm": "jump if less to 'nowhere'", "error.out": "",
+    })
+    results = {case.name: run_test(case, "image") for case in discover_tests(str(tmp_path))}
+    assert results["pass.sasm"]["status"] == "passed"
+    assert results["pass.sasm"]["steps"] == 6
+    assert results["fail.sasm"]["status"] == "failed"
+    assert results["fail.sasm"]["message"] == "Output mismatch:\n--- expected\n15\n--- actual\n16"
+    assert results["error.sasm"]["status"] == "error"
+    assert results["error.sasm"]["message"].startswith("Compiler Error: Undefined label 'nowhere'")
+
+
+def test_a_crash_fails_only_its_test(tmp_path, assembling_parser, monkeypatch):
+    write_files(tmp_path, {"crash.sasm": PROGRAM, "crash.out": "", "crash.in": "1\n"})
+
+    def crash(*args):
+        raise ZeroDivisionError("division by zero")
+
+    monkeypatch.setattr(conformance, "execute_program", crash)
+    result = run_test(discover_tests(str(tmp_path))[0], "image")
+    assert result["status"] == "error"
+    assert result["message"].startswith("Internal Error: ZeroDivisionError('division by zero')\nTraceback")
+    assert result["compile_time"] > 0
+
+
+def test_run_tests_writes_reports(tmp_path, monkeypatch, capsys):
+    write_files(tmp_path / "programs", {"pass.sasm": PROGRAM, "pass.in": "10\n", "pass.out": "15",
+                                        "fail.sasm": PROGRAM, "fail.in": "1\n", "fail.out": "15"})
+    monkeypatch.setattr(conformance, "compiler_target", lambda backend, interactive: "image")
+    monkeypatch.setattr(conformance, "_init_worker", lambda backend: setattr(conformance, "_worker_parser", AssemblingParser()))
+    monkeypatch.setattr(conformance, "_worker_parser", None)
+    junit_path = tmp_path / "report.xml"
+    json_path = tmp_path / "report.json"
+    status = conformance.run_tests(str(tmp_path / "programs"), 1, junit_path=str(junit_path), json_path=str(json_path))
+    assert status == 1
+    assert "1 passed, 1 failed" in capsys.readouterr().out
+    report = json.loads(json_path.read_text())
+    assert (report["tests"], report["passed"]) == (2, 1)
+    suite = ET.parse(junit_path).getroot()
+    assert (suite.get("tests"), suite.get("failures"), suite.get("errors")) == ("2", "1", "0")
+
+
+def test_report_writers(tmp_path):
+    results = [
+        {"name": "a.sasm", "status": "passed", "message": "", "compile_time": 0.5, "run_time": 0.25, "steps": 3},
+        {"name": "sub/b.sasm", "status": "failed", "message": "Output mismatch:\nmore", "compile_time": 0.0,
+         "run_time": 0.0, "steps": 1},
+        {"name": "c.sasm", "status": "error", "message": "Compiler Error: bad", "compile_time": 0.0, "run_time": 0.0,
+         "steps": None},
+    ]
+    write_junit(results, str(tmp_path / "report.xml"), 1.5)
+    suite = ET.parse(tmp_path / "report.xml").getroot()
+    assert (suite.get("tests"), suite.get("failures"), suite.get("errors"), suite.get("time")) == ("3", "1", "1", "1.5000")
+    a, b, c = suite.findall("testcase")
+    assert (a.get("classname"), a.get("name"), a.get("time")) == ("ignition", "a.sasm", "0.7500")
+    assert list(a) == []
+    assert (b.get("classname"), b.get("name")) == ("sub", "b.sasm")
+    failure = b.find("failure")
+    assert (failure.get("message"), failure.text) == ("Output mismatch:", "Output mismatch:\nmore")
+    assert c.find("error").get("message") == "Compiler Error: bad"
+
+    write_json(results, str(tmp_path / "report.json"), 1.5)
+    report = json.loads((tmp_path / "report.json").read_text())
+    assert (report["tests"], report["passed"], report["time"]) == (3, 1, 1.5)
+    assert report["results"] == results
+
@@ -0,0 +1,27 @@
+import pytest
+from ignition.decoder import JUMP_CONDITIONS
+from ignition.errors import DecodeError
+from tests.support import decode
+
+
+def test_jump_targets_and_conditions_are_resolved():
+    program = decode("""
+        label 'top'
+        jump if less to 'top'
+        jump if unconditional to i[0]
+    """)
+    assert program.operands[1] == (JUMP_CONDITIONS["less"], 0)
+    assert program.operands[2] == (JUMP_CONDITIONS["unconditional"], 0)
+
+
+def test_unknown_jump_condition_is_a_decode_error():
+    with pytest.raises(DecodeError, match="Unknown jump condition 'sometimes' on line 2"):
+        decode("""
+            label 'top'
+            jump if sometimes to 'top'
+        """)
+
+
+def test_undefined_label_is_a_decode_error():
+    with pytest.raises(DecodeError, match="Undefined label 'nowhere'"):
+        decode("jump if less to 'nowhere'")
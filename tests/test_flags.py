@@ -0,0 +1,149 @@
+import pytest
+from ignition.ast import OperandType
+from ignition.execution import ExecutionEngine
+from ignition.history import ENTRY_COST, ExecutionHistory
+from ignition.output import CaptureSink
+from ignition.runtime import INT32_MAX, INT32_MIN, Runtime
+from tests.support import decode
+
+PROGRAM = """
+    create integer 2147483647 to r1
+    create integer 1 to r2
+    create integer -1 to r3
+    create integer 0 to r0
+    add r1 with r2 to r4
+    sub r4 with r2 to r4
+    add r0 with r0 to r5
+    sub r0 with r2 to r5
+    multiply r1 with r1 to r5
+    multiply r3 with r2 to r5
+    create integer -2147483648 to r6
+    divide r6 with r3 to r5
+    divide r0 with r2 to r5
+    sub r6 with r2 to r5
+    compare r6 with r2
+    compare r2 with r2
+    compare r3 with r2
+    create character a to r7
+    create character b to r8
+    multiply r1 with r1 to r5
+    add r7 with r8 to r9
+    sub r7 with r7 to r9
+    sub r7 with r8 to r9
+    move r1 to r9
+    or r9 with r3
+    and r9 with r0
+    move r1 to r9
+    and r9 with r1
+    not r9
+    not r0
+    create integer 31 to r8
+    move r2 to r9
+    shift left r9 by r8
+    shift right r9 by r8
+    shift right r9 by r2
+    create boolean true to r9
+    not r9
+    not r9
+    shift left r9 by r2
+    compare r9 with r9
+"""
+
+
+class ReferenceEngine(ExecutionEngine):
+    # Works the flags out eagerly after every flag-setting instruction, as they were before they became lazy
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.expected = (False, False, False)
+
+    def _handle_overflow(self, result, type):
+        z, s, o = self.expected
+        if type == OperandType.CHARACTER:
+            wrapped = result % 128
+        else:
+            wrapped = (result + 2 ** 31) % 2 ** 32 - 2 ** 31
+            o = result < INT32_MIN or result > INT32_MAX
+        self.expected = (wrapped == 0, wrapped < 0, o)
+        return super()._handle_overflow(result, type)
+
+
+def make_reference_engine(program):
+    return ReferenceEngine(Runtime(), program, False, True, analysis=None, output=CaptureSink())
+
+
+def test_flags_after_every_instruction():
+    program = decode(PROGRAM)
+    engine = make_reference_engine(program)
+    runtime = engine.runtime
+    seen = set()
+    while runtime.p_counter < len(program):
+        engine.execute(runtime.p_counter)
+        assert engine.last_error is None
+        assert runtime.flags() == engine.expected, runtime.p_counter
+        assert (runtime.z_flag, runtime.s_flag, runtime.o_flag) == engine.expected
+        assert tuple(runtime.get_flag(flag) for flag in "zso") == engine.expected
+        seen.add(engine.expected)
+    # Zero, negative and positive results, with and without overflow
+    assert {(True, False, False), (False, True, False), (False, False, False),
+            (False, True, True), (False, False, True), (True, False, True)} <= seen
+
+
+def test_characters_keep_the_overflow_flag():
+    program = decode("""
+        create integer 2147483647 to r1
+        multiply r1 with r1 to r2
+        create character a to r3
+        sub r3 with r3 to r4
+    """)
+    engine = make_reference_engine(program)
+    engine.run()
+    assert engine.runtime.flags() == (True, False, True)
+
+
+@pytest.mark.parametrize("flag", "zso")
+def test_setting_single_flags(flag):
+    runtime = Runtime()
+    for previous in [(False, False, False), (True, False, True), (False, True, False), (False, False, True)]:
+        for state in (True, False):
+            runtime.set_flags(*previous)
+            assert runtime.flags() == previous
+            runtime.set_flag(flag, state)
+            z, s, o = previous
+            if flag == "z":
+                # A zero result is never negative
+                z, s = state, s and not state
+            elif flag == "s":
+                z, s = z and not state, state
+            else:
+                o = state
+            assert runtime.flags() == (z, s, o)
+
+
+def test_snapshots_restore_flags():
+    program = decode(PROGRAM)
+    engine = make_reference_engine(program)
+    runtime = engine.runtime
+    snapshots = []
+    while runtime.p_counter < len(program):
+        snapshots.append((runtime.snapshot(), runtime.flags()))
+        engine.execute(runtime.p_counter)
+    for snapshot, flags in snapshots:
+        runtime.restore(snapshot)
+        assert runtime.flags() == flags
+
+
+@pytest.mark.parametrize("budget", [1000 * ENTRY_COST, 3 * ENTRY_COST])
+def test_going_back_restores_flags(budget):
+    # With a short undo log going back replays from a snapshot
+    program = decode(PROGRAM)
+    engine = make_reference_engine(program)
+    runtime = engine.runtime
+    history = ExecutionHistory(runtime, engine, runtime.snapshot(), budget, snapshot_interval=7)
+    flags = [runtime.flags()]
+    while runtime.p_counter < len(program):
+        history.record(runtime.p_counter)
+        engine.execute(runtime.p_counter)
+        flags.append(runtime.flags())
+    for step in range(len(flags) - 1, -1, -5):
+        history.back(history.step - step)
+        assert runtime.flags() == flags[step], step
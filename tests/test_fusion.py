@@ -0,0 +1,153 @@
+import pytest
+from ignition.analysis import ProgramAnalysis
+from tests.support import decode, make_engine, state
+
+PROGRAMS = {
+    # Every kind of pair, with a jump into the middle of a create pair
+    "pairs": """
+        create integer 0 to r1
+        create integer 1 to r2
+        create integer 6 to r3
+        create memory m<50> to r5
+        create memory m<1> to r6
+        label 'loop'
+        create integer 3 to r4
+        add r1 with r2 to r1
+        multiply r1 with r4 to r8
+        store r8 to r5
+        add r5 with r6 to r5
+        output r8
+        sub r8 with r4 to r9
+        jump if zero to 'skip'
+        create integer 2 to r0
+        divide r8 with r0 to r9
+        jump if positive to 'mid'
+        label 'skip'
+        create integer 1 to r7
+        label 'mid'
+        shift left r9 by r2
+        jump if negative to 'loop'
+        not r9
+        jump if nonzero to 'cmp'
+        label 'cmp'
+        create integer 4 to r0
+        compare r1 with r0
+        create integer 0 to r7
+        compare r1 with r3
+        jump if less to 'loop'
+        or r1 with r2
+        jump if zero to 'loop'
+        and r1 with r2
+        jump if equal to 'loop'
+        print newline
+        stop
+    """,
+    # Operands loaded from memory have unknown types, so the checked pairs run
+    "checked": """
+        create integer 0 to r1
+        create integer 1 to r2
+        create memory m<10> to r5
+        create integer 3 to r3
+        store r3 to m<10>
+        label 'loop'
+        load r5 to r4
+        add r1 with r2 to r1
+        compare r1 with r4
+        jump if less to 'loop'
+        load r5 to r6
+        sub r6 with r2 to r6
+        jump if positive to 'again'
+        create character a to r7
+        compare r7 with r1
+        jump if less to 'loop'
+        stop
+        label 'again'
+        store r6 to m<10>
+        jump if unconditional to 'loop'
+    """,
+    # Failing first instructions of a then-jump pair and failing second instructions of a create pair
+    "error_then_jump": """
+        create integer 5 to r1
+        create character a to r2
+        add r1 with r2 to r3
+        jump if zero to 'end'
+        label 'end'
+        stop
+    """,
+    "error_create_then": """
+        create integer 5 to r1
+        create integer 0 to r2
+        divide r1 with r2 to r3
+        output r3
+    """,
+    "overflow": """
+        create integer 2147483647 to r1
+        create integer 1 to r2
+        label 'loop'
+        add r1 with r2 to r1
+        jump if negative to 'done'
+        jump if unconditional to 'loop'
+        label 'done'
+        create integer 3 to r3
+        multiply r1 with r3 to r4
+        output r4
+        stop
+    """,
+}
+
+
+def run_unfused(program, max_steps=None, **kwargs):
+    # One instruction at a time through the plain dispatch table
+    engine = make_engine(program, **kwargs)
+    steps = 0
+    while engine.runtime.p_counter < len(program) and steps != max_steps:
+        engine.execute(engine.runtime.p_counter)
+        steps += 1
+    return state(engine), steps
+
+
+def run_fused(program, max_steps=None, **kwargs):
+    engine = make_engine(program, **kwargs)
+    steps = engine.run(max_steps)
+    return state(engine), steps
+
+
+def analyses(program):
+    # The default analysis, and none, which leaves every check in place
+    return [None, ProgramAnalysis([False] * len(program), [])]
+
+
+@pytest.mark.parametrize("name", PROGRAMS)
+def test_fused_run_matches_unfused(name):
+    program = decode(PROGRAMS[name])
+    for analysis in analyses(program):
+        assert run_fused(program, analysis=analysis) == run_unfused(program, analysis=analysis)
+
+
+@pytest.mark.parametrize("name", PROGRAMS)
+def test_step_limits_inside_pairs(name):
+    # Every step count, so runs stop both between and in the middle of pairs
+    program = decode(PROGRAMS[name])
+    total = run_unfused(program)[1]
+    for analysis in analyses(program):
+        for max_steps in range(1, total + 2):
+            fused = run_fused(program, max_steps, analysis=analysis)
+            assert fused == run_unfused(program, max_steps, analysis=analysis), max_steps
+
+
+def test_runs_resume_in_the_middle_of_a_pair():
+    program = decode(PROGRAMS["pairs"])
+    expected = run_unfused(program)
+    for chunk in (1, 2, 3, 5, 7):
+        engine = make_engine(program)
+        steps = 0
+        while engine.runtime.p_counter < len(program):
+            steps += engine.run(chunk)
+        assert (state(engine), steps) == expected
+
+
+def test_pairs_are_fused():
+    program = decode(PROGRAMS["pairs"])
+    engine = make_engine(program)
+    fused = [pc for pc in range(len(program)) if engine._fused_dispatch[pc] != engine._dispatch[pc]]
+    assert len(fused) >= 8
@@ -0,0 +1,110 @@
+import pytest
+from ignition.history import ENTRY_COST, ExecutionHistory
+from tests.support import decode, make_engine, state
+
+# Reads a value every iteration and writes registers, memory and the stack
+PROGRAM = """
+    create integer 0 to r1
+    create integer 0 to r7
+    create integer 1 to r2
+    create integer 4 to r3
+    create memory m<100> to r5
+    create memory m<1> to r6
+    label 'loop'
+    input integer to r4
+    add r1 with r4 to r1
+    store r1 to r5
+    add r5 with r6 to r5
+    push r1
+    call to 'bump'
+    pop to r8
+    add r7 with r2 to r7
+    compare r7 with r3
+    jump if less to 'loop'
+    output r1
+    stop
+    label 'bump'
+    multiply r1 with r2 to r9
+    return
+"""
+INPUTS = ("3", "-4", "10", "7")
+
+
+def run_fresh(program, steps):
+    engine = make_engine(program, INPUTS)
+    engine.run(steps)
+    return state(engine)
+
+
+def run_recorded(program, steps, **kwargs):
+    engine = make_engine(program, INPUTS)
+    history = ExecutionHistory(engine.runtime, engine, engine.runtime.snapshot(), **kwargs)
+    engine.run(steps, history.record)
+    return engine, history
+
+
+def machine_state(engine_state):
+    # Output already written is not taken back
+    return {key: value for key, value in engine_state.items() if key != "output"}
+
+
+@pytest.fixture(scope="module")
+def program():
+    return decode(PROGRAM)
+
+
+@pytest.fixture(scope="module")
+def total_steps(program):
+    return make_engine(program, INPUTS).run()
+
+
+@pytest.mark.parametrize("history_options", [
+    {},  # Everything in the undo log
+    {"budget": 5 * ENTRY_COST, "snapshot_interval": 7},  # Short log, replay from snapshots
+    {"budget": 5 * ENTRY_COST, "snapshot_interval": 1000},  # Short log, replay from the start
+])
+def test_back_matches_a_shorter_run(program, total_steps, history_options):
+    for steps in range(0, total_steps + 1, 3):
+        for back in (1, 4, 6, 13, steps):
+            engine, history = run_recorded(program, steps, **history_options)
+            assert history.back(back) == min(back, steps)
+            assert history.step == steps - min(back, steps)
+            assert machine_state(state(engine)) == machine_state(run_fresh(program, max(steps - back, 0)))
+
+
+def test_execution_continues_after_going_back(program, total_steps):
+    # Replay reuses recorded input, running forward again reads it anew
+    engine, history = run_recorded(program, total_steps - 4, budget=3 * ENTRY_COST, snapshot_interval=5)
+    runtime = engine.runtime
+    history._read_input = lambda prompt: INPUTS[runtime.reg_values[7]]  # Input for the current iteration
+    history.back(20)
+    engine.run(None, history.record)
+    assert state(engine)["registers"] == run_fresh(program, None)["registers"]
+    assert engine.output.getvalue() == "16"
+
+
+def test_back_past_the_start(program):
+    engine, history = run_recorded(program, 5)
+    assert history.back(10) == 5
+    assert machine_state(state(engine)) == machine_state(run_fresh(program, 0))
+
+
+def test_back_until(program, total_steps):
+    engine, history = run_recorded(program, total_steps - 2)
+    loop_head = program.labels["loop"]
+    undone = history.back_until(lambda pc: pc == loop_head)
+    assert engine.runtime.p_counter == loop_head
+    assert machine_state(state(engine)) == machine_state(run_fresh(program, total_steps - 2 - undone))
+    # Without a match the whole log is undone
+    remaining = len(history)
+    assert history.back_until(lambda pc: False) == remaining
+    assert machine_state(state(engine)) == machine_state(run_fresh(program, total_steps - 2 - undone - remaining))
+
+
+def test_close_restores_input(program):
+    engine = make_engine(program, INPUTS)
+    read_input = engine.read_input
+    history = ExecutionHistory(engine.runtime, engine, engine.runtime.snapshot())
+    assert engine.read_input != read_input
+    history.close()
+    assert engine.read_input == read_input
@@ -0,0 +1,261 @@
+import pytest
+from ignition import execution
+from ignition.ast import OperandType
+from ignition.jit import JIT_THRESHOLD, compile_loop
+from tests.support import decode, make_engine, state
+
+PROGRAMS = {
+    # Runs the inner loop with integer and with memory address registers in turn, so compiled code is
+    # entered with the wrong types and the loop is compiled again
+    "retyped": """
+        create integer 0 to r0
+        create integer 1 to r7
+        create integer 5 to r8
+        label 'outer'
+        add r0 with r7 to r0
+        create integer 0 to r1
+        create integer 1 to r2
+        create integer 80 to r3
+        jump if unconditional to 'inner'
+        label 'memory'
+        create memory m<0> to r1
+        create memory m<1> to r2
+        create memory m<80> to r3
+        label 'inner'
+        create integer 9 to r6
+        add r1 with r2 to r1
+        compare r1 with r3
+        jump if less to 'inner'
+        output r1
+        print " "
+        compare r0 with r8
+        jump if greater to 'end'
+        move r0 to r4
+        and r4 with r7
+        jump if zero to 'outer'
+        add r0 with r7 to r0
+        jump if unconditional to 'memory'
+        label 'end'
+        stop
+    """,
+    # A loop left from its middle, and a load whose cell changes type and is finally uninitialized
+    "exits": """
+        create integer 0 to r1
+        create integer 1 to r2
+        create integer 150 to r3
+        create integer 97 to r4
+        create memory m<0> to r5
+        create memory m<1> to r6
+        label 'fill'
+        store r1 to r5
+        add r5 with r6 to r5
+        add r1 with r2 to r1
+        compare r1 with r3
+        jump if less to 'fill'
+        create memory m<120> to r5
+        create character a to r9
+        store r9 to r5
+        create memory m<0> to r5
+        create integer 0 to r0
+        label 'walk'
+        load r5 to r7
+        compare r7 with r4
+        jump if equal to 'found'
+        add r0 with r7 to r0
+        add r5 with r6 to r5
+        jump if unconditional to 'walk'
+        label 'found'
+        output r0
+        print newline
+        create memory m<100> to r5
+        label 'sum'
+        load r5 to r7
+        add r0 with r7 to r0
+        add r5 with r6 to r5
+        jump if unconditional to 'sum'
+    """,
+    # Flags and values around the 32-bit range, with a division by zero at the end
+    "arithmetic": """
+        create integer 1 to r1
+        create integer 20000000 to r2
+        create integer 0 to r0
+        create integer 1 to r7
+        create integer -2000000000 to r5
+        label 'loop'
+        add r0 with r7 to r0
+        add r1 with r2 to r1
+        multiply r1 with r7 to r1
+        divide r1 with r7 to r8
+        sub r8 with r7 to r8
+        compare r8 with r5
+        jump if greater to 'loop'
+        output r0
+        print newline
+        create integer 0 to r7
+        label 'spin'
+        divide r1 with r7 to r8
+        jump if unconditional to 'spin'
+    """,
+}
+
+
+def run(program, max_steps=None, jit=True):
+    engine = make_engine(program, jit=jit)
+    steps = engine.run(max_steps)
+    return state(engine), steps
+
+
+@pytest.mark.parametrize("name", PROGRAMS)
+def test_compiled_loops_match_the_interpreter(name):
+    program = decode(PROGRAMS[name])
+    expected = run(program, jit=False)
+    assert run(program) == expected
+    total = expected[1]
+    for max_steps in sorted(set(range(1, total + 2, 37)) | {JIT_THRESHOLD * 3, JIT_THRESHOLD * 4 + 1, total}):
+        assert run(program, max_steps) == run(program, max_steps, jit=False), max_steps
+
+
+@pytest.mark.parametrize("name", PROGRAMS)
+def test_runs_split_into_step_budgets(name):
+    program = decode(PROGRAMS[name])
+    expected = run(program, jit=False)
+    for chunk in (1, 3, 10, 97):
+        engine = make_engine(program, jit=True)
+        steps = 0
+        while engine.runtime.p_counter < len(program):
+            steps += engine.run(chunk)
+        assert (state(engine), steps) == expected, chunk
+
+
+def counting_compiler(monkeypatch):
+    # Counts compiles, and calls of compiled loops that ran iterations
+    counts = {"compiled": 0, "entered": 0}
+
+    def compile_and_count(engine, head):
+        loop = compile_loop(engine, head)
+        counts["compiled"] += 1
+        if loop is None:
+            return None
+
+        def counted(budget):
+            executed = loop(budget)
+            counts["entered"] += bool(executed)
+            return executed
+        return counted
+
+    monkeypatch.setattr(execution, "compile_loop", compile_and_count)
+    return counts
+
+
+@pytest.mark.parametrize("iterations, compiled", [
+    (JIT_THRESHOLD - 1, False),
+    (JIT_THRESHOLD, False),  # The last back edge is not taken
+    (JIT_THRESHOLD + 1, True),
+])
+def test_threshold(monkeypatch, iterations, compiled):
+    counts = counting_compiler(monkeypatch)
+    program = decode(f"""
+        create integer 0 to r1
+        create integer 1 to r2
+        create integer {iterations} to r3
+        label 'loop'
+        add r1 with r2 to r1
+        compare r1 with r3
+        jump if less to 'loop'
+        output r1
+    """)
+    assert run(program) == run(program, jit=False)
+    assert counts["compiled"] == int(compiled)
+
+
+def test_loops_are_compiled_again_for_new_register_types(monkeypatch):
+    counts = counting_compiler(monkeypatch)
+    program = decode(PROGRAMS["retyped"])
+    engine = make_engine(program, jit=True)
+    engine.run()
+    head = program.labels["inner"]
+    assert counts["compiled"] >= 2 and counts["entered"] >= 2
+    assert engine._jit_thresholds[head] > JIT_THRESHOLD
+    assert state(engine) == run(program, jit=False)[0]
+
+
+def test_uncompilable_loops_back_off(monkeypatch):
+    counts = counting_compiler(monkeypatch)
+    # Output is not compiled
+    program = decode("""
+        create integer 0 to r1
+        create integer 1 to r2
+        create integer 1000 to r3
+        label 'loop'
+        add r1 with r2 to r1
+        output r1
+        compare r1 with r3
+        jump if less to 'loop'
+    """)
+    assert run(program) == run(program, jit=False)
+    # Attempts after 50, 100, 200 and 400 more back edges
+    assert counts["compiled"] == 4
+
+
+def test_returns_are_not_back_edges(monkeypatch):
+    counts = counting_compiler(monkeypatch)
+    program = decode("""
+        create integer 0 to r0
+        create integer 1 to r2
+        create integer 500 to r1
+        call to 'down'
+        stop
+        label 'down'
+        compare r1 with r0
+        jump if equal to 'done'
+        sub r1 with r2 to r1
+        call to 'down'
+        label 'done'
+        return
+    """)
+    assert run(program) == run(program, jit=False)
+    assert counts["compiled"] == 0
+
+
+def test_created_registers_need_no_value_on_entry():
+    program = decode("""
+        create integer 0 to r1
+        create integer 1 to r2
+        create integer 5 to r3
+        label 'loop'
+        add r1 with r2 to r1
+        compare r1 with r3
+        jump if equal to 'done'
+        create character a to r4
+        jump if unconditional to 'loop'
+        label 'done'
+        stop
+    """)
+    head = program.labels["loop"]
+    engine = make_engine(program, jit=True)
+    engine.run(3)
+    assert engine.runtime.reg_values[4] is None
+    loop = compile_loop(engine, head)
+    assert loop is not None
+    # Leaves the loop before r4 is created in the last iteration
+    assert loop(1000) == 4 * 6 + 4
+    expected = run(program, jit=False)[0]
+    assert state(engine)["registers"] == expected["registers"]
+    assert engine.runtime.reg_types[4] == OperandType.CHARACTER
+    assert engine.runtime.p_counter == program.labels["done"]
+
+
+def test_entry_check_failures_return_none():
+    program = decode("""
+        create integer 0 to r1
+        create integer 1 to r2
+        label 'loop'
+        add r1 with r2 to r1
+        jump if unconditional to 'loop'
+    """)
+    engine = make_engine(program, jit=True)
+    engine.run(2)
+    loop = compile_loop(engine, program.labels["loop"])
+    assert loop(2) == 0  # Less than one iteration
+    engine.runtime.set_register(2, 1, OperandType.MEMORY_ADDRESS)
+    assert loop(1000) is None
@@ -0,0 +1,131 @@
+import pytest
+from ignition.ast import OperandType
+from ignition.memory import ADDRESS_LIMIT, PAGE_SIZE, PagedMemory
+from tests.support import decode, make_engine
+
+INT = OperandType.INTEGER
+
+
+def test_cells_on_either_side_of_a_page_boundary():
+    memory = PagedMemory()
+    memory.set(PAGE_SIZE - 1, 1, INT)
+    memory.set(PAGE_SIZE, 2, INT)
+    assert memory.get(PAGE_SIZE - 1) == (1, INT)
+    assert memory.get(PAGE_SIZE) == (2, INT)
+    assert memory.get(PAGE_SIZE + 1) is None
+    assert len(memory.pages) == 2
+    assert len(memory) == 2
+
+
+def test_address_limit():
+    memory = PagedMemory()
+    memory.set(ADDRESS_LIMIT - 1, 7, INT)
+    assert memory.get(ADDRESS_LIMIT - 1) == (7, INT)
+    assert ADDRESS_LIMIT - 1 in memory
+    with pytest.raises(IndexError):
+        memory.set(ADDRESS_LIMIT, 1, INT)
+    with pytest.raises(IndexError):
+        memory.set(-1, 1, INT)
+    assert memory.get(ADDRESS_LIMIT) is None
+
+
+def test_values_outside_int64_and_non_integers():
+    memory = PagedMemory()
+    big = 1 << 70
+    memory.set(10, big, INT)
+    memory.set(11, "a", OperandType.CHARACTER)
+    memory.set(12, True, OperandType.BOOLEAN)
+    memory.set(13, 5, None)
+    assert memory.get(10) == (big, INT)
+    assert memory.get(11) == ("a", OperandType.CHARACTER)
+    assert memory.get(12) == (True, OperandType.BOOLEAN)
+    assert memory.get(12)[0] is True
+    assert memory.get(13) == (5, OperandType.UNKNOWN)
+    # Overwriting a side-table cell with an integer drops the object
+    memory.set(10, 3, INT)
+    assert memory.get(10) == (3, INT)
+    memory.clear(11)
+    assert memory.get(11) is None
+    assert len(memory) == 3
+
+
+def test_boolean_cells_keep_their_values():
+    # Boolean registers can hold plain integers, such as the result of adding two booleans
+    memory = PagedMemory()
+    values = [True, False, 1, 2, 0]
+    for addr, val in enumerate(values):
+        memory.set(addr, val, OperandType.BOOLEAN)
+    for addr, val in enumerate(values):
+        assert memory.get(addr) == (val, OperandType.BOOLEAN)
+        assert memory.get(addr)[0].__class__ is val.__class__
+    memory.set(1, 7, OperandType.BOOLEAN)
+    memory.set(2, True, OperandType.BOOLEAN)
+    assert memory.get(1)[0] == 7 and memory.get(2)[0] is True
+    engine = make_engine(decode("""
+        create boolean true to r1
+        add r1 with r1 to r2
+        store r2 to m<5>
+        load m<5> to r3
+        add r3 with r3 to r4
+    """))
+    engine.run()
+    assert engine.runtime.reg_values[4] == 4
+
+
+def test_writes_after_snapshot_do_not_change_it():
+    memory = PagedMemory()
+    memory.set(1, 1, INT)
+    memory.set(2, "x", OperandType.CHARACTER)
+    memory.set(PAGE_SIZE, 3, INT)
+    snapshot = memory.snapshot()
+    memory.set(1, 10, INT)
+    memory.set(2, "y", OperandType.CHARACTER)
+    memory.clear(PAGE_SIZE)
+    memory.set(5 * PAGE_SIZE, 4, INT)
+    assert memory.get(1) == (10, INT)
+    assert memory.get(2) == ("y", OperandType.CHARACTER)
+    assert len(memory) == 3
+
+    memory.restore(snapshot)
+    assert list(memory.items()) == [(1, (1, INT)), (2, ("x", OperandType.CHARACTER)), (PAGE_SIZE, (3, INT))]
+    assert len(memory) == 3
+    # The restored pages are shared with the snapshot again, so it can be restored twice
+    memory.set(1, 20, INT)
+    memory.restore(snapshot)
+    assert memory.get(1) == (1, INT)
+
+
+def test_unshared_pages_are_not_copied_twice():
+    memory = PagedMemory()
+    memory.set(0, 1, INT)
+    memory.snapshot()
+    memory.set(0, 2, INT)
+    page = memory.pages[0]
+    memory.set(1, 3, INT)
+    assert memory.pages[0] is page
+
+
+def test_ranged_items_across_pages():
+    memory = PagedMemory()
+    addresses = [0, PAGE_SIZE - 1, PAGE_SIZE, 2 * PAGE_SIZE + 5, 7 * PAGE_SIZE, ADDRESS_LIMIT - 1]
+    for addr in reversed(addresses):
+        memory.set(addr, addr % 1000, INT)
+    assert [addr for addr, _ in memory.items()] == addresses
+    assert [addr for addr, _ in memory.items(reverse=True)] == addresses[::-1]
+    assert [addr for addr, _ in memory.items(PAGE_SIZE - 1, 2 * PAGE_SIZE + 5)] == [PAGE_SIZE - 1, PAGE_SIZE]
+    assert [addr for addr, _ in memory.items(PAGE_SIZE, 7 * PAGE_SIZE + 1, reverse=True)] == \
+        [7 * PAGE_SIZE, 2 * PAGE_SIZE + 5, PAGE_SIZE]
+    assert list(memory.items(PAGE_SIZE + 1, 2 * PAGE_SIZE)) == []
+    assert list(memory.items(5, 5)) == []
+    assert dict(memory.items())[2 * PAGE_SIZE + 5] == ((2 * PAGE_SIZE + 5) % 1000, INT)
+
+
+def test_cleared_pages_are_skipped():
+    memory = PagedMemory()
+    memory.set(PAGE_SIZE, 1, INT)
+    memory.set(3 * PAGE_SIZE, 2, INT)
+    memory.clear(PAGE_SIZE)
+    memory.clear(PAGE_SIZE)
+    memory.clear(9 * PAGE_SIZE)
+    assert list(memory.items()) == [(3 * PAGE_SIZE, (2, INT))]
+    assert len(memory) == 1
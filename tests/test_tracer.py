@@ -0,0 +1,55 @@
+import pytest
+from ignition.ast import InstructionType
+from ignition.tracer import Tracer, read_trace_file
+from tests.support import decode, make_engine
+
+PROGRAM = """
+    create integer 0 to r1
+    create integer 1 to r2
+    create integer 5 to r3
+    label 'loop'
+    add r1 with r2 to r1
+    compare r1 with r3
+    jump if less to 'loop'
+    stop
+"""
+
+
+def trace(path=None, capacity=100):
+    program = decode(PROGRAM)
+    engine = make_engine(program)
+    tracer = Tracer(engine.runtime, program, capacity, path)
+    engine.run(None, tracer.record)
+    tracer.close()
+    return tracer
+
+
+def summary(records):
+    return [(record.pc, record.value, record.z, record.s) for record in records]
+
+
+def test_ring_buffer_keeps_the_last_records():
+    full = trace()
+    assert full.recorded == 24
+    wrapped = trace(capacity=5)
+    assert wrapped.recorded == 24
+    assert summary(wrapped.last(10)) == summary(full.last(5))
+    assert summary(full.last(3)) == [(5, None, True, False), (6, None, True, False), (7, None, True, False)]
+    assert [record.value for record in full.last(24) if record.opcode == InstructionType.ADD.value] == [1, 2, 3, 4, 5]
+
+
+def test_trace_file(tmp_path):
+    path = str(tmp_path / "run.trc")
+    streamed = trace(path)
+    records, total = read_trace_file(path)
+    assert total == 24
+    assert summary(records) == summary(trace().last(24))
+    assert summary(read_trace_file(path, 4)[0]) == summary(records[-4:]) == summary(streamed.last(4))
+    assert read_trace_file(path, 100)[0] and read_trace_file(path, 0) == ([], 24)
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / "program.sasm"
+    path.write_text(PROGRAM)
+    with pytest.raises(ValueError, match="not an Ignition trace file"):
+        read_trace_file(str(path))